@@ -1,22 +1,35 @@
 # api.py - MODIFIED VERSION
-import requests
-from config import API_KEY, BASE_URL, MATCH_GRACE_PERIOD_MINUTES
+from config import (
+    MATCH_GRACE_PERIOD_MINUTES, MAX_API_CALLS_PER_RUN, ODDS_REVALIDATE_COOLDOWN_MINUTES
+)
+import asyncio
+import time
 from datetime import datetime, timedelta, timezone
-from results_db import results_db
-from api_limiter import api_limiter
-import sqlite3
+from results_db import results_db, is_settled, SETTLED_STATUSES
+from api_limiter import (
+    api_limiter, ODDS_FRESH_HOURS, PRIORITY_USER, PRIORITY_ESSENTIAL, PRIORITY_OPTIONAL
+)
+from db import get_connection
+from async_db import run_db
+from api_client import api_client
+from single_flight import single_flight, flight_key
 
-# Import the API limiter
-from api_limiter import api_limiter
+# /fixtures accepts up to 20 dash-separated ids per request
+MAX_IDS_PER_REQUEST = 20
 
-HEADERS = {"x-apisports-key": API_KEY}
+# Background odds refreshes in flight, and when each fixture was last tried
+_revalidating = {}
+_last_revalidated = {}
 
 def fetch_leagues():
     """Fetch all available football leagues"""
+    if not api_limiter.acquire(PRIORITY_ESSENTIAL):
+        print("[API] ⚠️ Skipping league update - API limit")
+        return []
+    
     try:
-        r = requests.get(
-            f"{BASE_URL}/leagues",
-            headers=HEADERS,
+        r = api_client.get_sync(
+            "/leagues",
             params={"current": "true"}
         )
         if r.status_code == 200:
@@ -38,10 +51,13 @@ def fetch_leagues():
 
 def fetch_teams(league_id: int):
     """Fetch teams for a specific league"""
+    if not api_limiter.acquire(PRIORITY_ESSENTIAL):
+        print(f"[API] ⚠️ Skipping teams for league {league_id} - API limit")
+        return []
+    
     try:
-        r = requests.get(
-            f"{BASE_URL}/teams",
-            headers=HEADERS,
+        r = api_client.get_sync(
+            "/teams",
             params={"league": league_id, "season": 2024}
         )
         if r.status_code == 200:
@@ -68,10 +84,13 @@ def fetch_league_fixtures(league_id: int, days: int = 2):
     for day_offset in range(days):
         date = (today + timedelta(days=day_offset)).strftime("%Y-%m-%d")
         
+        if not api_limiter.acquire(PRIORITY_ESSENTIAL):
+            print(f"[API] ⚠️ Skipping fixtures for league {league_id} - API limit")
+            break
+        
         try:
-            r = requests.get(
-                f"{BASE_URL}/fixtures",
-                headers=HEADERS,
+            r = api_client.get_sync(
+                "/fixtures",
                 params={
                     "league": league_id,
                     "date": date,
@@ -100,10 +119,13 @@ def fetch_fixtures_for_days(days=2):
     for day_offset in range(days):
         date = (datetime.now() + timedelta(days=day_offset)).strftime("%Y-%m-%d")
         
+        if not api_limiter.acquire(PRIORITY_ESSENTIAL):
+            print(f"[API] ⚠️ Skipping fixtures for {date} - API limit")
+            break
+        
         try:
-            r = requests.get(
-                f"{BASE_URL}/fixtures",
-                headers=HEADERS,
+            r = api_client.get_sync(
+                "/fixtures",
                 params={
                     "date": date,
                     "status": "NS"  # Only not started games
@@ -130,28 +152,16 @@ def fetch_fixtures_for_days(days=2):
     
     return fixtures
 
-def fetch_match_odds(fixture_id: int):
-    """Fetches 1X2 and multiple Over/Under odds with caching"""
-    from config import MATCH_GRACE_PERIOD_MINUTES
-    
-    # ===== STEP 1: Check cache first =====
-    cached_odds = api_limiter.get_cached_odds(fixture_id)
-    if cached_odds:
-        print(f"[API] Using cached odds for {fixture_id}")
-        return cached_odds
-    
-    # ===== STEP 2: Check if match is bettable =====
+def _is_match_bettable(fixture_id: int):
+    """False when a not-started match is already past the grace period"""
     try:
-        conn = sqlite3.connect('bot.db')
-        cursor = conn.cursor()
-        
-        cursor.execute(f"""
-            SELECT start_time, status 
-            FROM fixtures 
-            WHERE fixture_id = ?
-        """, (fixture_id,))
+        with get_connection() as conn:
+            match_info = conn.execute("""
+                SELECT start_time, status 
+                FROM fixtures 
+                WHERE fixture_id = ?
+            """, (fixture_id,)).fetchone()
         
-        match_info = cursor.fetchone()
         if match_info:
             start_time, status = match_info
             
@@ -165,39 +175,22 @@ def fetch_match_odds(fixture_id: int):
                         
                         if overdue_minutes > MATCH_GRACE_PERIOD_MINUTES:
                             print(f"[API] Match {fixture_id} is {overdue_minutes:.0f} minutes overdue")
-                            conn.close()
-                            return None
+                            return False
                 except Exception as e:
                     print(f"[API] Error checking match time: {e}")
-        
-        conn.close()
     except Exception as e:
         print(f"[API] Database error when checking match time: {e}")
     
-    # ===== STEP 3: Check if we can make API call =====
-    if not api_limiter.can_make_request():
-        print(f"[API] ⚠️ Skipping odds fetch for {fixture_id} - API limit")
-        return None
-    
-    # ===== STEP 4: Make API request =====
-    params = {"fixture": fixture_id}
-    
-    try:
-        r = requests.get(
-            f"{BASE_URL}/odds",
-            headers=HEADERS,
-            params=params,
-            timeout=10
-        )
-        
-        # Record this API call
-        api_limiter.record_request()
-        
-        data = r.json().get("response", [])
-    except Exception as e:
-        print(f"Error fetching odds: {e}")
-        return None
+    return True
 
+def _fixture_league(fixture_id: int):
+    """league_id of a stored fixture, or None (emergency mode checks it)"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT league_id FROM fixtures WHERE fixture_id = ?", (fixture_id,)).fetchone()
+    return row[0] if row else None
+
+def _parse_odds(data):
+    """Extract 1X2 and Over/Under odds from an /odds response"""
     if not data:
         return None
 
@@ -234,131 +227,289 @@ def fetch_match_odds(fixture_id: int):
     if not odds_data["1x2"]:
         return None
     
-    # ===== STEP 5: Cache the result =====
-    api_limiter.cache_odds(fixture_id, odds_data)
-    
     return odds_data
 
-def fetch_fixture_result(fixture_id: int):
+def _current_season(day):
+    """API-Football names seasons after the year they start (Aug-May)"""
+    return day.year if day.month >= 7 else day.year - 1
+
+def prefetch_league_odds(league_id: int, date: str, max_calls: int):
     """
-    Fetch fixture result - Checks cache first, then database, then API
+    Bulk-load odds for every fixture of one league on one date.
+    Walks the paginated /odds endpoint and writes each page to
+    cached_odds as it arrives. Returns (fixtures_cached, api_calls).
     """
-    # ===== STEP 1: Check cache =====
-    cached_result = api_limiter.get_cached_result(fixture_id)
-    if cached_result:
-        print(f"[API] Using cached result for fixture {fixture_id}")
-        # Ensure goals are not None
-        home_goals = cached_result.get('home_goals', 0) or 0
-        away_goals = cached_result.get('away_goals', 0) or 0
-        
-        return {
-            "home_goals": home_goals,
-            "away_goals": away_goals,
-            "status": cached_result.get('status', 'FT'),
-            "from_cache": True
-        }
-    
-    # ===== STEP 2: Check database =====
-    db_result = results_db.get_result(fixture_id)
-    
-    if db_result and db_result.get('status') == 'FT':
-        print(f"[API] Using database result for fixture {fixture_id}")
+    season = _current_season(datetime.strptime(date, "%Y-%m-%d"))
+    cached = 0
+    calls = 0
+    page = 1
+    total_pages = 1
+    
+    while page <= total_pages and calls < max_calls:
+        if not api_limiter.acquire(PRIORITY_OPTIONAL):
+            print(f"[API] ⚠️ Stopping odds prefetch for league {league_id} - API limit")
+            break
+        calls += 1
         
-        # Ensure goals are not None
-        home_goals = db_result.get('home_goals', 0) or 0
-        away_goals = db_result.get('away_goals', 0) or 0
+        try:
+            r = api_client.get_sync(
+                "/odds",
+                params={"league": league_id, "season": season, "date": date, "page": page}
+            )
+            
+            if r.status_code != 200:
+                print(f"[API] Error prefetching odds for league {league_id}: {r.status_code}")
+                break
+            
+            payload = r.json()
+        except Exception as e:
+            print(f"[API] Error prefetching odds for league {league_id}: {e}")
+            break
         
-        # Cache it for future use
-        api_limiter.cache_result(
-            fixture_id,
-            home_goals,
-            away_goals,
-            'FT'
-        )
+        # One transaction per page
+        with get_connection():
+            for item in payload.get("response", []):
+                odds_data = _parse_odds([item])
+                if odds_data:
+                    api_limiter.cache_odds(item["fixture"]["id"], odds_data)
+                    cached += 1
         
-        return {
-            "home_goals": home_goals,
-            "away_goals": away_goals,
-            "status": "FT",
-            "from_database": True
-        }
-    
-    # ===== STEP 3: Check if we can make API call =====
-    if not api_limiter.can_make_request():
-        print(f"[API] ⚠️ Skipping result fetch for {fixture_id} - API limit")
+        total_pages = payload.get("paging", {}).get("total", 1)
+        page += 1
+    
+    return cached, calls
+
+async def fetch_match_odds_async(fixture_id: int, priority=PRIORITY_USER):
+    """1X2 and Over/Under odds for bot handlers - concurrent lookups share one fetch"""
+    return await single_flight.do_async(
+        flight_key("/odds", {"fixture": fixture_id}), _fetch_match_odds_async, fixture_id, priority
+    )
+
+async def _fetch_match_odds_async(fixture_id: int, priority=PRIORITY_USER):
+    # ===== STEP 1: Check cache first =====
+    cached_odds = await run_db(api_limiter.get_cached_odds, fixture_id)
+    if cached_odds:
+        print(f"[API] Using cached odds for {fixture_id}")
+        return cached_odds
+    
+    # ===== STEP 2: Check if match is bettable =====
+    if not await run_db(_is_match_bettable, fixture_id):
+        return None
+    
+    # ===== STEP 3: Claim an API call =====
+    league_id = await run_db(_fixture_league, fixture_id)
+    if not await run_db(api_limiter.acquire, priority, league_id):
+        print(f"[API] ⚠️ Skipping odds fetch for {fixture_id} - API limit")
         return None
     
     # ===== STEP 4: Make API request =====
     try:
-        print(f"[API] Fetching result for fixture {fixture_id} from API...")
-        r = requests.get(
-            f"{BASE_URL}/fixtures",
-            headers=HEADERS,
-            params={"id": fixture_id},
-            timeout=10
-        )
+        r = await api_client.get("/odds", params={"fixture": fixture_id})
         
-        # Record this API call
-        api_limiter.record_request()
+        data = r.json().get("response", [])
+    except Exception as e:
+        print(f"Error fetching odds: {e}")
+        return None
+    
+    odds_data = _parse_odds(data)
+    
+    # ===== STEP 5: Cache the result =====
+    if odds_data:
+        await run_db(api_limiter.cache_odds, fixture_id, odds_data)
+    
+    return odds_data
+
+# ======================
+# STALE-WHILE-REVALIDATE ODDS
+# ======================
+def _kickoff_time(fixture_id: int):
+    """Scheduled kickoff as an aware datetime, or None if unknown"""
+    with get_connection() as conn:
+        row = conn.execute("SELECT start_time FROM fixtures WHERE fixture_id = ?", (fixture_id,)).fetchone()
+    
+    if not row or not row[0]:
+        return None
+    try:
+        return datetime.fromisoformat(row[0].replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+async def get_match_odds_swr(fixture_id: int):
+    """
+    Odds for the match details screen as (odds_data, age_hours).
+    Stale odds are served immediately while a refresh runs in the
+    background. Odds past ODDS_MAX_STALE_HOURS, or stale odds after
+    kickoff, are refused and fall back to a normal fetch.
+    """
+    cached = await run_db(api_limiter.get_odds_with_age, fixture_id)
+    
+    if cached:
+        odds_data, age_hours = cached
+        if age_hours < ODDS_FRESH_HOURS:
+            return odds_data, age_hours
         
-        if r.status_code == 200:
-            data = r.json().get("response", [])
-            if data:
-                f = data[0]
-                status = f["fixture"]["status"]["short"]
-                
-                # SAFE GOAL EXTRACTION - Convert None to 0
-                home_goals = f["goals"]["home"]
-                away_goals = f["goals"]["away"]
-                
-                # Convert None to 0 for goal values
-                if home_goals is None:
-                    home_goals = 0
-                if away_goals is None:
-                    away_goals = 0
-                
-                # Extract match details
-                home_team = f["teams"]["home"]["name"]
-                away_team = f["teams"]["away"]["name"]
-                match_date = f["fixture"]["date"][:10] if "date" in f["fixture"] else None
-                league_name = f["league"]["name"]
-                
-                # Save to database
-                results_db.save_result(
-                    fixture_id=fixture_id,
-                    home_team=home_team,
-                    away_team=away_team,
-                    home_goals=home_goals,
-                    away_goals=away_goals,
-                    status=status,
-                    match_date=match_date,
-                    league_name=league_name
-                )
-                
-                # Cache the result
-                api_limiter.cache_result(fixture_id, home_goals, away_goals, status)
-                
-                if status == 'FT':
-                    return {
-                        "home_goals": home_goals,
-                        "away_goals": away_goals,
-                        "status": status,
-                        "from_database": False
-                    }
-                else:
-                    # Return partial result for non-FT matches
-                    return {
-                        "home_goals": home_goals,
-                        "away_goals": away_goals,
-                        "status": status,
-                        "from_database": False
-                    }
+        kickoff = await run_db(_kickoff_time, fixture_id)
+        if kickoff and datetime.now(timezone.utc) < kickoff:
+            print(f"[API] Serving stale odds for {fixture_id} ({age_hours:.1f} hours old)")
+            _queue_odds_refresh(fixture_id)
+            return odds_data, age_hours
+        
+        print(f"[API] Refusing stale odds for {fixture_id} - match has kicked off")
+    
+    odds_data = await fetch_match_odds_async(fixture_id)
+    return odds_data, 0
+
+def _queue_odds_refresh(fixture_id: int):
+    """Start one background refresh per fixture, at most once per cooldown"""
+    if fixture_id in _revalidating:
+        return
+    
+    now = time.monotonic()
+    _prune_revalidated(now)
+    if fixture_id in _last_revalidated:
+        return
+    
+    _last_revalidated[fixture_id] = now
+    task = asyncio.get_running_loop().create_task(_revalidate_odds(fixture_id))
+    _revalidating[fixture_id] = task
+    task.add_done_callback(lambda _: _revalidating.pop(fixture_id, None))
+
+def _prune_revalidated(now):
+    """Forget refresh attempts whose cooldown has passed"""
+    cooldown = ODDS_REVALIDATE_COOLDOWN_MINUTES * 60
+    for fixture_id in [f for f, tried in _last_revalidated.items() if now - tried >= cooldown]:
+        del _last_revalidated[fixture_id]
+
+async def _revalidate_odds(fixture_id: int):
+    """Refresh stale odds out of the optional background budget"""
+    # Its own flight: a user fetching the same odds must not wait on a
+    # refresh the optional budget may refuse
+    key = ("revalidate",) + flight_key("/odds", {"fixture": fixture_id})
+    try:
+        if await single_flight.do_async(key, _fetch_match_odds_async, fixture_id, PRIORITY_OPTIONAL):
+            _last_revalidated.pop(fixture_id, None)
+    except Exception as e:
+        print(f"[API] Background odds refresh failed for {fixture_id}: {e}")
+
+def _store_fixture_result(f):
+    """Save one /fixtures response item to results_db and the results cache"""
+    fixture_id = f["fixture"]["id"]
+    status = f["fixture"]["status"]["short"]
+    
+    # SAFE GOAL EXTRACTION - Convert None to 0
+    home_goals = f["goals"]["home"]
+    away_goals = f["goals"]["away"]
+    
+    # Markets settle on regular time - goals includes extra time
+    if status in ("AET", "PEN"):
+        fulltime = f.get("score", {}).get("fulltime") or {}
+        if fulltime.get("home") is not None and fulltime.get("away") is not None:
+            home_goals, away_goals = fulltime["home"], fulltime["away"]
+    
+    # Convert None to 0 for goal values
+    if home_goals is None:
+        home_goals = 0
+    if away_goals is None:
+        away_goals = 0
+    
+    # Extract match details
+    home_team = f["teams"]["home"]["name"]
+    away_team = f["teams"]["away"]["name"]
+    match_date = f["fixture"]["date"][:10] if "date" in f["fixture"] else None
+    league_name = f["league"]["name"]
+    
+    # Save to database
+    results_db.save_result(
+        fixture_id=fixture_id,
+        home_team=home_team,
+        away_team=away_team,
+        home_goals=home_goals,
+        away_goals=away_goals,
+        status=status,
+        match_date=match_date,
+        league_name=league_name
+    )
+    
+    # Cache the result
+    api_limiter.cache_result(fixture_id, home_goals, away_goals, status)
+    
+    # Non-FT matches return a partial result
+    return {
+        "home_goals": home_goals,
+        "away_goals": away_goals,
+        "status": status,
+        "match_date": match_date,
+        "from_database": False
+    }
+
+def fetch_fixture_results(fixture_ids):
+    """
+    Results for several fixtures - concurrent lookups share one fetch.
+    Fixtures without a finished result are fetched 20 per API call.
+    Returns {fixture_id: result} for every fixture that has one.
+    """
+    results = {}
+    to_fetch = []
+    
+    # ===== STEP 1: Final (or void) results we already have =====
+    for fixture_id in dict.fromkeys(fixture_ids):
+        cached_result = api_limiter.get_cached_result(fixture_id)
+        if cached_result and cached_result.get('status') in SETTLED_STATUSES:
+            results[fixture_id] = cached_result
+            continue
         
+        db_result = results_db.get_result(fixture_id)
+        if db_result and is_settled(db_result.get('status'), db_result.get('match_date')):
+            results[fixture_id] = db_result
+            continue
+        
+        to_fetch.append(fixture_id)
+    
+    if not to_fetch:
+        return results
+    
+    # ===== STEP 2: One API call per batch of ids =====
+    batches = [to_fetch[i:i + MAX_IDS_PER_REQUEST] for i in range(0, len(to_fetch), MAX_IDS_PER_REQUEST)]
+    if len(batches) > MAX_API_CALLS_PER_RUN:
+        print(f"[API] Limiting result refresh to {MAX_API_CALLS_PER_RUN} of {len(batches)} batches")
+        batches = batches[:MAX_API_CALLS_PER_RUN]
+    
+    for batch in batches:
+        ids = "-".join(str(fixture_id) for fixture_id in batch)
+        batch_results = single_flight.do(flight_key("/fixtures", {"ids": ids}), _fetch_results_batch, ids)
+        
+        if batch_results is None:
+            print(f"[API] ⚠️ Skipping result fetch for {len(batch)} fixtures - API limit")
+            break
+        
+        results.update(batch_results)
+    
+    return results
+
+def _fetch_results_batch(ids: str):
+    """One /fixtures?ids= request - returns {fixture_id: result}, or None at the API limit"""
+    if not api_limiter.acquire(PRIORITY_ESSENTIAL):
         return None
+    
+    results = {}
+    try:
+        print(f"[API] Fetching results for {ids.count('-') + 1} fixtures in one request...")
+        r = api_client.get_sync("/fixtures", params={"ids": ids})
+        
+        if r.status_code != 200:
+            print(f"[API] Error fetching results batch: {r.status_code}")
+            return results
         
+        for f in r.json().get("response", []):
+            try:
+                results[f["fixture"]["id"]] = _store_fixture_result(f)
+            except Exception as e:
+                print(f"[API] Error storing fixture result: {e}")
+    
     except Exception as e:
-        print(f"[API] Error fetching fixture result: {e}")
-        return None
+        print(f"[API] Error fetching results batch: {e}")
+    
+    return results
 
 # Helper function to adjust odds
 def adjust_odds(odds):
@@ -0,0 +1,87 @@
+# api_client.py
+import asyncio
+import threading
+import httpx
+from config import (
+    API_KEY, BASE_URL, MAX_RETRY_ATTEMPTS, RETRY_DELAY_SECONDS,
+    API_DEFAULT_TIMEOUT, API_TIMEOUTS, API_MAX_CONNECTIONS
+)
+from quota_counter import quota_counter
+
+HEADERS = {"x-apisports-key": API_KEY}
+
+# Rate limited or provider-side failures are worth another attempt
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class ApiFootballClient:
+    """Keep-alive API-Football client shared by bot handlers and scheduler threads"""
+
+    def __init__(self, base_url=BASE_URL, headers=HEADERS):
+        self.base_url = base_url
+        self.headers = headers
+        self._loop = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    # ====== EVENT LOOP ======
+    def _get_loop(self):
+        """Start the client's own event loop thread on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="api-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self):
+        # Only ever called on the client loop, so one pool serves every caller
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=API_DEFAULT_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=API_MAX_CONNECTIONS,
+                    max_keepalive_connections=API_MAX_CONNECTIONS
+                )
+            )
+        return self._client
+
+    async def _request(self, endpoint, params):
+        client = self._get_client()
+        timeout = API_TIMEOUTS.get(endpoint, API_DEFAULT_TIMEOUT)
+
+        for attempt in range(MAX_RETRY_ATTEMPTS + 1):
+            last_attempt = attempt == MAX_RETRY_ATTEMPTS
+            # Every attempt costs quota - the response headers say how much is left
+            headers = None
+            quota_counter.request_started()
+            try:
+                r = await client.get(endpoint, params=params, timeout=timeout)
+                headers = r.headers
+                if r.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    return r
+                print(f"[APIClient] {endpoint} returned {r.status_code}, retrying...")
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise
+                print(f"[APIClient] {endpoint} failed ({type(e).__name__}), retrying...")
+            finally:
+                quota_counter.request_finished(headers)
+
+            # Exponential backoff: 5s, 10s, 20s...
+            await asyncio.sleep(RETRY_DELAY_SECONDS * (2 ** attempt))
+
+    # ====== PUBLIC API ======
+    async def get(self, endpoint, params=None):
+        """GET from an async handler without blocking the bot's event loop"""
+        future = asyncio.run_coroutine_threadsafe(self._request(endpoint, params), self._get_loop())
+        return await asyncio.wrap_future(future)
+
+    def get_sync(self, endpoint, params=None):
+        """Blocking GET for the scheduler's worker threads"""
+        future = asyncio.run_coroutine_threadsafe(self._request(endpoint, params), self._get_loop())
+        return future.result()
+
+# Create global instance
+api_client = ApiFootballClient()
\ No newline at end of file
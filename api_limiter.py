@@ -1,143 +1,206 @@
 # api_limiter.py - COMPLETE AND CORRECTED VERSION
-import sqlite3
 from datetime import datetime, timedelta
 import json
 import time
+from db import get_connection
+from cache_manager import MemoryCache
+from quota_counter import quota_counter
+from config import (
+    MAX_DAILY_API_REQUESTS, API_PRIORITY_RESERVED_FOR_USERS, MAX_BACKGROUND_REQUESTS,
+    BACKGROUND_ESSENTIAL_RESERVE, API_WARNING_THRESHOLD, ENABLE_EMERGENCY_MODE,
+    EMERGENCY_MODE_THRESHOLD, EMERGENCY_FALLBACK_LEAGUES
+)
+
+# How long cached odds / results stay valid
+ODDS_FRESH_HOURS = 4
+RESULTS_FRESH_HOURS = 48
+
+# Stale odds may still be shown (with their age) up to this, never beyond
+ODDS_MAX_STALE_HOURS = 24
+
+# Request priorities, most important first
+PRIORITY_USER = "user"            # Someone is waiting on the answer
+PRIORITY_ESSENTIAL = "essential"  # Results for settlement, fixture / league sync
+PRIORITY_OPTIONAL = "optional"    # Odds prefetch and stale-odds refresh
+PRIORITIES = (PRIORITY_USER, PRIORITY_ESSENTIAL, PRIORITY_OPTIONAL)
+
+# Daily calls held back for users until they have spent them
+USER_RESERVED_REQUESTS = MAX_DAILY_API_REQUESTS * API_PRIORITY_RESERVED_FOR_USERS // 100
+
+def quota_remaining(used, total=None):
+    """
+    Calls each priority may still make today, given {priority: used}.
+    Users may spend whatever is left, background work only its own
+    budget minus what users still have reserved, and optional work
+    always leaves BACKGROUND_ESSENTIAL_RESERVE of it to essential work. Past
+    EMERGENCY_MODE_THRESHOLD background work stops.
+    """
+    if total is None:
+        total = sum(used.values())
+    left = max(0, MAX_DAILY_API_REQUESTS - total)
+    
+    if is_emergency(total):
+        return {PRIORITY_USER: left, PRIORITY_ESSENTIAL: 0, PRIORITY_OPTIONAL: 0}
+    
+    user_left = max(0, USER_RESERVED_REQUESTS - used.get(PRIORITY_USER, 0))
+    background_left = (MAX_BACKGROUND_REQUESTS - used.get(PRIORITY_ESSENTIAL, 0)
+                       - used.get(PRIORITY_OPTIONAL, 0))
+    shared_left = left - user_left
+    
+    return {
+        PRIORITY_USER: left,
+        PRIORITY_ESSENTIAL: max(0, min(background_left, shared_left)),
+        PRIORITY_OPTIONAL: max(0, min(background_left - BACKGROUND_ESSENTIAL_RESERVE, shared_left))
+    }
+
+def is_emergency(total):
+    """True once today's usage reaches EMERGENCY_MODE_THRESHOLD percent"""
+    return ENABLE_EMERGENCY_MODE and total * 100 >= EMERGENCY_MODE_THRESHOLD * MAX_DAILY_API_REQUESTS
 
 class APILimiter:
-    """Smart API request manager to stay under 100 requests/day"""
+    """Smart API request manager to stay under the daily request limit"""
     
     def __init__(self):
-        self.conn = sqlite3.connect('bot.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
-        print("[APILimiter] Ready. Will keep API calls under 100/day")
+        # In-memory tiers in front of cached_odds / cached_results
+        self.odds_memory = MemoryCache("odds")
+        self.results_memory = MemoryCache("results")
+        print(f"[APILimiter] Ready. Will keep API calls under {MAX_DAILY_API_REQUESTS}/day")
     
     def create_tables(self):
-        """Create tables for API tracking"""
-        # Daily usage tracking
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS api_daily_usage (
-                date TEXT PRIMARY KEY,
-                request_count INTEGER DEFAULT 0
-            )
-        ''')
-        
-        # Odds caching (store odds for 4 hours)
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cached_odds (
-                fixture_id INTEGER PRIMARY KEY,
-                odds_data TEXT,
-                last_updated TIMESTAMP
-            )
-        ''')
-        
-        # Results caching (store results for 48 hours)
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cached_results (
-                fixture_id INTEGER PRIMARY KEY,
-                home_goals INTEGER,
-                away_goals INTEGER,
-                status TEXT,
-                last_checked TIMESTAMP
-            )
-        ''')
-        
-        self.conn.commit()
+        """Create cache tables (called from db.init_db; usage lives in quota_counter)"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Odds caching (store odds for 4 hours)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS cached_odds (
+                    fixture_id INTEGER PRIMARY KEY,
+                    odds_data TEXT,
+                    last_updated TIMESTAMP
+                )
+            ''')
+            
+            # Results caching (store results for 48 hours)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS cached_results (
+                    fixture_id INTEGER PRIMARY KEY,
+                    home_goals INTEGER,
+                    away_goals INTEGER,
+                    status TEXT,
+                    last_checked TIMESTAMP
+                )
+            ''')
     
     # ====== DAILY USAGE METHODS ======
-    def can_make_request(self):
-        """Check if we can make another API call today"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        self.cursor.execute(
-            "SELECT request_count FROM api_daily_usage WHERE date = ?",
-            (today,)
-        )
-        result = self.cursor.fetchone()
-        
-        if result:
-            count = result[0]
-            if count >= 100:
-                print(f"[APILimiter] ⚠️ API limit reached: {count}/100")
-                return False
-            if count >= 80:
-                print(f"[APILimiter] ⚠️ High usage: {count}/100")
-            return True
-        else:
-            self.cursor.execute(
-                "INSERT INTO api_daily_usage (date, request_count) VALUES (?, 1)",
-                (today,)
-            )
-            self.conn.commit()
-            return True
-    
-    def record_request(self):
-        """Record that we made an API call"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO api_daily_usage (date, request_count)
-            VALUES (?, COALESCE((SELECT request_count FROM api_daily_usage WHERE date = ?), 0) + 1)
-        ''', (today, today))
-        
-        self.conn.commit()
+    def acquire(self, priority=PRIORITY_USER, league_id=None):
+        """
+        Claim one API call for priority; False when its budget is spent.
+        In emergency mode user calls are limited to EMERGENCY_FALLBACK_LEAGUES
+        (league_id None means the call is not tied to a league).
+        """
+        def decide(total, used):
+            if quota_remaining(used, total)[priority] <= 0:
+                return "budget spent"
+            if (priority == PRIORITY_USER and league_id is not None and is_emergency(total)
+                    and league_id not in EMERGENCY_FALLBACK_LEAGUES):
+                return f"emergency mode, league {league_id}"
+            return None
         
-        self.cursor.execute(
-            "SELECT request_count FROM api_daily_usage WHERE date = ?",
-            (today,)
-        )
-        count = self.cursor.fetchone()[0]
+        reason = quota_counter.claim(priority, decide)
+        total = quota_counter.snapshot()[0]
+        if reason:
+            print(f"[APILimiter] ⚠️ Denied {priority} request ({reason}): {total}/{MAX_DAILY_API_REQUESTS}")
+            return False
         
-        if count % 10 == 0:
-            print(f"[APILimiter] API calls today: {count}/100")
+        if total * 100 >= API_WARNING_THRESHOLD * MAX_DAILY_API_REQUESTS:
+            print(f"[APILimiter] ⚠️ High usage: {total}/{MAX_DAILY_API_REQUESTS}")
+        elif total % 10 == 0:
+            print(f"[APILimiter] API calls today: {total}/{MAX_DAILY_API_REQUESTS}")
+        return True
     
     # ====== ODDS CACHE METHODS ======
+    def _load_odds(self, fixture_id):
+        """(odds_data, last_updated) from memory, falling back to SQLite"""
+        entry = self.odds_memory.get(fixture_id)
+        if entry is None:
+            with get_connection() as conn:
+                result = conn.execute(
+                    "SELECT odds_data, last_updated FROM cached_odds WHERE fixture_id = ?",
+                    (fixture_id,)
+                ).fetchone()
+            self.odds_memory.count_db_lookup(result is not None)
+            if not result:
+                return None
+            entry = (json.loads(result[0]), datetime.fromisoformat(result[1]))
+            self.odds_memory.set(fixture_id, entry)
+        return entry
+    
     def get_cached_odds(self, fixture_id):
         """Get cached odds if available (less than 4 hours old)"""
-        self.cursor.execute(
-            "SELECT odds_data, last_updated FROM cached_odds WHERE fixture_id = ?",
-            (fixture_id,)
-        )
-        result = self.cursor.fetchone()
+        result = self._load_odds(fixture_id)
         
         if result:
-            odds_data, last_updated = result
-            last_time = datetime.fromisoformat(last_updated)
+            odds_data, last_time = result
             age_hours = (datetime.now() - last_time).total_seconds() / 3600
             
-            if age_hours < 4:
+            if age_hours < ODDS_FRESH_HOURS:
                 print(f"[APILimiter] Using cached odds for {fixture_id} ({age_hours:.1f} hours old)")
-                return json.loads(odds_data)
+                return odds_data
+        
+        return None
+    
+    def get_odds_with_age(self, fixture_id):
+        """(odds_data, age_hours) even when stale, or None past ODDS_MAX_STALE_HOURS"""
+        result = self._load_odds(fixture_id)
+        
+        if result:
+            odds_data, last_time = result
+            age_hours = (datetime.now() - last_time).total_seconds() / 3600
+            
+            if age_hours < ODDS_MAX_STALE_HOURS:
+                return odds_data, age_hours
         
         return None
     
     def cache_odds(self, fixture_id, odds_data):
-        """Cache odds for 4 hours"""
+        """Cache odds for 4 hours (written through to SQLite)"""
+        now = datetime.now()
         try:
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO cached_odds (fixture_id, odds_data, last_updated)
-                VALUES (?, ?, ?)
-            ''', (fixture_id, json.dumps(odds_data), datetime.now().isoformat()))
-            self.conn.commit()
+            with get_connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO cached_odds (fixture_id, odds_data, last_updated)
+                    VALUES (?, ?, ?)
+                ''', (fixture_id, json.dumps(odds_data), now.isoformat()))
+            self.odds_memory.set(fixture_id, (odds_data, now))
         except Exception as e:
             print(f"[APILimiter] Error caching odds: {e}")
     
+    def delete_cached_odds(self, fixture_id):
+        """Invalidate cached odds for one fixture in both tiers"""
+        with get_connection() as conn:
+            conn.execute("DELETE FROM cached_odds WHERE fixture_id = ?", (fixture_id,))
+        self.odds_memory.delete(fixture_id)
+    
     # ====== RESULTS CACHE METHODS ====== (THIS IS THE MISSING PART!)
     def get_cached_result(self, fixture_id):
         """Get cached result if available"""
-        self.cursor.execute(
-            "SELECT home_goals, away_goals, status, last_checked FROM cached_results WHERE fixture_id = ?",
-            (fixture_id,)
-        )
-        result = self.cursor.fetchone()
+        result = self.results_memory.get(fixture_id)
+        if result is None:
+            with get_connection() as conn:
+                result = conn.execute(
+                    "SELECT home_goals, away_goals, status, last_checked FROM cached_results WHERE fixture_id = ?",
+                    (fixture_id,)
+                ).fetchone()
+            self.results_memory.count_db_lookup(result is not None)
+            if result:
+                self.results_memory.set(fixture_id, result)
         
         if result:
             home_goals, away_goals, status, last_checked = result
             last_time = datetime.fromisoformat(last_checked)
             age_hours = (datetime.now() - last_time).total_seconds() / 3600
             
-            if age_hours < 48:
+            if age_hours < RESULTS_FRESH_HOURS:
                 print(f"[APILimiter] Using cached result for {fixture_id}")
                 return {
                     "home_goals": home_goals,
@@ -149,66 +212,58 @@ class APILimiter:
         return None
     
     def cache_result(self, fixture_id, home_goals, away_goals, status):
-        """Cache match result for 48 hours"""
+        """Cache match result for 48 hours (written through to SQLite)"""
+        row = (home_goals, away_goals, status, datetime.now().isoformat())
         try:
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO cached_results (fixture_id, home_goals, away_goals, status, last_checked)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (fixture_id, home_goals, away_goals, status, datetime.now().isoformat()))
-            self.conn.commit()
+            with get_connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO cached_results (fixture_id, home_goals, away_goals, status, last_checked)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (fixture_id, *row))
+            self.results_memory.set(fixture_id, row)
         except Exception as e:
             print(f"[APILimiter] Error caching result: {e}")
     
     # ====== UTILITY METHODS ======
     def get_today_stats(self):
-        """Get today's API usage stats"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        self.cursor.execute(
-            "SELECT request_count FROM api_daily_usage WHERE date = ?",
-            (today,)
-        )
-        result = self.cursor.fetchone()
+        """Get today's API usage stats, with the budget left per priority"""
+        count, used, provider_limit, provider_remaining = quota_counter.snapshot()
+        used = {priority: used.get(priority, 0) for priority in PRIORITIES}
         
-        if result:
-            count = result[0]
-            remaining = 100 - count
-            return {
-                "used": count,
-                "remaining": remaining,
-                "percentage": (count / 100) * 100
+        remaining = quota_remaining(used, count)
+        return {
+            "used": count,
+            "limit": MAX_DAILY_API_REQUESTS,
+            "provider_limit": provider_limit,
+            "provider_remaining": provider_remaining,
+            "remaining": max(0, MAX_DAILY_API_REQUESTS - count),
+            "percentage": (count / MAX_DAILY_API_REQUESTS) * 100,
+            "emergency": is_emergency(count),
+            "priorities": {
+                priority: {"used": used[priority], "remaining": remaining[priority]}
+                for priority in PRIORITIES
             }
-        
-        return {"used": 0, "remaining": 100, "percentage": 0}
+        }
     
     def cleanup_old_cache(self):
         """Remove cache older than 2 days"""
         cutoff = (datetime.now() - timedelta(days=2)).isoformat()
         
-        self.cursor.execute(
-            "DELETE FROM cached_odds WHERE last_updated < ?",
-            (cutoff,)
-        )
-        self.cursor.execute(
-            "DELETE FROM cached_results WHERE last_checked < ?",
-            (cutoff,)
-        )
-        
-        deleted = self.cursor.rowcount
-        self.conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM cached_odds WHERE last_updated < ?",
+                (cutoff,)
+            )
+            cursor.execute(
+                "DELETE FROM cached_results WHERE last_checked < ?",
+                (cutoff,)
+            )
+            
+            deleted = cursor.rowcount
         
         if deleted > 0:
             print(f"[APILimiter] Cleaned up {deleted} old cache entries")
-    
-    def reset_daily_counter(self):
-        """Reset counter at midnight"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        self.cursor.execute(
-            "INSERT OR IGNORE INTO api_daily_usage (date, request_count) VALUES (?, 0)",
-            (today,)
-        )
-        self.conn.commit()
 
 # Create global instance
 api_limiter = APILimiter()
\ No newline at end of file
@@ -0,0 +1,67 @@
+# async_db.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from config import MAX_DB_CONNECTIONS
+from db import get_connection
+
+# All SQLite work coming from Telegram handlers runs on these dedicated
+# worker threads, so a slow query never blocks the bot's event loop.
+# One worker per pooled connection: each task borrows its own connection.
+_executor = ThreadPoolExecutor(max_workers=MAX_DB_CONNECTIONS, thread_name_prefix="db-worker")
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking (database-bound) callable on a DB worker thread"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+# ======================
+# SYNC HELPERS (run on the worker threads)
+# ======================
+def _fetch_one(sql, params):
+    with get_connection() as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+def _fetch_all(sql, params):
+    with get_connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def _execute(sql, params):
+    with get_connection() as conn:
+        return conn.execute(sql, params).lastrowid
+
+
+def _execute_transaction(statements):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for sql, params in statements:
+            cursor.execute(sql, params)
+        return cursor.lastrowid
+
+
+# ======================
+# ASYNC API (awaited by handlers)
+# ======================
+async def fetch_one(sql, params=()):
+    """Execute a query and return the first row"""
+    return await run_db(_fetch_one, sql, params)
+
+
+async def fetch_all(sql, params=()):
+    """Execute a query and return all rows"""
+    return await run_db(_fetch_all, sql, params)
+
+
+async def execute(sql, params=()):
+    """Execute a single write statement, commit, and return lastrowid"""
+    return await run_db(_execute, sql, params)
+
+
+async def execute_transaction(statements):
+    """Execute several (sql, params) write statements in one commit"""
+    return await run_db(_execute_transaction, list(statements))
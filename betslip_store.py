@@ -0,0 +1,283 @@
+# betslip_store.py
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from db import get_connection
+from config import BETSLIP_IDLE_TTL_MINUTES, MATCH_GRACE_PERIOD_MINUTES
+
+class Selection:
+    """One bet slip leg; __slots__ keeps a six-figure number of open slips small"""
+    __slots__ = ("fixture_id", "market", "pick", "odds")
+
+    def __init__(self, fixture_id, market, pick, odds):
+        self.fixture_id = fixture_id
+        self.market = market
+        self.pick = pick
+        self.odds = odds
+
+    def __getitem__(self, key):
+        # Handlers still read legs as s["fixture_id"], s["odds"], ...
+        return getattr(self, key)
+
+    def as_dict(self):
+        return {
+            "fixture_id": self.fixture_id,
+            "market": self.market,
+            "pick": self.pick,
+            "odds": self.odds
+        }
+
+class _Slip:
+    __slots__ = ("selections", "last_used")
+
+    def __init__(self, selections):
+        # {fixture_id: Selection} - one leg per match is a dict lookup
+        self.selections = selections
+        self.last_used = time.monotonic()
+
+class BetSlipStore:
+    """
+    Bet slips persisted in the betslip table behind a write-behind RAM layer.
+    Changes only mark the user dirty; flush() writes dirty slips back in one
+    transaction. Slips idle for BETSLIP_IDLE_TTL_MINUTES are dropped from RAM
+    (their rows stay, so the next visit reloads them).
+    """
+
+    def __init__(self, idle_ttl_seconds=BETSLIP_IDLE_TTL_MINUTES * 60):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._slips = OrderedDict()  # user_id -> _Slip, least recently used first
+        self._dirty = set()
+        self._lock = threading.Lock()
+        # Serializes flushes so an older snapshot never lands after a newer one
+        self._flush_lock = threading.Lock()
+        # Kickoffs up to here have already been pruned
+        self._pruned_until = 0
+        # Called with {user_id: ["Home vs Away", ...]} after legs are pruned
+        self._pruned_listeners = []
+
+    # ====== RAM LAYER ======
+    def _get(self, user_id):
+        """The user's _Slip, loaded from SQLite on first use (call without _lock)"""
+        with self._lock:
+            slip = self._slips.get(user_id)
+            if slip is not None:
+                slip.last_used = time.monotonic()
+                self._slips.move_to_end(user_id)
+                return slip
+
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT fixture_id, market, pick, odds FROM betslip WHERE user_id = ? ORDER BY rowid",
+                (user_id,)
+            ).fetchall()
+
+        with self._lock:
+            # Another thread may have loaded it meanwhile - keep theirs
+            slip = self._slips.get(user_id)
+            if slip is None:
+                slip = _Slip({row[0]: Selection(*row) for row in rows})
+                self._slips[user_id] = slip
+            slip.last_used = time.monotonic()
+            self._slips.move_to_end(user_id)
+            return slip
+
+    def selections(self, user_id):
+        """Legs in the order they were added"""
+        slip = self._get(user_id)
+        with self._lock:
+            return list(slip.selections.values())
+
+    def add(self, user_id, fixture_id, market, pick, odds):
+        """False when the fixture is already on the slip"""
+        slip = self._get(user_id)
+        with self._lock:
+            if fixture_id in slip.selections:
+                return False
+            slip.selections[fixture_id] = Selection(fixture_id, market, pick, odds)
+            self._dirty.add(user_id)
+            return True
+
+    def remove(self, user_id, fixture_id):
+        """False when the fixture was not on the slip"""
+        slip = self._get(user_id)
+        with self._lock:
+            if slip.selections.pop(fixture_id, None) is None:
+                return False
+            self._dirty.add(user_id)
+            return True
+
+    def clear(self, user_id):
+        with self._lock:
+            self._slips[user_id] = _Slip({})
+            self._slips.move_to_end(user_id)
+            self._dirty.add(user_id)
+
+    def take(self, user_id):
+        """Empty the slip and return its legs in one step (bet placement)"""
+        slip = self._get(user_id)
+        with self._lock:
+            selections = list(slip.selections.values())
+            if selections:
+                slip.selections = {}
+                self._dirty.add(user_id)
+            return selections
+
+    def restore(self, user_id, selections):
+        """Put taken legs back in front of anything added since"""
+        if not selections:
+            return
+        slip = self._get(user_id)
+        with self._lock:
+            restored = {s.fixture_id: s for s in selections}
+            for fixture_id, s in slip.selections.items():
+                restored.setdefault(fixture_id, s)
+            slip.selections = restored
+            self._dirty.add(user_id)
+
+    # ====== WRITE-BEHIND ======
+    def _write(self, user_ids):
+        """Replace the betslip rows of user_ids with their RAM state"""
+        with self._lock:
+            snapshot = []
+            for user_id in user_ids:
+                slip = self._slips.get(user_id)
+                if slip is not None and user_id in self._dirty:
+                    self._dirty.discard(user_id)
+                    snapshot.append((user_id, list(slip.selections.values())))
+        if not snapshot:
+            return 0
+
+        try:
+            with get_connection() as conn:
+                conn.executemany(
+                    "DELETE FROM betslip WHERE user_id = ?",
+                    [(user_id,) for user_id, _ in snapshot]
+                )
+                conn.executemany(
+                    "INSERT INTO betslip (user_id, fixture_id, market, pick, odds) VALUES (?, ?, ?, ?, ?)",
+                    [(user_id, s.fixture_id, s.market, s.pick, s.odds)
+                     for user_id, legs in snapshot for s in legs]
+                )
+        except Exception:
+            # Try again on the next flush
+            with self._lock:
+                self._dirty.update(user_id for user_id, _ in snapshot)
+            raise
+        return len(snapshot)
+
+    def flush(self):
+        """Write every dirty slip back to SQLite"""
+        with self._flush_lock:
+            with self._lock:
+                dirty = list(self._dirty)
+            return self._write(dirty)
+
+    def flush_user(self, user_id):
+        """Write one user's slip now (e.g. straight after a bet is placed)"""
+        with self._flush_lock:
+            return self._write([user_id])
+
+    def sweep(self):
+        """Scheduler job: flush dirty slips, then drop idle ones from RAM"""
+        with self._flush_lock:
+            with self._lock:
+                dirty = list(self._dirty)
+            written = self._write(dirty)
+
+            cutoff = time.monotonic() - self.idle_ttl_seconds
+            evicted = 0
+            with self._lock:
+                # Oldest first - stop at the first slip still in use
+                while self._slips:
+                    user_id, slip = next(iter(self._slips.items()))
+                    if slip.last_used > cutoff or user_id in self._dirty:
+                        break
+                    del self._slips[user_id]
+                    evicted += 1
+                active = len(self._slips)
+
+        if written or evicted:
+            print(f"[BetSlip] Flushed {written} slips, evicted {evicted} idle ({active} in memory)")
+
+    # ====== EXPIRY ======
+    def on_pruned(self, callback):
+        """Register callback({user_id: [match names]}) to run after legs are pruned"""
+        self._pruned_listeners.append(callback)
+
+    def prune_started(self):
+        """
+        Remove legs whose matches are past the betting grace period.
+        Walks the fixtures kickoff index from the previous cutoff, then betslip
+        by fixture_id. Legs the window can't reach - fixtures the cleanup
+        deleted, marked TIME_EXPIRED / POSTPONED, or (re)scheduled behind the
+        cutoff - are swept by status in the same pass.
+        """
+        cutoff = int(time.time()) - MATCH_GRACE_PERIOD_MINUTES * 60
+        with self._flush_lock:
+            # Legs added since the last sweep must be visible to the join
+            with self._lock:
+                dirty = list(self._dirty)
+            self._write(dirty)
+
+            with get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT b.user_id, b.fixture_id, t1.name, t2.name
+                    FROM fixtures f
+                    JOIN betslip b ON b.fixture_id = f.fixture_id
+                    LEFT JOIN teams t1 ON f.home_team_id = t1.team_id
+                    LEFT JOIN teams t2 ON f.away_team_id = t2.team_id
+                    WHERE f.kickoff_ts > ? AND f.kickoff_ts <= ?
+                ''', (self._pruned_until, cutoff)).fetchall()
+                # No fixtures row left, or no longer open for betting
+                rows += conn.execute('''
+                    SELECT b.user_id, b.fixture_id,
+                           COALESCE(t1.name, r.home_team), COALESCE(t2.name, r.away_team)
+                    FROM betslip b
+                    LEFT JOIN fixtures f ON f.fixture_id = b.fixture_id
+                    LEFT JOIN teams t1 ON f.home_team_id = t1.team_id
+                    LEFT JOIN teams t2 ON f.away_team_id = t2.team_id
+                    LEFT JOIN match_results r ON r.fixture_id = b.fixture_id
+                    WHERE f.fixture_id IS NULL OR f.status != 'NS'
+                ''').fetchall()
+                # A leg can turn up in both - report it once
+                rows = list({(row[0], row[1]): row for row in rows}.values())
+                if rows:
+                    conn.executemany(
+                        "DELETE FROM betslip WHERE user_id = ? AND fixture_id = ?",
+                        [(user_id, fixture_id) for user_id, fixture_id, _, _ in rows]
+                    )
+            self._pruned_until = cutoff
+
+            pruned = {}
+            with self._lock:
+                for user_id, fixture_id, home, away in rows:
+                    slip = self._slips.get(user_id)
+                    if slip is not None:
+                        slip.selections.pop(fixture_id, None)
+                    pruned.setdefault(user_id, []).append(f"{home or 'Home'} vs {away or 'Away'}")
+
+        if not pruned:
+            return 0
+
+        print(f"[BetSlip] Pruned {len(rows)} started selections from {len(pruned)} slips")
+        for callback in self._pruned_listeners:
+            try:
+                callback(pruned)
+            except Exception as e:
+                print(f"[BetSlip] Error in pruned listener: {e}")
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": len(self._slips),
+                "dirty": len(self._dirty),
+                "selections": sum(len(s.selections) for s in self._slips.values())
+            }
+
+# Create global instance
+betslip_store = BetSlipStore()
+
+# Don't lose slips changed since the last sweep on a clean shutdown
+atexit.register(betslip_store.flush)
\ No newline at end of file
@@ -1,59 +1,43 @@
 # betting.py
 import json
-from db import cursor, conn
-from config import MIN_BET, MAX_BET
-from api import fetch_fixture_result
+from db import get_connection, NOW_TS_SQL
+from config import MIN_BET, MAX_BET, MATCH_GRACE_PERIOD_MINUTES
+from results_db import (
+    results_db, is_settled, is_void, postponed_void_cutoff, SETTLED_STATUSES, POSTPONED_STATUS
+)
+from betslip_store import betslip_store
+from ledger import ledger
 from datetime import datetime, timedelta
 
 
 # =========================
-# BET SLIP (IN MEMORY)
+# BET SLIP (SQLITE + WRITE-BEHIND RAM LAYER)
 # =========================
-# { user_id: [ {fixture_id, market, pick, odds} ] }
-BET_SLIPS = {}
+# See betslip_store.py - legs are Selection records keyed by fixture_id
 
 
 def get_betslip(user_id: int):
-    if user_id not in BET_SLIPS:
-        BET_SLIPS[user_id] = []
-    return BET_SLIPS[user_id]
+    return betslip_store.selections(user_id)
 
 
 def add_selection(user_id: int, fixture_id: int, market: str, pick: str, odds: float):
-    slip = get_betslip(user_id)
-
     # Prevent duplicate fixture in accumulator
-    for s in slip:
-        if s["fixture_id"] == fixture_id:
-            return False, "❌ This match is already in your bet slip."
-
-    slip.append({
-        "fixture_id": fixture_id,
-        "market": market,
-        "pick": pick,
-        "odds": odds
-    })
+    if not betslip_store.add(user_id, fixture_id, market, pick, odds):
+        return False, "❌ This match is already in your bet slip."
 
     return True, "✅ Selection added to bet slip."
 
 
 def remove_selection(user_id: int, fixture_id: int):
     """Remove specific selection from bet slip"""
-    slip = get_betslip(user_id)
-    initial_length = len(slip)
-    
-    # Filter out the selection with the given fixture_id
-    new_slip = [s for s in slip if s["fixture_id"] != fixture_id]
-    
-    if len(new_slip) == initial_length:
+    if not betslip_store.remove(user_id, fixture_id):
         return False, "❌ Selection not found in bet slip."
     
-    BET_SLIPS[user_id] = new_slip
     return True, "✅ Selection removed from bet slip."
 
 
 def clear_betslip(user_id: int):
-    BET_SLIPS[user_id] = []
+    betslip_store.clear(user_id)
 
 
 # =========================
@@ -77,43 +61,82 @@ def place_bet(user_id: int, stake: float):
     if stake < MIN_BET or stake > MAX_BET:
         return False, f"❌ Stake must be between {MIN_BET} and {MAX_BET}"
 
-    selections = get_betslip(user_id)
+    # Claim the slip: a concurrent double-tap finds it empty
+    selections = betslip_store.take(user_id)
     if not selections:
         return False, "❌ Bet slip is empty."
 
-    cursor.execute("SELECT balance FROM users WHERE user_id=?", (user_id,))
-    row = cursor.fetchone()
-    if not row:
-        return False, "❌ User not found."
+    try:
+        placed, msg, started = _place_bet_transaction(user_id, stake, selections)
+    except Exception:
+        betslip_store.restore(user_id, selections)
+        raise
 
-    balance = row[0]
-    if balance < stake:
-        return False, "❌ Insufficient balance."
+    if not placed:
+        # Hand the legs back, minus any that have kicked off
+        betslip_store.restore(user_id, [s for s in selections if s.fixture_id not in started])
+        return False, msg
 
+    # Persist the emptied slip now rather than on the next sweep
+    betslip_store.flush_user(user_id)
+    return True, msg
+
+
+def _place_bet_transaction(user_id: int, stake: float, selections: list):
+    """
+    Debit and record a bet in one write transaction on a pooled connection.
+    Returns (placed, message, started_fixture_ids).
+    """
     total_odds = calculate_total_odds(selections)
     potential_win = calculate_potential_win(stake, total_odds)
 
-    # Deduct balance
-    cursor.execute(
-        "UPDATE users SET balance = balance - ? WHERE user_id=?",
-        (stake, user_id)
-    )
-
-    # Save bet
-    cursor.execute("""
-        INSERT INTO bets (user_id, selections, total_odds, stake, status, payout)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        user_id,
-        json.dumps(selections),
-        total_odds,
-        stake,
-        "PENDING",
-        potential_win
-    ))
-
-    conn.commit()
-    clear_betslip(user_id)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Legs can kick off between the expiry sweep and placement, and the
+        # cleanup deletes finished / cancelled fixtures outright - only legs
+        # on a fixture that is still open for betting may be placed
+        placeholders = ",".join("?" * len(selections))
+        cursor.execute(f"""
+            SELECT fixture_id FROM fixtures
+            WHERE fixture_id IN ({placeholders})
+            AND status = 'NS' AND kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
+        """, [s.fixture_id for s in selections])
+        bettable = {r[0] for r in cursor.fetchall()}
+        started = {s.fixture_id for s in selections} - bettable
+        if started:
+            return False, (
+                f"❌ {len(started)} match(es) in your slip already started or were called off and were removed. "
+                f"Review your bet slip and try again."
+            ), started
+
+        # Save bet
+        cursor.execute("""
+            INSERT INTO bets (user_id, selections, total_odds, stake, status, payout)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            user_id,
+            json.dumps([s.as_dict() for s in selections]),
+            total_odds,
+            stake,
+            "PENDING",
+            potential_win
+        ))
+        bet_id = cursor.lastrowid
+
+        # One row per leg for settlement and history
+        cursor.executemany("""
+            INSERT INTO bet_selections (bet_id, fixture_id, market, pick, odds)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(bet_id, s.fixture_id, s.market, s.pick, s.odds) for s in selections])
+
+        # Check and debit in one statement - two stakes can't both pass
+        if not ledger.post(cursor, user_id, "stake", -stake, bet_id, require_funds=True):
+            conn.rollback()
+            cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
+            if not cursor.fetchone():
+                return False, "❌ User not found.", started
+            return False, "❌ Insufficient balance.", started
 
     return True, (
         f"🎫 BET PLACED!\n\n"
@@ -121,100 +144,180 @@ def place_bet(user_id: int, stake: float):
         f"Total Odds: {total_odds}\n"
         f"Stake: {stake}\n"
         f"Potential Win: {potential_win}"
-    )
+    ), started
 
 
 # =========================
-# AUTO BET SETTLEMENT - UPDATED FOR MULTIPLE OVER/UNDER LINES
+# AUTO BET SETTLEMENT - EVENT DRIVEN
 # =========================
-# betting.py - CORRECTED SETTLEMENT FUNCTION
-def settle_finished_matches():
+# Grades every open leg on one fixture. :home / :away are its final score.
+# 1X2: "1" home win, "X" draw, "2" away win.
+# OU:  "Over 2.5" wins above the line, "Under 2.5" below it.
+# Anything else can't be shown to have won, so it loses.
+_GRADE_SELECTIONS_SQL = """
+    UPDATE bet_selections SET outcome = CASE
+        WHEN market = '1X2' THEN
+            CASE WHEN (pick = '1' AND :home > :away)
+                   OR (pick = 'X' AND :home = :away)
+                   OR (pick = '2' AND :home < :away)
+                 THEN 'WON' ELSE 'LOST' END
+        WHEN market = 'OU' AND pick LIKE 'Over %' THEN
+            CASE WHEN :home + :away > CAST(substr(pick, 6) AS REAL) THEN 'WON' ELSE 'LOST' END
+        WHEN market = 'OU' AND pick LIKE 'Under %' THEN
+            CASE WHEN :home + :away < CAST(substr(pick, 7) AS REAL) THEN 'WON' ELSE 'LOST' END
+        ELSE 'LOST'
+    END
+    WHERE fixture_id = :fixture_id AND outcome IS NULL
+"""
+
+
+def _reprice_void_legs(conn, fixture_id: int):
+    """Void legs count at odds 1.0 - recompute pending bets on fixture_id"""
+    bets = {}
+    for bet_id, stake, odds, outcome in conn.execute("""
+        SELECT b.bet_id, b.stake, s.odds, s.outcome
+        FROM bets b
+        JOIN bet_selections s ON s.bet_id = b.bet_id
+        WHERE b.status = 'PENDING'
+        AND b.bet_id IN (SELECT bet_id FROM bet_selections WHERE fixture_id = ?)
+    """, (fixture_id,)):
+        legs = bets.setdefault(bet_id, (stake, []))[1]
+        if outcome != 'VOID':
+            legs.append({"odds": odds})
+
+    repriced = []
+    for bet_id, (stake, legs) in bets.items():
+        total_odds = calculate_total_odds(legs)
+        repriced.append((total_odds, calculate_potential_win(stake, total_odds), bet_id))
+    conn.executemany("UPDATE bets SET total_odds = ?, payout = ? WHERE bet_id = ?", repriced)
+
+
+def settle_fixture(fixture_id: int):
     """
-    Runs periodically.
-    Checks all PENDING bets and settles them if all matches are finished.
+    Settle everything riding on one finished fixture, set-based, in one
+    transaction: grade its legs, lose every pending bet with a lost leg,
+    win every pending bet whose legs have all won (void legs count at
+    odds 1.0, all-void bets are refunded as VOID), and credit the
+    winners with one aggregated balance UPDATE.
+    Called by results_db when a final or void result is saved. Returns bets settled.
     """
-
-    cursor.execute("""
-        SELECT bet_id, user_id, selections, stake, total_odds, payout
-        FROM bets
-        WHERE status='PENDING'
-    """)
-    bets = cursor.fetchall()
-
-    for bet_id, user_id, selections_json, stake, total_odds, payout in bets:
-        selections = json.loads(selections_json)
-
-        all_finished = True
-        lost = False
-
-        for s in selections:
-            result = fetch_fixture_result(s["fixture_id"])
-            
-            if not result:
-                all_finished = False
-                break
-
-            # CORRECTED LINES HERE: Use .get() method properly
-            home_goals = result.get("home_goals", 0) # Changed from result.get["home_goals"]
-            away_goals = result.get("away_goals", 0)  # Changed from result.get["away_goals"]
-            status = result.get("status", "NS")         # Added default value
-            
-            # Make sure match is actually finished
-            if status != 'FT':
-                all_finished = False
-                break
-            
-            total_goals = home_goals + away_goals
-            
-            # === BET SETTLEMENT LOGIC ===
-            
-            # 1. Handle 1X2 Market
-            if s["market"] == "1X2":
-                if s["pick"] == "1" and not (home_goals > away_goals):
-                    lost = True
-                elif s["pick"] == "X" and not (home_goals == away_goals):
-                    lost = True
-                elif s["pick"] == "2" and not (home_goals < away_goals):
-                    lost = True
-
-            # 2. Handle Over/Under Market (OU)
-            elif s["market"] == "OU":
-                # s["pick"] looks like "Over 1.5" or "Under 2.5"
-                type_, line = s["pick"].split(" ")  # Splits "Over" and "1.5"
-                line = float(line)
-                
-                if type_ == "Over":
-                    if not (total_goals > line):
-                        lost = True
-                elif type_ == "Under":
-                    if not (total_goals < line):
-                        lost = True
-
-            if lost:
-                break
-
-        # If not all matches finished → skip
-        if not all_finished:
-            continue
-
-        if lost:
-            cursor.execute(
-                "UPDATE bets SET status='LOST' WHERE bet_id=?",
-                (bet_id,)
+    with get_connection() as conn:
+        result = conn.execute(
+            "SELECT home_goals, away_goals, status, match_date FROM match_results WHERE fixture_id=?",
+            (fixture_id,)
+        ).fetchone()
+        if not result or not is_settled(result[2], result[3]):
+            return 0
+
+        if is_void(result[2], result[3]):
+            conn.execute(
+                "UPDATE bet_selections SET outcome = 'VOID' WHERE fixture_id = ? AND outcome IS NULL",
+                (fixture_id,)
             )
-            print(f"[Betting] Bet #{bet_id} LOST")
+            _reprice_void_legs(conn, fixture_id)
         else:
-            cursor.execute(
-                "UPDATE bets SET status='WON' WHERE bet_id=?",
-                (bet_id,)
+            conn.execute(_GRADE_SELECTIONS_SQL, {
+                "fixture_id": fixture_id,
+                "home": result[0] or 0,
+                "away": result[1] or 0
+            })
+
+        # A lost leg settles the accumulator even if other legs are unplayed
+        lost = conn.execute("""
+            UPDATE bets SET status = 'LOST'
+            WHERE status = 'PENDING'
+            AND bet_id IN (SELECT bet_id FROM bet_selections WHERE fixture_id = ?)
+            AND EXISTS (
+                SELECT 1 FROM bet_selections s
+                WHERE s.bet_id = bets.bet_id AND s.outcome = 'LOST'
+            )
+        """, (fixture_id,)).rowcount
+
+        # Winners: pending bets on this fixture with every leg graded WON or VOID
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS settle_winners (
+                bet_id INTEGER PRIMARY KEY,
+                user_id INTEGER,
+                payout REAL
+            )
+        """)
+        conn.execute("DELETE FROM settle_winners")
+        conn.execute("""
+            INSERT INTO settle_winners (bet_id, user_id, payout)
+            SELECT b.bet_id, b.user_id, b.payout
+            FROM bets b
+            WHERE b.status = 'PENDING'
+            AND b.bet_id IN (SELECT bet_id FROM bet_selections WHERE fixture_id = ?)
+            AND NOT EXISTS (
+                SELECT 1 FROM bet_selections s
+                WHERE s.bet_id = b.bet_id AND (s.outcome IS NULL OR s.outcome NOT IN ('WON', 'VOID'))
+            )
+        """, (fixture_id,))
+
+        # Every leg void: the stake comes back as the payout
+        won = conn.execute("""
+            UPDATE bets SET status = CASE
+                WHEN EXISTS (
+                    SELECT 1 FROM bet_selections s
+                    WHERE s.bet_id = bets.bet_id AND s.outcome = 'WON'
+                ) THEN 'WON' ELSE 'VOID'
+            END
+            WHERE bet_id IN (SELECT bet_id FROM settle_winners)
+        """).rowcount
+
+        # One credit per user, keyed for the balance UPDATE below
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS settle_credits (
+                user_id INTEGER PRIMARY KEY,
+                amount REAL
             )
-            cursor.execute(
-                "UPDATE users SET balance = balance + ? WHERE user_id=?",
-                (payout, user_id)
+        """)
+        conn.execute("DELETE FROM settle_credits")
+        conn.execute("""
+            INSERT INTO settle_credits (user_id, amount)
+            SELECT user_id, SUM(payout) FROM settle_winners GROUP BY user_id
+        """)
+
+        conn.execute("""
+            UPDATE users SET balance = balance + (
+                SELECT c.amount FROM settle_credits c WHERE c.user_id = users.user_id
             )
-            print(f"[Betting] Bet #{bet_id} WON! Payout: {payout}")
+            WHERE user_id IN (SELECT user_id FROM settle_credits)
+        """)
+        total_payout = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM settle_credits").fetchone()[0]
+        ledger.record_payouts(conn.cursor(), "settle_winners")
+        conn.execute("DELETE FROM settle_winners")
+        conn.execute("DELETE FROM settle_credits")
 
-        conn.commit()
+    if won or lost:
+        print(f"[Betting] Fixture {fixture_id} settled: {won} WON/VOID (payout {total_payout}), {lost} LOST")
+    return won + lost
+
+
+def settle_finished_matches():
+    """
+    Backstop sweep (startup + hourly).
+    Settles pending bets for fixtures that already have a final or void
+    result, in case a settlement event was missed. No API calls.
+    """
+    placeholders = ",".join("?" * len(SETTLED_STATUSES))
+    with get_connection() as conn:
+        fixture_ids = [row[0] for row in conn.execute(f"""
+            SELECT DISTINCT s.fixture_id
+            FROM bet_selections s
+            JOIN bets b ON b.bet_id = s.bet_id
+            JOIN match_results r ON r.fixture_id = s.fixture_id
+            WHERE b.status = 'PENDING'
+            AND (r.status IN ({placeholders}) OR (r.status = ? AND r.match_date <= ?))
+        """, (*SETTLED_STATUSES, POSTPONED_STATUS, postponed_void_cutoff()))]
+
+    settled = sum(settle_fixture(fixture_id) for fixture_id in fixture_ids)
+    if settled:
+        print(f"[Betting] Backstop settled {settled} bets")
+
+
+# Settle as soon as a final score is recorded
+results_db.on_final_result(settle_fixture)
 
 # =========================
 # LEAGUE-BASED FUNCTIONS - NEW
@@ -227,53 +330,92 @@ def get_matches_by_league(league_id: int, day_offset: int = 0):
     
     target_date = (datetime.now() + timedelta(days=day_offset)).strftime("%Y-%m-%d")
     
-    cursor.execute(f"""
-        SELECT f.fixture_id, t1.name as home, t2.name as away, 
-               f.start_time, l.name as league_name
-        FROM fixtures f
-        JOIN teams t1 ON f.home_team_id = t1.team_id
-        JOIN teams t2 ON f.away_team_id = t2.team_id
-        JOIN leagues l ON f.league_id = l.league_id
-        WHERE f.league_id = ? 
-        AND date(f.start_time) = date(?)
-        AND f.status = 'NS'
-        AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
-        ORDER BY f.start_time
-        LIMIT 50
-    """, (league_id, target_date))
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT f.fixture_id, t1.name as home, t2.name as away, 
+                   f.start_time, l.name as league_name
+            FROM fixtures f
+            JOIN teams t1 ON f.home_team_id = t1.team_id
+            JOIN teams t2 ON f.away_team_id = t2.team_id
+            JOIN leagues l ON f.league_id = l.league_id
+            WHERE f.league_id = ? 
+            AND f.status = 'NS'
+            AND f.match_day = ?
+            AND f.kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
+            ORDER BY f.kickoff_ts
+            LIMIT 50
+        """, (league_id, target_date)).fetchall()
     
-    return cursor.fetchall()
+    return rows
+
+def get_bet_selections(bet_ids):
+    """
+    Legs of several bets with team and league names, in one query.
+    Returns {bet_id: [selection dict, ...]} in placement order.
+    """
+    if not bet_ids:
+        return {}
+
+    placeholders = ",".join("?" * len(bet_ids))
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT s.bet_id, s.fixture_id, s.market, s.pick, s.odds, s.outcome,
+                   t1.name as home, t2.name as away, l.name as league_name
+            FROM bet_selections s
+            LEFT JOIN fixtures f ON f.fixture_id = s.fixture_id
+            LEFT JOIN teams t1 ON f.home_team_id = t1.team_id
+            LEFT JOIN teams t2 ON f.away_team_id = t2.team_id
+            LEFT JOIN leagues l ON f.league_id = l.league_id
+            WHERE s.bet_id IN ({placeholders})
+            ORDER BY s.bet_id, s.selection_id
+        """, tuple(bet_ids)).fetchall()
+
+    selections = {bet_id: [] for bet_id in bet_ids}
+    for bet_id, fixture_id, market, pick, odds, outcome, home, away, league_name in rows:
+        selections[bet_id].append({
+            "fixture_id": fixture_id,
+            "market": market,
+            "pick": pick,
+            "odds": odds,
+            "outcome": outcome,
+            "home": home,
+            "away": away,
+            "league_name": league_name
+        })
+    return selections
 
 def get_popular_leagues(limit: int = 10):
     """Get most popular leagues (with most upcoming matches)"""
-    cursor.execute("""
-        SELECT l.league_id, l.name, l.country, COUNT(f.fixture_id) as match_count
-        FROM leagues l
-        LEFT JOIN fixtures f ON l.league_id = f.league_id
-        WHERE f.status = 'NS'
-        AND datetime(f.start_time) > datetime('now')
-        GROUP BY l.league_id
-        ORDER BY match_count DESC
-        LIMIT ?
-    """, (limit,))
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT l.league_id, l.name, l.country, COUNT(f.fixture_id) as match_count
+            FROM leagues l
+            LEFT JOIN fixtures f ON l.league_id = f.league_id
+            WHERE f.status = 'NS'
+            AND f.kickoff_ts > {NOW_TS_SQL}
+            GROUP BY l.league_id
+            ORDER BY match_count DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
     
-    return cursor.fetchall()
+    return rows
 
 def get_league_info(league_id: int):
     """Get detailed information about a league"""
-    cursor.execute("""
-        SELECT l.league_id, l.name, l.country, l.logo_url,
-               COUNT(DISTINCT t.team_id) as team_count,
-               COUNT(f.fixture_id) as upcoming_matches
-        FROM leagues l
-        LEFT JOIN teams t ON EXISTS (
-            SELECT 1 FROM fixtures f 
-            WHERE f.league_id = l.league_id 
-            AND (f.home_team_id = t.team_id OR f.away_team_id = t.team_id)
-        )
-        LEFT JOIN fixtures f ON l.league_id = f.league_id AND f.status = 'NS'
-        WHERE l.league_id = ?
-        GROUP BY l.league_id
-    """, (league_id,))
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT l.league_id, l.name, l.country, l.logo_url,
+                   COUNT(DISTINCT t.team_id) as team_count,
+                   COUNT(f.fixture_id) as upcoming_matches
+            FROM leagues l
+            LEFT JOIN teams t ON EXISTS (
+                SELECT 1 FROM fixtures f 
+                WHERE f.league_id = l.league_id 
+                AND (f.home_team_id = t.team_id OR f.away_team_id = t.team_id)
+            )
+            LEFT JOIN fixtures f ON l.league_id = f.league_id AND f.status = 'NS'
+            WHERE l.league_id = ?
+            GROUP BY l.league_id
+        """, (league_id,)).fetchone()
     
-    return cursor.fetchone()
\ No newline at end of file
+    return row
\ No newline at end of file
@@ -12,18 +12,22 @@ from telegram.ext import (
     ContextTypes,
     filters
 )
+from telegram.error import RetryAfter
 import os
 import uuid
-import json
+import asyncio
+from functools import partial
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
-# UPDATED: Changed import to use fetch_match_odds instead of fetch_1x2_odds
-from cache_manager import cache
-from config import BOT_TOKEN, START_BALANCE, ADMIN_USER_ID, TELEBIRR_ACCOUNT, CBE_ACCOUNT, MIN_DEPOSIT, MIN_WITHDRAWAL, MAX_LEAGUES_PER_PAGE, DEFAULT_ACTIVE_LEAGUES, MATCH_GRACE_PERIOD_MINUTES, ODDS_ADJUSTMENT
-from db import init_db, cursor, conn
+from cache_manager import cache, cache_stats
+from api_limiter import api_limiter, ODDS_FRESH_HOURS
+from config import BOT_TOKEN, ADMIN_USER_ID, TELEBIRR_ACCOUNT, CBE_ACCOUNT, MIN_DEPOSIT, MIN_WITHDRAWAL, EMERGENCY_FALLBACK_LEAGUES, MATCH_GRACE_PERIOD_MINUTES, ODDS_ADJUSTMENT, NOTIFY_CHAT_BURST
+from db import init_db, NOW_TS_SQL
+from async_db import run_db, fetch_one, fetch_all, execute_transaction
 from scheduler import start_scheduler
-from api import fetch_match_odds, fetch_fixture_result, fetch_leagues, fetch_league_fixtures
+from menu_cache import league_menu, render_cache, fixture_set_version
+from api import get_match_odds_swr, fetch_leagues, fetch_league_fixtures
 from betting import (
     add_selection,
     get_betslip,
@@ -33,86 +37,29 @@ from betting import (
     remove_selection,
     get_matches_by_league,
     get_popular_leagues,
-    get_league_info
+    get_league_info,
+    get_bet_selections
 )
 
 # NEW: Import results database
 from results_db import results_db
+from betslip_store import betslip_store
+from ledger import ledger, ledger_day
+from notifier import notifier
+from image_archive import image_archive, IMAGE_DIR
 
 # ======================
 # IMAGE HANDLING FUNCTIONS - UPDATED WITH PROPER ERROR HANDLING
 # ======================
 def ensure_image_directory():
     """Create image directory if it doesn't exist"""
-    os.makedirs("transaction_images", exist_ok=True)
-
-async def save_transaction_image(photo_file, transaction_id, user_id):
-    """Save transaction image to file with validation and return filename"""
-    ensure_image_directory()
-    
-    # Validate file size and type
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-    ALLOWED_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-    
-    try:
-        # Check file size if available
-        if hasattr(photo_file, 'file_size') and photo_file.file_size > MAX_FILE_SIZE:
-            raise ValueError(f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB")
-        
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_ext = '.jpg'  # Default extension
-        filename = f"deposit_{user_id}_{transaction_id}_{timestamp}{file_ext}"
-        filepath = os.path.join("transaction_images", filename)
-        
-        # Download and save the image - USE AWAIT
-        await photo_file.download_to_drive(filepath)
-        
-        # Verify file was saved
-        if not os.path.exists(filepath):
-            raise IOError("Failed to save image file")
-        
-        # Check file size after download
-        file_size = os.path.getsize(filepath)
-        if file_size == 0:
-            os.remove(filepath)
-            raise ValueError("Downloaded file is empty")
-        
-        if file_size > MAX_FILE_SIZE:
-            os.remove(filepath)
-            raise ValueError(f"File too large after download: {file_size // 1024}KB")
-        
-        print(f"✅ Saved transaction image: {filename} ({file_size // 1024}KB)")
-        return filename
-        
-    except Exception as e:
-        print(f"❌ Error saving image file: {e}")
-        # Clean up any partial file
-        if 'filepath' in locals() and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except:
-                pass
-        return None
-
-def delete_transaction_image(filename):
-    """Delete transaction image file"""
-    try:
-        if filename:
-            filepath = os.path.join("transaction_images", filename)
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                print(f"✅ Deleted image file: {filename}")
-                return True
-    except Exception as e:
-        print(f"❌ Error deleting image file {filename}: {e}")
-    return False
+    os.makedirs(IMAGE_DIR, exist_ok=True)
 
 async def apistats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show API usage statistics"""
     try:
         from api_limiter import api_limiter
-        stats = api_limiter.get_today_stats()
+        stats = await run_db(api_limiter.get_today_stats)
         
         text = f"📊 *API Usage Today*\n\n"
         text += f"• Requests Used: `{stats['used']}/100`\n"
@@ -129,118 +76,96 @@ async def apistats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"Error getting API stats: {e}")
         
-def get_image_file(filename):
-    """Get image file object"""
-    if not filename:
-        return None
-    
+async def send_transaction_card(bot, chat_id, text, keyboard, photo=None, photo_is_file_id=False):
+    """
+    Send one pending transaction to the admin. photo is a Telegram file_id
+    or a local filename; returns the file_id Telegram gave a fresh upload.
+    """
     try:
-        filepath = os.path.join("transaction_images", filename)
-        if os.path.exists(filepath):
-            return open(filepath, 'rb')
-        else:
-            print(f"❌ Image file not found: {filepath}")
+        if photo and photo_is_file_id:
+            await bot.send_photo(
+                chat_id=chat_id,
+                photo=photo,
+                caption=text,
+                parse_mode="Markdown",
+                reply_markup=keyboard
+            )
             return None
+        
+        if photo:
+            data = await asyncio.to_thread(image_archive.read, photo)
+            if data:
+                message = await bot.send_photo(
+                    chat_id=chat_id,
+                    photo=data,
+                    caption=text,
+                    parse_mode="Markdown",
+                    reply_markup=keyboard
+                )
+                return message.photo[-1].file_id
+            text = f"{text}\n\n⚠️ *Note:* Screenshot file not found on server."
+        
+        await bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            parse_mode="Markdown",
+            reply_markup=keyboard
+        )
+        return None
+    except RetryAfter:
+        # The dispatcher waits and retries
+        raise
     except Exception as e:
-        print(f"❌ Error opening image file {filename}: {e}")
+        print(f"Error sending transaction card: {e}")
+        # Try without photo
+        await bot.send_message(
+            chat_id=chat_id,
+            text=f"{text}\n\n⚠️ Error loading transaction details.",
+            parse_mode="Markdown",
+            reply_markup=keyboard
+        )
         return None
+
 async def apistats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show API usage statistics"""
     from api_limiter import api_limiter
-    stats = api_limiter.get_today_stats()
+    stats = await run_db(api_limiter.get_today_stats)
     
     text = f"📊 *API Usage Today*\n\n"
-    text += f"• Requests Used: `{stats['used']}/100`\n"
+    text += f"• Requests Used: `{stats['used']}/{stats['limit']}`\n"
     text += f"• Remaining: `{stats['remaining']}`\n"
-    text += f"• Usage: `{stats['percentage']:.1f}%`\n\n"
-    
-    if stats['remaining'] < 20:
+    text += f"• Usage: `{stats['percentage']:.1f}%`\n"
+    if stats['provider_remaining'] is not None:
+        text += f"• Provider reports: `{stats['provider_remaining']}/{stats['provider_limit']}` left\n"
+    text += "\n"
+    
+    # What each priority may still spend today
+    for priority, budget in stats['priorities'].items():
+        text += f"• {priority.title()}: `{budget['used']}` used, `{budget['remaining']}` left\n"
+    text += "\n"
+    
+    if stats['emergency']:
+        placeholders = ",".join("?" * len(EMERGENCY_FALLBACK_LEAGUES))
+        leagues = await fetch_all(
+            f"SELECT name FROM leagues WHERE league_id IN ({placeholders})", EMERGENCY_FALLBACK_LEAGUES
+        )
+        text += "🚨 *Emergency mode:* background updates paused, new odds only for "
+        text += (", ".join(name for (name,) in leagues) or "fallback leagues") + "\n\n"
+    elif stats['remaining'] < 20:
         text += "⚠️ *Warning:* API usage is high\n"
     
+    # In-memory cache tiers
+    for c in cache_stats():
+        text += f"💾 {c['name']} cache: `{c['hit_rate']:.0f}%` hits ({c['size']}/{c['max_size']})\n"
+    
     text += "🔄 Resets at midnight (00:00 UTC)"
     await update.message.reply_text(text, parse_mode="Markdown")
-def cleanup_old_images():
-    """Clean up old processed transaction images (optional)"""
-    ensure_image_directory()
-    
-    # Get all processed transaction image filenames from database
-    cursor.execute("SELECT image_filename FROM transactions WHERE status != 'pending' AND image_filename IS NOT NULL")
-    processed_images = cursor.fetchall()
-    
-    deleted_count = 0
-    for (filename,) in processed_images:
-        if delete_transaction_image(filename):
-            deleted_count += 1
+async def cleanup_old_images():
+    """Clean up processed transaction images past their retention (optional)"""
+    deleted_count, _ = await asyncio.to_thread(image_archive.purge)
     
     print(f"🧹 Cleaned up {deleted_count} old transaction images")
 
-# ======================
-# HELPER FUNCTIONS
-# ======================
-def get_country_flag(country_name: str) -> str:
-    """Get appropriate flag emoji for country"""
-    flag_map = {
-        # Comprehensive country flag mapping
-        "England": "🏴󠁧󠁢󠁥󠁮󠁧󠁿",
-        "Spain": "🇪🇸", 
-        "Italy": "🇮🇹",
-        "Germany": "🇩🇪",
-        "France": "🇫🇷",
-        "Portugal": "🇵🇹",
-        "Netherlands": "🇳🇱",
-        "Brazil": "🇧🇷",
-        "Argentina": "🇦🇷",
-        "USA": "🇺🇸",
-        "Mexico": "🇲🇽",
-        "Turkey": "🇹🇷",
-        "Russia": "🇷🇺",
-        "Ukraine": "🇺🇦",
-        "Scotland": "🏴󠁧󠁢󠁳󠁣󠁴󠁿",
-        "Belgium": "🇧🇪",
-        "Austria": "🇦🇹",
-        "Switzerland": "🇨🇭",
-        "Denmark": "🇩🇰",
-        "Sweden": "🇸🇪",
-        "Norway": "🇳🇴",
-        "Finland": "🇫🇮",
-        "Poland": "🇵🇱",
-        "Czech": "🇨🇿",
-        "Croatia": "🇭🇷",
-        "Serbia": "🇷🇸",
-        "Greece": "🇬🇷",
-        "Cyprus": "🇨🇾",
-        "Israel": "🇮🇱",
-        "Saudi": "🇸🇦",
-        "UAE": "🇦🇪",
-        "Qatar": "🇶🇦",
-        "Canada": "🇨🇦",
-        "Australia": "🇦🇺",
-        "Japan": "🇯🇵",
-        "Korea": "🇰🇷",
-        "China": "🇨🇳",
-        "International": "🌍",
-        "World": "🌎",
-        "Europe": "🇪🇺",
-        "Africa": "🇦🇴",
-        "Asia": "🇦🇸",
-        "America": "🇺🇸"
-    }
-    
-    # Check for exact match
-    if country_name in flag_map:
-        return flag_map[country_name]
-    
-    # Check for partial matches
-    for key, flag in flag_map.items():
-        if key in country_name or country_name in key:
-            return flag
-    
-    # Use country code as fallback
-    if country_name and len(country_name) >= 2:
-        return f"({country_name[:2].upper()})"
-    
-    return "🏆"
-
 # ======================
 # DEBUG ODDS COMMAND
 # ======================
@@ -307,13 +232,8 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, mes
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
-    cursor.execute("SELECT user_id FROM users WHERE user_id=?", (user.id,))
-    if not cursor.fetchone():
-        cursor.execute(
-            "INSERT INTO users (user_id, username, balance) VALUES (?, ?, ?)",
-            (user.id, user.username, START_BALANCE)
-        )
-        conn.commit()
+    # Creates the user with the signup credit (no-op for existing users)
+    await run_db(ledger.open_account, user.id, user.username)
 
     await show_main_menu(update, context, f"⚽ *Welcome {user.first_name}!*\n\n*Football Betting Bot*")
 
@@ -398,111 +318,11 @@ async def show_league_types(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ======================
 # LEAGUE-FIRST NAVIGATION FUNCTIONS WITH PAGINATION
 # ======================
-async def show_leagues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, day_offset=0, page=0):
-    """Show available leagues for a specific day"""
-    # If called from callback, extract parameters from callback data
-    if update.callback_query:
-        query = update.callback_query
-        await query.answer()
-        
-        # If callback data starts with leagues_page_ or refresh_leagues_
-        if query.data.startswith("leagues_page_") or query.data.startswith("refresh_leagues_"):
-            # Extract day_offset and page from callback data
-            parts = query.data.split("_")
-            if len(parts) >= 4:
-                day_offset = int(parts[2])
-                page = int(parts[3])
-    
-    # Store day_offset in context for back navigation
-    context.user_data["last_day_offset"] = day_offset
-    
-    # Initialize variables
-    total_leagues = 0
-    total_pages = 0
-    
-    # Get target date
-    target_date = (datetime.now() + timedelta(days=day_offset)).strftime("%Y-%m-%d")
-    
-    try:
-        # First, get total count for pagination
-        cursor.execute(f"""
-            SELECT COUNT(DISTINCT l.league_id) as total_leagues
-            FROM leagues l
-            JOIN fixtures f ON l.league_id = f.league_id
-            WHERE date(f.start_time) = date(?)
-            AND f.status = 'NS'
-            AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
-            AND l.is_active = 1
-        """, (target_date,))
-        
-        total_result = cursor.fetchone()
-        total_leagues = total_result[0] if total_result else 0
-        
-        # Calculate total pages - FIXED: Check for division by zero
-        if total_leagues > 0:
-            total_pages = (total_leagues + MAX_LEAGUES_PER_PAGE - 1) // MAX_LEAGUES_PER_PAGE
-        else:
-            total_pages = 0
-        
-        # Make sure page is within bounds
-        if total_pages > 0:
-            page = max(0, min(page, total_pages - 1))
-        else:
-            page = 0
-        
-        print(f"[Leagues Menu] Total leagues found: {total_leagues}, Pages: {total_pages}, Current Page: {page}")
-        
-    except Exception as e:
-        print(f"[Leagues Menu] Error counting leagues: {e}")
-        # Use a simpler query as fallback
-        cursor.execute("""
-            SELECT COUNT(DISTINCT league_id) as total_leagues
-            FROM fixtures 
-            WHERE date(start_time) = date(?)
-            AND status = 'NS'
-        """, (target_date,))
-        total_result = cursor.fetchone()
-        total_leagues = total_result[0] if total_result else 0
-        total_pages = 1 if total_leagues > 0 else 0
-        page = 0
-    
-    # Get leagues that have matches on this day
-    cursor.execute(f"""
-        SELECT DISTINCT l.league_id, l.name, l.country, l.logo_url,
-               COUNT(f.fixture_id) as match_count
-        FROM leagues l
-        JOIN fixtures f ON l.league_id = f.league_id
-        WHERE date(f.start_time) = date(?)
-        AND f.status = 'NS'
-        AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
-        AND l.is_active = 1
-        GROUP BY l.league_id
-        ORDER BY l.country, l.name
-        LIMIT ? OFFSET ?
-    """, (target_date, MAX_LEAGUES_PER_PAGE, page * MAX_LEAGUES_PER_PAGE))
-    
-    leagues = cursor.fetchall()
-    
-    # If no leagues found, try to get popular leagues as fallback
-    if not leagues and page == 0:
-        print(f"[Leagues Menu] No leagues found for {target_date}, trying popular leagues...")
-        cursor.execute(f"""
-            SELECT l.league_id, l.name, l.country, l.logo_url,
-                   COUNT(f.fixture_id) as match_count
-            FROM leagues l
-            JOIN fixtures f ON l.league_id = f.league_id
-            WHERE f.status = 'NS'
-            AND datetime(f.start_time) > datetime('now')
-            AND l.league_id IN ({",".join(map(str, DEFAULT_ACTIVE_LEAGUES))})
-            GROUP BY l.league_id
-            ORDER BY match_count DESC
-            LIMIT ?
-        """, (MAX_LEAGUES_PER_PAGE,))
-        
-        leagues = cursor.fetchall()
-        total_leagues = len(leagues)
-        total_pages = 1 if leagues else 0
-        print(f"[Leagues Menu] Found {len(leagues)} popular leagues as fallback")
+def _render_leagues_menu(snapshot, day_offset):
+    """(message, keyboard) for one leagues menu page"""
+    leagues = snapshot["leagues"]
+    total_pages = snapshot["total_pages"]
+    page = snapshot["page"]
     
     if not leagues:
         day_name = "today" if day_offset == 0 else "tomorrow"
@@ -512,26 +332,13 @@ async def show_leagues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
         ]
         
         message = f"🏆 *No {day_name}'s matches available*\n\nNo leagues have scheduled matches for {day_name}. Please check back later!"
-        
-        if update.callback_query:
-            await update.callback_query.edit_message_text(
-                message, 
-                parse_mode="Markdown", 
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-        else:
-            await update.message.reply_text(
-                message, 
-                parse_mode="Markdown", 
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-        return
+        return message, InlineKeyboardMarkup(keyboard)
     
     # Create keyboard with leagues
     keyboard = []
     current_country = None
     
-    for league_id, name, country, logo_url, match_count in leagues:
+    for league_id, display_name, flag, country, match_count in leagues:
         # Add country header if it's a new country
         if country != current_country:
             # Don't add header for first item
@@ -539,12 +346,6 @@ async def show_leagues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 keyboard.append([])  # Empty row for spacing
             current_country = country
         
-        # Country flag
-        flag = get_country_flag(country)
-        
-        # Truncate long league names
-        display_name = name[:20] + "..." if len(name) > 20 else name
-        
         keyboard.append([
             InlineKeyboardButton(
                 f"{flag} {display_name} ({match_count})",
@@ -586,13 +387,54 @@ async def show_leagues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
     day_name = "Today" if day_offset == 0 else "Tomorrow"
     page_info = f" (Page {page+1}/{total_pages})" if total_pages > 1 else ""
     message = f"🏆 *{day_name}'s Football Leagues{page_info}*\n\nSelect a league to view available matches:"
+    return message, InlineKeyboardMarkup(keyboard)
+
+async def show_leagues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, day_offset=0, page=0):
+    """Show available leagues for a specific day"""
+    refresh = False
+    
+    # If called from callback, extract parameters from callback data
+    if update.callback_query:
+        query = update.callback_query
+        await query.answer()
+        
+        # If callback data starts with leagues_page_ or refresh_leagues_
+        if query.data.startswith("leagues_page_") or query.data.startswith("refresh_leagues_"):
+            # Extract day_offset and page from callback data
+            parts = query.data.split("_")
+            if len(parts) >= 4:
+                day_offset = int(parts[2])
+                page = int(parts[3])
+            refresh = query.data.startswith("refresh_leagues_")
+    
+    # Store day_offset in context for back navigation
+    context.user_data["last_day_offset"] = day_offset
+    
+    # The rendered page is shared by every user until the fixture set changes
+    render_key = ("leagues", None, day_offset, page, fixture_set_version.value)
+    rendered = None if refresh else render_cache.get(render_key)
+    
+    if rendered is None:
+        # Built from the in-memory snapshot; rebuilt when fixtures change or on Refresh
+        try:
+            snapshot = not refresh and league_menu.lookup(day_offset, page)
+            if not snapshot:
+                snapshot = await run_db(league_menu.rebuild, day_offset, page)
+        except Exception as e:
+            print(f"[Leagues Menu] Error loading league menu: {e}")
+            snapshot = {"leagues": [], "total_leagues": 0, "total_pages": 0, "page": 0, "fallback": False}
+        
+        rendered = _render_leagues_menu(snapshot, day_offset)
+        render_cache.set(render_key, rendered)
+    
+    message, reply_markup = rendered
     
     if update.callback_query:
         try:
             await update.callback_query.edit_message_text(
                 message, 
                 parse_mode="Markdown", 
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=reply_markup
             )
         except Exception as e:
             print(f"[Leagues Menu] Error editing message: {e}")
@@ -600,24 +442,27 @@ async def show_leagues_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
             await update.callback_query.message.reply_text(
                 message,
                 parse_mode="Markdown",
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=reply_markup
             )
     else:
         await update.message.reply_text(
             message, 
             parse_mode="Markdown", 
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=reply_markup
         )
 
 async def show_league_matches(update: Update, context: ContextTypes.DEFAULT_TYPE, league_id: int = None, day_offset: int = 0, page: int = 0):
     """Show matches for a specific league with pagination"""
     query = update.callback_query
     await query.answer()
+    refresh = False
     
     # If league_id not provided, get it from callback data
     if league_id is None:
         # Parse callback data: league_{league_id}_{day_offset}_{page}
-        data_parts = query.data.split("_")
+        # or refresh_matches_{league_id}_{day_offset}_{page}
+        refresh = query.data.startswith("refresh_matches_")
+        data_parts = query.data.removeprefix("refresh_").split("_")
         if len(data_parts) < 4:
             await query.edit_message_text("❌ Error loading league matches")
             return
@@ -628,34 +473,50 @@ async def show_league_matches(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Store page in context for back navigation
     context.user_data["last_leagues_page"] = page
     
+    # The rendered screen is shared by every user until the fixture set changes
+    render_key = ("league", league_id, day_offset, page, fixture_set_version.value)
+    rendered = None if refresh else render_cache.get(render_key)
+    
+    if rendered is None:
+        rendered = await _render_league_matches(league_id, day_offset, page)
+        if rendered is None:
+            await query.edit_message_text("❌ League not found")
+            return
+        render_cache.set(render_key, rendered)
+    
+    text, reply_markup = rendered
+    await query.edit_message_text(
+        text,
+        parse_mode="Markdown",
+        reply_markup=reply_markup
+    )
+
+async def _render_league_matches(league_id, day_offset, page):
+    """(text, keyboard) for one league's match list, or None if the league is unknown"""
     # Get league info
-    cursor.execute("SELECT name, country FROM leagues WHERE league_id = ?", (league_id,))
-    league_info = cursor.fetchone()
+    league_info = await fetch_one("SELECT name, country FROM leagues WHERE league_id = ?", (league_id,))
     
     if not league_info:
-        await query.edit_message_text("❌ League not found")
-        return
+        return None
     
     league_name, country = league_info
     target_date = (datetime.now() + timedelta(days=day_offset)).strftime("%Y-%m-%d")
     
     # Get matches for this league on the specific day
-    cursor.execute(f"""
+    matches = await fetch_all(f"""
         SELECT f.fixture_id, t1.name as home, t2.name as away, 
-               f.start_time, t1.logo_url as home_logo, t2.logo_url as away_logo
+               f.kickoff_ts, t1.logo_url as home_logo, t2.logo_url as away_logo
         FROM fixtures f
         JOIN teams t1 ON f.home_team_id = t1.team_id
         JOIN teams t2 ON f.away_team_id = t2.team_id
         WHERE f.league_id = ? 
-        AND date(f.start_time) = date(?)
         AND f.status = 'NS'
-        AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
-        ORDER BY f.start_time
+        AND f.match_day = ?
+        AND f.kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
+        ORDER BY f.kickoff_ts
         LIMIT 30
     """, (league_id, target_date))
     
-    matches = cursor.fetchall()
-    
     if not matches:
         day_name = "today" if day_offset == 0 else "tomorrow"
         keyboard = [
@@ -664,26 +525,20 @@ async def show_league_matches(update: Update, context: ContextTypes.DEFAULT_TYPE
             [InlineKeyboardButton("🏠 Main Menu", callback_data="back_main")]
         ]
         
-        await query.edit_message_text(
+        return (
             f"🏟 *{league_name}*\n🌍 {country}\n\nNo matches available for {day_name}. Please check back later!",
-            parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            InlineKeyboardMarkup(keyboard)
         )
-        return
     
     # Format matches with team logos and times
     text = f"🏟 *{league_name}*\n🌍 {country}\n📅 {target_date}\n\n*Available Matches ({len(matches)}):*\n"
     keyboard = []
     
-    for i, (fixture_id, home, away, start_time, home_logo, away_logo) in enumerate(matches, 1):
-        # Format time
-        try:
-            dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            time_str = dt.strftime("%H:%M")
-            time_emoji = "🌙" if dt.hour >= 18 else "☀️" if dt.hour >= 12 else "🌅"
-        except:
-            time_str = start_time[11:16] if len(start_time) > 11 else start_time
-            time_emoji = "🕐"
+    for i, (fixture_id, home, away, kickoff_ts, home_logo, away_logo) in enumerate(matches, 1):
+        # Format time (UTC, as the API reports it)
+        dt = datetime.fromtimestamp(kickoff_ts, timezone.utc)
+        time_str = dt.strftime("%H:%M")
+        time_emoji = "🌙" if dt.hour >= 18 else "☀️" if dt.hour >= 12 else "🌅"
         
         # Create match button (truncate long names)
         home_display = home[:12] + "..." if len(home) > 12 else home
@@ -701,7 +556,7 @@ async def show_league_matches(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     # Add navigation buttons
     keyboard.append([
-        InlineKeyboardButton("🔄 Refresh Matches", callback_data=f"league_{league_id}_{day_offset}_{page}"),
+        InlineKeyboardButton("🔄 Refresh Matches", callback_data=f"refresh_matches_{league_id}_{day_offset}_{page}"),
         InlineKeyboardButton("📊 View League Info", callback_data=f"league_info_{league_id}")
     ])
     
@@ -715,11 +570,7 @@ async def show_league_matches(update: Update, context: ContextTypes.DEFAULT_TYPE
     if len(text) > 4000:
         text = text[:4000] + "\n\n... (too many matches to list)"
     
-    await query.edit_message_text(
-        text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
+    return text, InlineKeyboardMarkup(keyboard)
 
 async def match_details_with_odds(update: Update, context: ContextTypes.DEFAULT_TYPE, fixture_id: int = None):
     """Show match details with betting odds - Updated for league structure"""
@@ -741,7 +592,7 @@ async def match_details_with_odds(update: Update, context: ContextTypes.DEFAULT_
     
     # Get match details with league info
     try:
-        cursor.execute("""
+        match = await fetch_one("""
             SELECT f.league_id, f.home_team_id, f.away_team_id, f.start_time, f.status,
                    t1.name as home_name, t2.name as away_name,
                    l.name as league_name, l.country,
@@ -752,8 +603,6 @@ async def match_details_with_odds(update: Update, context: ContextTypes.DEFAULT_
             JOIN leagues l ON f.league_id = l.league_id
             WHERE f.fixture_id = ?
         """, (fixture_id,))
-        
-        match = cursor.fetchone()
     except Exception as e:
         print(f"Database error in match_details_with_odds: {e}")
         await query.edit_message_text("❌ Database error. Please try again.")
@@ -838,8 +687,8 @@ async def match_details_with_odds(update: Update, context: ContextTypes.DEFAULT_
         time_str = start_time[11:16] if len(start_time) > 11 else start_time
         date_str = start_time[:10] if len(start_time) >= 10 else "Today"
     
-    # Get odds
-    odds_data = fetch_match_odds(fixture_id)
+    # Get odds (stale odds are shown right away and refreshed in the background)
+    odds_data, odds_age = await get_match_odds_swr(fixture_id)
     
     if not odds_data or not odds_data["1x2"]:
         keyboard = [
@@ -865,13 +714,20 @@ async def match_details_with_odds(update: Update, context: ContextTypes.DEFAULT_
     context.user_data["current_odds"] = odds_data
     context.user_data["current_league_id"] = league_id
     
+    # Tell the user how old the odds are once they are past the fresh window
+    if odds_age >= ODDS_FRESH_HOURS:
+        odds_age_note = f"🕒 Odds updated {odds_age:.0f}h ago, refreshing...\n"
+    else:
+        odds_age_note = ""
+    
     # Format match info with emojis
     match_info = (
         f"⚽ *{home_name} vs {away_name}*\n"
         f"🏆 {league_name}\n"
         f"🌍 {country}\n"
         f"📅 {date_str} ⏰ {time_str}\n\n"
-        f"📊 *Note:* Odds adjusted by -{ODDS_ADJUSTMENT}\n\n"
+        f"📊 *Note:* Odds adjusted by -{ODDS_ADJUSTMENT}\n"
+        f"{odds_age_note}\n"
         f"🎯 *Select your prediction:*"
     )
     
@@ -994,20 +850,18 @@ async def search_team_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     # Search for teams - FIXED: Using proper parameter format
-    cursor.execute(f"""
+    teams = await fetch_all(f"""
         SELECT t.team_id, t.name, COUNT(f.fixture_id) as match_count
         FROM teams t
         LEFT JOIN fixtures f ON t.team_id IN (f.home_team_id, f.away_team_id)
         WHERE t.name LIKE ? 
         AND f.status = 'NS'
-        AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
+        AND f.kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
         GROUP BY t.team_id
         ORDER BY match_count DESC
         LIMIT 10
     """, (f"%{search_term}%",))
     
-    teams = cursor.fetchall()
-    
     if not teams:
         keyboard = [
             [InlineKeyboardButton("🔍 Search Again", callback_data="search_team")],
@@ -1026,7 +880,7 @@ async def search_team_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     for team_id, team_name, match_count in teams:
         # Get upcoming matches for this team
-        cursor.execute(f"""
+        matches = await fetch_all(f"""
             SELECT f.fixture_id, 
                    CASE 
                        WHEN f.home_team_id = ? THEN t2.name 
@@ -1039,13 +893,11 @@ async def search_team_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             JOIN leagues l ON f.league_id = l.league_id
             WHERE ? IN (f.home_team_id, f.away_team_id)
             AND f.status = 'NS'
-            AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
-            ORDER BY f.start_time
+            AND f.kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
+            ORDER BY f.kickoff_ts
             LIMIT 3
         """, (team_id, team_id))
         
-        matches = cursor.fetchall()
-        
         text += f"⚽ *{team_name}*\n"
         
         if matches:
@@ -1145,11 +997,8 @@ async def handle_deposit_screenshot(update: Update, context: ContextTypes.DEFAUL
     user = update.effective_user
     method = context.user_data.get("deposit_method", "telebirr")
     
-    # Get the photo file
-    photo_file = await update.message.photo[-1].get_file()
-    
-    # Store photo file in context for later use
-    context.user_data["deposit_photo_file"] = photo_file
+    # Keep only Telegram's file_id - the admin card is sent by id, nothing re-uploaded
+    context.user_data["deposit_photo_id"] = update.message.photo[-1].file_id
     context.user_data["awaiting_deposit_screenshot"] = False
     context.user_data["awaiting_deposit_amount"] = True
     
@@ -1176,43 +1025,22 @@ async def handle_deposit_amount(update: Update, context: ContextTypes.DEFAULT_TY
     
     user = update.effective_user
     method = context.user_data.get("deposit_method", "telebirr")
-    photo_file = context.user_data.get("deposit_photo_file")
+    photo_id = context.user_data.get("deposit_photo_id")
     
-    if not photo_file:
+    if not photo_id:
         await update.message.reply_text("❌ Error: Screenshot not found. Please start over.")
         context.user_data["awaiting_deposit_amount"] = False
-        context.user_data["deposit_photo_file"] = None
+        context.user_data["deposit_photo_id"] = None
         context.user_data["deposit_method"] = None
         return
     
     # First, save the transaction to get transaction_id
-    cursor.execute("""
-        INSERT INTO transactions 
-        (user_id, username, type, amount, method, status)
-        VALUES (?, ?, 'deposit', ?, ?, 'pending')
-    """, (user.id, user.username, amount, method))
-    conn.commit()
-    
-    # Get transaction ID
-    transaction_id = cursor.lastrowid
+    transaction_id = await run_db(
+        ledger.request_deposit, user.id, user.username, amount, method, photo_id
+    )
     
-    # Save image to file - USE AWAIT
-    try:
-        image_filename = await save_transaction_image(photo_file, transaction_id, user.id)
-        
-        if image_filename:
-            # Update transaction with image filename
-            cursor.execute("""
-                UPDATE transactions 
-                SET image_filename = ?
-                WHERE transaction_id = ?
-            """, (image_filename, transaction_id))
-            conn.commit()
-        else:
-            print(f"⚠️ Could not save image for transaction #{transaction_id}")
-    except Exception as e:
-        print(f"❌ Error saving image: {e}")
-        image_filename = None
+    # Local copy is optional and never holds up the user
+    image_archive.schedule(context.bot, transaction_id, photo_id)
     
     # Notify admin with inline buttons
     method_name = "Telebirr" if method == "telebirr" else "CBE"
@@ -1234,35 +1062,12 @@ async def handle_deposit_amount(update: Update, context: ContextTypes.DEFAULT_TY
         ]
     ]
     
-    # Send notification to admin with saved image file
+    # Forward the screenshot by file_id (send_transaction_card falls back to text)
     try:
-        if image_filename:
-            image_file = get_image_file(image_filename)
-            if image_file:
-                await context.bot.send_photo(
-                    chat_id=ADMIN_USER_ID,
-                    photo=image_file,
-                    caption=admin_message,
-                    parse_mode="Markdown",
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
-                image_file.close()
-            else:
-                # Send message without image if file not found
-                await context.bot.send_message(
-                    chat_id=ADMIN_USER_ID,
-                    text=f"{admin_message}\n\n⚠️ *Note:* Screenshot file could not be loaded.",
-                    parse_mode="Markdown",
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
-        else:
-            # Send message without image
-            await context.bot.send_message(
-                chat_id=ADMIN_USER_ID,
-                text=admin_message,
-                parse_mode="Markdown",
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+        await notifier.send(ADMIN_USER_ID, partial(
+            send_transaction_card, context.bot, ADMIN_USER_ID, admin_message,
+            InlineKeyboardMarkup(keyboard), photo_id, True
+        ))
         
         print(f"✅ Sent deposit notification to admin {ADMIN_USER_ID}")
     except Exception as e:
@@ -1279,7 +1084,7 @@ async def handle_deposit_amount(update: Update, context: ContextTypes.DEFAULT_TY
     
     # Clear the context
     context.user_data["awaiting_deposit_amount"] = False
-    context.user_data["deposit_photo_file"] = None
+    context.user_data["deposit_photo_id"] = None
     context.user_data["deposit_method"] = None
     
     await update.message.reply_text(
@@ -1305,11 +1110,10 @@ async def start_withdraw(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
     
     # Check user balance first
-    cursor.execute(
+    row = await fetch_one(
         "SELECT balance FROM users WHERE user_id=?",
         (user_id,)
     )
-    row = cursor.fetchone()
     
     if not row:
         if query:
@@ -1440,11 +1244,10 @@ async def handle_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_T
     account_number = context.user_data.get("withdraw_account", "")
     
     # Check balance
-    cursor.execute(
+    row = await fetch_one(
         "SELECT balance FROM users WHERE user_id=?",
         (user.id,)
     )
-    row = cursor.fetchone()
     
     if not row:
         await update.message.reply_text("❌ User not found")
@@ -1457,21 +1260,13 @@ async def handle_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text(f"❌ Insufficient balance. Available: {balance} birr")
         return
     
-    # START TRANSACTION: Deduct balance IMMEDIATELY
-    cursor.execute(
-        "UPDATE users SET balance = balance - ? WHERE user_id=?",
-        (amount, user.id)
+    # Deduct balance IMMEDIATELY (held in the ledger until admin decides)
+    transaction_id = await run_db(
+        ledger.request_withdrawal, user.id, user.username, amount, method, account_number
     )
-    
-    # Save withdrawal request with deducted flag
-    cursor.execute("""
-        INSERT INTO transactions 
-        (user_id, username, type, amount, method, status, account_number)
-        VALUES (?, ?, 'withdraw', ?, ?, 'pending', ?)
-    """, (user.id, user.username, amount, method, account_number))
-    conn.commit()
-    
-    transaction_id = cursor.lastrowid
+    if transaction_id is None:
+        await update.message.reply_text("❌ Insufficient balance. Please check /balance and try again.")
+        return
     
     # Calculate new balance
     new_balance = balance - amount
@@ -1560,70 +1355,48 @@ async def handle_admin_approval(update: Update, context: ContextTypes.DEFAULT_TY
     transaction_id = int(data[2])
     
     # Get transaction details
-    cursor.execute("""
+    transaction = await fetch_one("""
         SELECT user_id, username, type, amount, method, account_number, status, image_filename
         FROM transactions 
         WHERE transaction_id=? AND status='pending'
     """, (transaction_id,))
     
-    transaction = cursor.fetchone()
-    
     if not transaction:
         await query.edit_message_text("❌ Transaction not found or already processed")
         return
     
     user_id, username, trans_type, amount, method, account_number, status, image_filename = transaction
     
+    # Status change and balance movement are posted together, once
+    status = "approved" if action == "approve" else "rejected"
+    if not await run_db(ledger.process_transaction, transaction_id, status, update.effective_user.id):
+        await query.edit_message_text("❌ Transaction not found or already processed")
+        return
+    
     if action == "approve":
         if trans_type == "deposit":
-            # Add balance to user
-            cursor.execute(
-                "UPDATE users SET balance = balance + ? WHERE user_id=?", 
-                (amount if amount else 0, user_id)
-            )
-            
-            # Update transaction status
-            cursor.execute("""
-                UPDATE transactions 
-                SET status='approved', processed_at=CURRENT_TIMESTAMP, processed_by=?
-                WHERE transaction_id=?
-            """, (update.effective_user.id, transaction_id))
-            conn.commit()
-            
-            status = "approved"
-            
+            # Balance was credited by ledger.process_transaction
             # Get current user balance for notification
-            cursor.execute(
+            current_balance_row = await fetch_one(
                 "SELECT balance FROM users WHERE user_id=?",
                 (user_id,)
             )
-            current_balance_row = cursor.fetchone()
             current_balance = current_balance_row[0] if current_balance_row else 0
             
             user_message = f"✅ *Deposit Approved!*\n\n💰 {amount} has been added to your balance.\n💳 Current Balance: {current_balance} birr"
             
-            # Delete the image file if it exists
-            if image_filename:
-                delete_transaction_image(image_filename)
+            # Archived copy is purged after retention unless a pending deposit shares it
+            await image_archive.release(transaction_id, image_filename)
         
         elif trans_type == "withdraw":
-            # Just update status to approved (balance already deducted)
-            cursor.execute("""
-                UPDATE transactions 
-                SET status='approved', processed_at=CURRENT_TIMESTAMP, processed_by=?
-                WHERE transaction_id=?
-            """, (update.effective_user.id, transaction_id))
-            conn.commit()
-            
-            status = "approved"
+            # Balance already deducted at request time
             method_name = "Telebirr" if method == "telebirr" else "CBE"
             
             # Get current user balance for notification
-            cursor.execute(
+            current_balance_row = await fetch_one(
                 "SELECT balance FROM users WHERE user_id=?",
                 (user_id,)
             )
-            current_balance_row = cursor.fetchone()
             current_balance = current_balance_row[0] if current_balance_row else 0
             
             # Notify user
@@ -1650,31 +1423,15 @@ async def handle_admin_approval(update: Update, context: ContextTypes.DEFAULT_TY
             )
     
     else:  # reject - REFUND THE MONEY
-        status = "rejected"
-        
         if trans_type == "withdraw":
-            # REFUND: Add the amount back to user's balance
-            cursor.execute(
-                "UPDATE users SET balance = balance + ? WHERE user_id=?",
-                (amount, user_id)
-            )
-            
+            # REFUND: ledger.process_transaction returned the amount to the balance
             # Get updated balance
-            cursor.execute(
+            updated_balance_row = await fetch_one(
                 "SELECT balance FROM users WHERE user_id=?",
                 (user_id,)
             )
-            updated_balance_row = cursor.fetchone()
             updated_balance = updated_balance_row[0] if updated_balance_row else 0
             
-            # Update transaction status
-            cursor.execute("""
-                UPDATE transactions 
-                SET status='rejected', processed_at=CURRENT_TIMESTAMP, processed_by=?
-                WHERE transaction_id=?
-            """, (update.effective_user.id, transaction_id))
-            conn.commit()
-            
             method_name = "Telebirr" if method == "telebirr" else "CBE"
             
             # Notify user (with refund information)
@@ -1701,17 +1458,8 @@ async def handle_admin_approval(update: Update, context: ContextTypes.DEFAULT_TY
             )
         
         else:  # deposit rejection (no balance change needed)
-            # Update transaction status
-            cursor.execute("""
-                UPDATE transactions 
-                SET status='rejected', processed_at=CURRENT_TIMESTAMP, processed_by=?
-                WHERE transaction_id=?
-            """, (update.effective_user.id, transaction_id))
-            conn.commit()
-            
-            # Delete the image file if it exists
-            if image_filename:
-                delete_transaction_image(image_filename)
+            # Archived copy is purged after retention unless a pending deposit shares it
+            await image_archive.release(transaction_id, image_filename)
             
             user_message = f"❌ *Deposit Rejected*\n\nYour deposit request (Transaction #{transaction_id}) was rejected by admin.\nPlease contact support for more information."
             admin_update = f"❌ *Deposit Rejected*\n\nTransaction #{transaction_id} has been rejected.\n👤 User: @{username}\n\nUser notified."
@@ -1757,30 +1505,17 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ Access denied")
         return
     
-    # Get pending transactions count
-    cursor.execute("SELECT COUNT(*) FROM transactions WHERE status='pending'")
-    pending_count = cursor.fetchone()[0]
-    
-    # Get total users
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
+    # Running totals kept by the ledger - no table scans
+    totals = await run_db(ledger.get_totals)
+    today = await run_db(ledger.get_totals, ledger_day())
     
-    # Get total balance in system
-    cursor.execute("SELECT SUM(balance) FROM users")
-    total_balance = cursor.fetchone()[0] or 0
-    
-    # Get today's stats
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as today_transactions,
-            SUM(CASE WHEN status='approved' AND type='deposit' THEN amount ELSE 0 END) as today_deposits,
-            SUM(CASE WHEN status='approved' AND type='withdraw' THEN amount ELSE 0 END) as today_withdrawals
-        FROM transactions 
-        WHERE DATE(created_at) = DATE('now')
-    """)
+    pending_count = totals.get("tx_pending", (0, 0))[1]
+    total_users = totals.get("users", (0, 0))[1]
+    total_balance = round(totals.get("balance", (0, 0))[0], 2)
     
-    today_stats = cursor.fetchone()
-    today_trans, today_deposits, today_withdrawals = today_stats or (0, 0, 0)
+    today_trans = today.get("tx_deposit", (0, 0))[1] + today.get("tx_withdraw", (0, 0))[1]
+    today_deposits = today.get("deposit", (0, 0))[0]
+    today_withdrawals = today.get("withdraw_approved", (0, 0))[0]
     
     text = (
         f"🛠 *ADMIN PANEL*\n\n"
@@ -1832,16 +1567,16 @@ async def admin_transactions(update: Update, context: ContextTypes.DEFAULT_TYPE)
     else:
         chat_id = update.effective_chat.id
     
-    # Get pending transactions
-    cursor.execute("""
-        SELECT transaction_id, type, user_id, username, amount, method, account_number, image_filename
-        FROM transactions 
-        WHERE status='pending'
-        ORDER BY created_at DESC
+    # Oldest pending first, with each user's balance in the same query
+    pending = await fetch_all("""
+        SELECT t.transaction_id, t.type, t.user_id, t.username, t.amount, t.method,
+               t.account_number, t.image_filename, t.image_file_id, COALESCE(u.balance, 0)
+        FROM transactions t
+        LEFT JOIN users u ON u.user_id = t.user_id
+        WHERE t.status='pending'
+        ORDER BY t.created_at, t.transaction_id
     """)
     
-    pending = cursor.fetchall()
-    
     if not pending:
         text = "✅ *No pending transactions*"
         keyboard = [[InlineKeyboardButton("🔙 Back to Admin Panel", callback_data="admin_home")]]
@@ -1860,16 +1595,14 @@ async def admin_transactions(update: Update, context: ContextTypes.DEFAULT_TYPE)
             )
         return
     
-    # Send transactions one by one with saved images
-    sent_count = 0
-    
+    # Fan the cards out concurrently within Telegram's rate limits. One chat
+    # only takes short bursts, so each view sends at most one burst of cards.
+    total_pending = len(pending)
+    pending = pending[:NOTIFY_CHAT_BURST]
+    jobs = []
+    trans_ids = []
     for trans in pending:
-        trans_id, trans_type, user_id, username, amount, method, account, image_filename = trans
-        
-        # Get user's current balance for context
-        cursor.execute("SELECT balance FROM users WHERE user_id=?", (user_id,))
-        user_balance_row = cursor.fetchone()
-        user_balance = user_balance_row[0] if user_balance_row else 0
+        trans_id, trans_type, user_id, username, amount, method, account, image_filename, image_file_id, user_balance = trans
         
         trans_type_text = "📥 DEPOSIT" if trans_type == "deposit" else "📤 WITHDRAWAL"
         method_name = "Telebirr" if method == "telebirr" else "CBE"
@@ -1900,61 +1633,45 @@ async def admin_transactions(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 f"*Actions:*"
             )
         
-        keyboard = [
+        keyboard = InlineKeyboardMarkup([
             [
                 InlineKeyboardButton(f"✅ Approve #{trans_id}", callback_data=f"approve_{trans_type}_{trans_id}"),
                 InlineKeyboardButton(f"❌ Reject #{trans_id}", callback_data=f"reject_{trans_type}_{trans_id}")
             ]
-        ]
+        ])
         
-        try:
-            if trans_type == "deposit" and image_filename:
-                # Send the saved image file
-                image_file = get_image_file(image_filename)
-                if image_file:
-                    await context.bot.send_photo(
-                        chat_id=chat_id,
-                        photo=image_file,
-                        caption=text,
-                        parse_mode="Markdown",
-                        reply_markup=InlineKeyboardMarkup(keyboard)
-                    )
-                    image_file.close()
-                    sent_count += 1
-                else:
-                    # Send message without image
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=f"{text}\n\n⚠️ *Note:* Screenshot file not found on server.",
-                        parse_mode="Markdown",
-                        reply_markup=InlineKeyboardMarkup(keyboard)
-                    )
-                    sent_count += 1
-            else:
-                # Send regular message for withdrawals
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode="Markdown",
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
-                sent_count += 1
-        except Exception as e:
-            print(f"Error sending transaction {trans_id}: {e}")
-            # Try without photo
-            try:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"{text}\n\n⚠️ Error loading transaction details.",
-                    parse_mode="Markdown",
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
-                sent_count += 1
-            except Exception as e2:
-                print(f"Error sending fallback message: {e2}")
+        photo = None
+        if trans_type == "deposit":
+            photo = image_file_id or image_filename
+        trans_ids.append(trans_id)
+        jobs.append((chat_id, partial(
+            send_transaction_card, context.bot, chat_id, text, keyboard,
+            photo, image_file_id is not None
+        )))
+    
+    results = await notifier.fan_out(jobs)
+    
+    sent_count = 0
+    new_file_ids = []
+    for trans_id, result in zip(trans_ids, results):
+        if isinstance(result, Exception):
+            print(f"Error sending transaction {trans_id}: {result}")
+            continue
+        sent_count += 1
+        if result:
+            new_file_ids.append((result, trans_id))
+    
+    # Next time these screenshots go out by file_id instead of a re-upload
+    if new_file_ids:
+        await execute_transaction([
+            ("UPDATE transactions SET image_file_id = ? WHERE transaction_id = ?", params)
+            for params in new_file_ids
+        ])
     
     # Send summary message
     summary_text = f"📋 *Sent {sent_count} pending transactions for review*\n\nUse the buttons above to approve or reject each transaction."
+    if total_pending > len(pending):
+        summary_text += f"\n\n⏳ {total_pending - len(pending)} more pending - process these, then Refresh."
     
     keyboard = [
         [InlineKeyboardButton("🔄 Refresh", callback_data="admin_transactions")],
@@ -1981,26 +1698,17 @@ async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("❌ Access denied")
         return
     
-    # Get overall stats
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_transactions,
-            SUM(CASE WHEN type='deposit' THEN amount ELSE 0 END) as total_deposits,
-            SUM(CASE WHEN type='withdraw' THEN amount ELSE 0 END) as total_withdrawals,
-            SUM(CASE WHEN status='approved' AND type='deposit' THEN amount ELSE 0 END) as approved_deposits,
-            SUM(CASE WHEN status='approved' AND type='withdraw' THEN amount ELSE 0 END) as approved_withdrawals,
-            SUM(CASE WHEN status='pending' THEN 1 ELSE 0 END) as pending_count
-        FROM transactions
-    """)
-    
-    stats = cursor.fetchone()
+    # Running totals kept by the ledger - no table scans
+    totals = await run_db(ledger.get_totals)
+    today = await run_db(ledger.get_totals, ledger_day())
     
-    if stats:
-        total_trans, total_deposits, total_withdrawals, approved_deposits, approved_withdrawals, pending_count = stats
-        
-        # Get user stats
-        cursor.execute("SELECT COUNT(*), SUM(balance) FROM users")
-        user_count, total_balance = cursor.fetchone()
+    if totals:
+        total_trans = totals.get("tx_deposit", (0, 0))[1] + totals.get("tx_withdraw", (0, 0))[1]
+        approved_deposits = totals.get("deposit", (0, 0))[0]
+        approved_withdrawals = totals.get("withdraw_approved", (0, 0))[0]
+        pending_count = totals.get("tx_pending", (0, 0))[1]
+        user_count = totals.get("users", (0, 0))[1]
+        total_balance = round(totals.get("balance", (0, 0))[0], 2)
         
         text = (
             f"📊 *SYSTEM STATISTICS*\n\n"
@@ -2017,19 +1725,11 @@ async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE
             f"• Approved: `{total_trans - pending_count}`\n\n"
         )
         
-        # Get today's activity
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as today_count,
-                SUM(CASE WHEN type='deposit' AND status='approved' THEN amount ELSE 0 END) as today_deposits,
-                SUM(CASE WHEN type='withdraw' AND status='approved' THEN amount ELSE 0 END) as today_withdrawals
-            FROM transactions 
-            WHERE DATE(created_at) = DATE('now')
-        """)
-        
-        today = cursor.fetchone()
+        # Today's activity
         if today:
-            today_count, today_deposits, today_withdrawals = today
+            today_count = today.get("tx_deposit", (0, 0))[1] + today.get("tx_withdraw", (0, 0))[1]
+            today_deposits = today.get("deposit", (0, 0))[0]
+            today_withdrawals = today.get("withdraw_approved", (0, 0))[0]
             text += f"📅 *Today's Activity*\n"
             text += f"• Transactions: `{today_count or 0}`\n"
             text += f"• Deposits: `{today_deposits or 0}`\n"
@@ -2060,15 +1760,13 @@ async def admin_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Access denied")
         return
     
-    cursor.execute("""
+    users = await fetch_all("""
         SELECT user_id, username, balance
         FROM users
         ORDER BY balance DESC
         LIMIT 20
     """)
     
-    users = cursor.fetchall()
-    
     text = "👥 *USER BALANCES*\n\n"
     total_balance = 0
     
@@ -2143,7 +1841,8 @@ async def check_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"/admin - Admin panel\n"
                 f"/transactions - View pending transactions\n"
                 f"/users - View user balances\n"
-                f"/stats - Detailed statistics",
+                f"/stats - Detailed statistics\n"
+                f"/reconcile - Check balances against the ledger",
                 parse_mode="Markdown"
             )
             
@@ -2169,35 +1868,45 @@ async def admin_cleanup(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Access denied")
         return
     
-    # Count files before cleanup
-    ensure_image_directory()
-    files_before = len(os.listdir("transaction_images"))
-    
-    # Clean up processed transaction images
-    cursor.execute("""
-        SELECT image_filename 
-        FROM transactions 
-        WHERE status != 'pending' 
-        AND image_filename IS NOT NULL
-    """)
-    processed_images = cursor.fetchall()
+    # Sizes come from the archive index, not a directory scan
+    before = await run_db(image_archive.stats)
     
-    deleted_count = 0
-    for (filename,) in processed_images:
-        if delete_transaction_image(filename):
-            deleted_count += 1
-    # Count files after cleanup
-    files_after = len(os.listdir("transaction_images"))
+    # Everything processed goes now, regardless of retention
+    deleted_count, freed = await asyncio.to_thread(image_archive.purge, 0)
+    after = await run_db(image_archive.stats)
     
     await update.message.reply_text(
         f"🧹 *Image Cleanup Complete*\n\n"
         f"• Deleted files: `{deleted_count}`\n"
-        f"• Files before: `{files_before}`\n"
-        f"• Files after: `{files_after}`\n"
-        f"• Space freed: Approx {deleted_count * 0.5:.1f} MB (est.)",
+        f"• Files before: `{before['files']}`\n"
+        f"• Files after: `{after['files']}`\n"
+        f"• Space freed: {freed / (1024 * 1024):.1f} MB\n"
+        f"• Archive size: {after['bytes'] / (1024 * 1024):.1f} MB",
         parse_mode="Markdown"
     )
 
+async def admin_reconcile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Verify that ledger entries add up to every user's balance"""
+    if update.effective_user.id != ADMIN_USER_ID:
+        await update.message.reply_text("❌ Access denied")
+        return
+    
+    report = await run_db(ledger.reconcile)
+    
+    text = (
+        f"{'✅' if report['ok'] else '⚠️'} *Ledger Reconciliation*\n\n"
+        f"• Users: `{report['users']}` (totals: `{report['totals_users']}`)\n"
+        f"• Ledger entries: `{report['entries']}`\n"
+        f"• Sum of balances: `{round(report['balance'], 2)}`\n"
+        f"• Sum of ledger: `{round(report['ledger_balance'], 2)}`\n"
+        f"• Running total: `{round(report['totals_balance'], 2)}`\n"
+        f"• Mismatched users: `{len(report['mismatches'])}`\n"
+    )
+    for user_id, balance, ledger_total in report["mismatches"][:10]:
+        text += f"   `{user_id}`: balance `{balance}` vs ledger `{round(ledger_total, 2)}`\n"
+    
+    await update.message.reply_text(text, parse_mode="Markdown")
+
 # ======================
 # TRANSACTION STATUS CHECK
 # ======================
@@ -2206,7 +1915,7 @@ async def check_transaction_status(update: Update, context: ContextTypes.DEFAULT
     user = update.effective_user
     
     # Get pending transactions for this user
-    cursor.execute("""
+    transactions = await fetch_all("""
         SELECT transaction_id, type, amount, method, status, created_at
         FROM transactions 
         WHERE user_id=? AND status IN ('pending', 'approved', 'rejected')
@@ -2214,8 +1923,6 @@ async def check_transaction_status(update: Update, context: ContextTypes.DEFAULT
         LIMIT 5
     """, (user.id,))
     
-    transactions = cursor.fetchall()
-    
     if not transactions:
         await update.message.reply_text(
             "📋 *No transactions found*\n\n"
@@ -2273,7 +1980,7 @@ async def results_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         is_callback = False
     
     # Get recent results from database
-    recent_results = results_db.get_all_results(limit=15)
+    recent_results = await run_db(results_db.get_all_results, limit=15)
     
     if not recent_results:
         if is_callback:
@@ -2308,7 +2015,7 @@ async def results_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"   📅 {result['match_date']} | 📋 Status: {status}\n\n"
     
     # Add database stats
-    stats = results_db.get_stats()
+    stats = await run_db(results_db.get_stats)
     text += f"📈 *Database Stats:* {stats['total_results']} results stored\n"
     text += "🗑️ *Note:* Results are automatically deleted after 2 days\n\n"
     text += "To check your bet status, use /mybets"
@@ -2337,7 +2044,7 @@ async def results_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ======================
 async def show_betslip_inline(query):
     user_id = query.from_user.id
-    slip = get_betslip(user_id)
+    slip = await run_db(get_betslip, user_id)
 
     if not slip:
         keyboard = [
@@ -2359,7 +2066,7 @@ async def show_betslip_inline(query):
     
     for i, s in enumerate(slip, 1):
         # Get match details
-        cursor.execute("""
+        match = await fetch_one("""
             SELECT t1.name as home, t2.name as away, l.name as league_name
             FROM fixtures f
             JOIN teams t1 ON f.home_team_id = t1.team_id
@@ -2367,8 +2074,6 @@ async def show_betslip_inline(query):
             JOIN leagues l ON f.league_id = l.league_id
             WHERE f.fixture_id=?
         """, (s["fixture_id"],))
-        
-        match = cursor.fetchone()
         match_text = f"Match {s['fixture_id']}"
         if match:
             home, away, league_name = match
@@ -2426,6 +2131,37 @@ async def show_betslip_inline(query):
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
+# ======================
+# PRUNED BET SLIP NOTICES
+# ======================
+async def notify_pruned_selections(bot, pruned):
+    """One message per user listing the matches removed from their slip"""
+    notices = []
+    for user_id, matches in pruned.items():
+        lines = "\n".join(f"• {m}" for m in matches)
+        notices.append((user_id, (
+            "⏰ Bet Slip Updated\n\n"
+            "These matches have started or were called off and were removed from your bet slip:\n"
+            f"{lines}\n\nUse /betslip to review it."
+        )))
+    
+    results = await notifier.fan_out([
+        (user_id, partial(bot.send_message, chat_id=user_id, text=text))
+        for user_id, text in notices
+    ])
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    
+    print(f"[Bot] Sent {len(notices) - failed}/{len(notices)} bet slip expiry notices")
+
+async def register_slip_notices(application):
+    """post_init: forward scheduler-thread prune events onto the bot's loop"""
+    loop = asyncio.get_running_loop()
+    betslip_store.on_pruned(
+        lambda pruned: asyncio.run_coroutine_threadsafe(
+            notify_pruned_selections(application.bot, pruned), loop
+        )
+    )
+
 # ======================
 # ADD TO BET SLIP - UPDATED FOR MULTIPLE OVER/UNDER LINES
 # ======================
@@ -2452,7 +2188,7 @@ async def bet_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     
     # Get match details for confirmation message
-    cursor.execute("""
+    match = await fetch_one("""
         SELECT t1.name as home, t2.name as away, l.name as league_name
         FROM fixtures f
         JOIN teams t1 ON f.home_team_id = t1.team_id
@@ -2460,8 +2196,6 @@ async def bet_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         JOIN leagues l ON f.league_id = l.league_id
         WHERE f.fixture_id = ?
     """, (fixture_id,))
-    
-    match = cursor.fetchone()
     if match:
         home, away, league_name = match
         if market == "1X2":
@@ -2478,7 +2212,8 @@ async def bet_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         match_text = f"Fixture {fixture_id}"
         pick_text = pick
 
-    success, msg = add_selection(
+    success, msg = await run_db(
+        add_selection,
         user_id,
         fixture_id,
         market,
@@ -2512,7 +2247,7 @@ async def remove_selection_callback(update: Update, context: ContextTypes.DEFAUL
         user_id = query.from_user.id
         
         # Remove selection
-        success, msg = remove_selection(user_id, fixture_id)
+        success, msg = await run_db(remove_selection, user_id, fixture_id)
         
         if success:
             await show_betslip_inline(query)
@@ -2537,7 +2272,7 @@ async def betslip_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     
     if query.data == "clear_betslip":
-        clear_betslip(user_id)
+        await run_db(clear_betslip, user_id)
         keyboard = [
             [InlineKeyboardButton("🏆 Browse Leagues", callback_data="menu_leagues_today")],
             [InlineKeyboardButton("🏠 Main Menu", callback_data="back_main")]
@@ -2566,34 +2301,30 @@ async def betslip_actions(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ======================
 async def show_balance_inline(query):
     user_id = query.from_user.id
-    cursor.execute(
+    row = await fetch_one(
         "SELECT balance FROM users WHERE user_id=?",
         (user_id,)
     )
-    row = cursor.fetchone()
     
     if row:
         balance = row[0]
         
         # Get pending bets count
-        cursor.execute(
+        pending_bets = (await fetch_one(
             "SELECT COUNT(*) FROM bets WHERE user_id=? AND status='PENDING'",
             (user_id,)
-        )
-        pending_bets = cursor.fetchone()[0]
+        ))[0]
         
         # Get won/lost stats
-        cursor.execute(
+        won_bets = (await fetch_one(
             "SELECT COUNT(*) FROM bets WHERE user_id=? AND status='WON'",
             (user_id,)
-        )
-        won_bets = cursor.fetchone()[0]
+        ))[0]
         
-        cursor.execute(
+        lost_bets = (await fetch_one(
             "SELECT COUNT(*) FROM bets WHERE user_id=? AND status='LOST'",
             (user_id,)
-        )
-        lost_bets = cursor.fetchone()[0]
+        ))[0]
         
         text = f"💰 *YOUR BALANCE*\n"
         text += "─" * 30 + "\n\n"
@@ -2627,16 +2358,14 @@ async def show_balance_inline(query):
 async def show_my_bets_inline(query):
     user_id = query.from_user.id
     
-    cursor.execute("""
-        SELECT bet_id, selections, total_odds, stake, status, payout, created_at
+    bets = await fetch_all("""
+        SELECT bet_id, total_odds, stake, status, payout, created_at
         FROM bets 
         WHERE user_id=? 
         ORDER BY bet_id DESC 
         LIMIT 5
     """, (user_id,))
     
-    bets = cursor.fetchall()
-    
     if not bets:
         keyboard = [
             [InlineKeyboardButton("🏆 Place a Bet", callback_data="menu_leagues_today")],
@@ -2652,11 +2381,15 @@ async def show_my_bets_inline(query):
     text = "📊 *YOUR BET HISTORY*\n"
     text += "─" * 30 + "\n\n"
     
-    for bet_id, selections_json, total_odds, stake, status, payout, created_at in bets:
+    # Every leg of these bets, with team names, in one query
+    selections_by_bet = await run_db(get_bet_selections, [bet[0] for bet in bets])
+    
+    for bet_id, total_odds, stake, status, payout, created_at in bets:
         status_emoji = {
             "PENDING": "⏳",
             "WON": "✅",
-            "LOST": "❌"
+            "LOST": "❌",
+            "VOID": "↩️"
         }.get(status, "📝")
         
         text += f"{status_emoji} *Bet #{bet_id}* - {status}\n"
@@ -2666,23 +2399,13 @@ async def show_my_bets_inline(query):
         text += f"   🏆 Potential Win: `{payout}` birr\n"
         
         try:
-            selections_data = json.loads(selections_json)
+            selections_data = selections_by_bet.get(bet_id, [])
             
             text += f"   \n   📋 *Selections:*\n"
             
             for i, s in enumerate(selections_data, 1):
-                cursor.execute("""
-                    SELECT t1.name as home, t2.name as away, l.name as league_name
-                    FROM fixtures f
-                    JOIN teams t1 ON f.home_team_id = t1.team_id
-                    JOIN teams t2 ON f.away_team_id = t2.team_id
-                    JOIN leagues l ON f.league_id = l.league_id
-                    WHERE f.fixture_id=?
-                """, (s["fixture_id"],))
-                match = cursor.fetchone()
-                
-                if match:
-                    home, away, league_name = match
+                if s["home"]:
+                    home, away, league_name = s["home"], s["away"], s["league_name"]
                     
                     # Determine market and pick display
                     market = s.get("market", "1X2")
@@ -2726,7 +2449,7 @@ async def show_my_bets_inline(query):
         
         text += "\n"  # Spacing between bets
     # Add summary
-    cursor.execute("""
+    summary = await fetch_one("""
         SELECT 
             SUM(CASE WHEN status='WON' THEN payout ELSE 0 END) as total_won,
             SUM(CASE WHEN status='LOST' THEN stake ELSE 0 END) as total_lost,
@@ -2736,8 +2459,6 @@ async def show_my_bets_inline(query):
             SUM(CASE WHEN status='LOST' THEN 1 ELSE 0 END) as lost_bets
         FROM bets WHERE user_id=?
     """, (user_id,))
-    
-    summary = cursor.fetchone()
     if summary and summary[2] > 0:
         total_won, total_lost, total_bets, pending_bets, won_bets, lost_bets = summary
         text += "─" * 30 + "\n"
@@ -2784,16 +2505,14 @@ async def view_older_bets_handler(update: Update, context: ContextTypes.DEFAULT_
     # Calculate offset for pagination
     offset = (page - 1) * 5
     
-    cursor.execute("""
-        SELECT bet_id, selections, total_odds, stake, status, payout, created_at
+    bets = await fetch_all("""
+        SELECT bet_id, total_odds, stake, status, payout, created_at
         FROM bets 
         WHERE user_id=? 
         ORDER BY bet_id DESC 
         LIMIT 5 OFFSET ?
     """, (user_id, offset))
     
-    bets = cursor.fetchall()
-    
     if not bets:
         if page == 1:
             await query.edit_message_text(
@@ -2818,11 +2537,14 @@ async def view_older_bets_handler(update: Update, context: ContextTypes.DEFAULT_
     text = f"📊 *YOUR BET HISTORY (Page {page})*\n"
     text += "─" * 30 + "\n\n"
     
-    for bet_id, selections_json, total_odds, stake, status, payout, created_at in bets:
+    selections_by_bet = await run_db(get_bet_selections, [bet[0] for bet in bets])
+    
+    for bet_id, total_odds, stake, status, payout, created_at in bets:
         status_emoji = {
             "PENDING": "⏳",
             "WON": "✅",
-            "LOST": "❌"
+            "LOST": "❌",
+            "VOID": "↩️"
         }.get(status, "📝")
         
         text += f"{status_emoji} *Bet #{bet_id}*\n"
@@ -2834,20 +2556,12 @@ async def view_older_bets_handler(update: Update, context: ContextTypes.DEFAULT_
         
         # Show first selection as example
         try:
-            selections_data = json.loads(selections_json)
+            selections_data = selections_by_bet.get(bet_id, [])
             if selections_data:
                 s = selections_data[0]
-                cursor.execute("""
-                    SELECT t1.name as home, t2.name as away
-                    FROM fixtures f
-                    JOIN teams t1 ON f.home_team_id = t1.team_id
-                    JOIN teams t2 ON f.away_team_id = t2.team_id
-                    WHERE f.fixture_id=?
-                """, (s["fixture_id"],))
-                match = cursor.fetchone()
                 
-                if match:
-                    home, away = match
+                if s["home"]:
+                    home, away = s["home"], s["away"]
                     market = s.get("market", "1X2")
                     pick = s["pick"]
                     
@@ -2870,8 +2584,7 @@ async def view_older_bets_handler(update: Update, context: ContextTypes.DEFAULT_
         text += "\n"
     
     # Count total bets for pagination
-    cursor.execute("SELECT COUNT(*) FROM bets WHERE user_id=?", (user_id,))
-    total_bets = cursor.fetchone()[0]
+    total_bets = (await fetch_one("SELECT COUNT(*) FROM bets WHERE user_id=?", (user_id,)))[0]
     
     # Calculate if there are more pages
     total_pages = (total_bets + 4) // 5  # Ceiling division
@@ -2939,7 +2652,7 @@ async def stake_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Place the bet
-    success, msg = place_bet(user_id, stake)
+    success, msg = await run_db(place_bet, user_id, stake)
     
     # Clear the awaiting stake flag
     context.user_data["awaiting_stake"] = False
@@ -3032,7 +2745,7 @@ async def debug_match_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Admin only")
         return
     
-    cursor.execute("""
+    matches = await fetch_all("""
         SELECT fixture_id, home_team_id, away_team_id, start_time, status,
                datetime(start_time) as start_dt,
                datetime('now') as now_dt,
@@ -3043,19 +2756,17 @@ async def debug_match_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
         LIMIT 10
     """)
     
-    matches = cursor.fetchall()
-    
     text = "🕒 *Match Time Debug*\n\n"
     
     for match in matches:
         fixture_id, home_id, away_id, start_time, status, start_dt, now_dt, minutes_diff = match
         
         # Get team names
-        cursor.execute("SELECT name FROM teams WHERE team_id = ?", (home_id,))
-        home_name = cursor.fetchone()[0] if cursor.fetchone() else f"Team {home_id}"
+        home_row = await fetch_one("SELECT name FROM teams WHERE team_id = ?", (home_id,))
+        home_name = home_row[0] if home_row else f"Team {home_id}"
         
-        cursor.execute("SELECT name FROM teams WHERE team_id = ?", (away_id,))
-        away_name = cursor.fetchone()[0] if cursor.fetchone() else f"Team {away_id}"
+        away_row = await fetch_one("SELECT name FROM teams WHERE team_id = ?", (away_id,))
+        away_name = away_row[0] if away_row else f"Team {away_id}"
         
         overdue = float(minutes_diff) > MATCH_GRACE_PERIOD_MINUTES if minutes_diff else False
         
@@ -3156,7 +2867,8 @@ async def refresh_odds_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
         
         # Clear cache for this fixture
-        cache.delete(f"odds_{fixture_id}")
+        await run_db(cache.delete, f"odds_{fixture_id}")
+        await run_db(api_limiter.delete_cached_odds, fixture_id)
         print(f"Cache cleared for fixture {fixture_id}")
         
         # Call match_details_with_odds to refresh with force refresh
@@ -3177,7 +2889,7 @@ async def league_info_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     league_id = int(query.data.split("_")[2])
     
     # Get league info
-    league_info = get_league_info(league_id)
+    league_info = await run_db(get_league_info, league_id)
     
     if not league_info:
         await query.edit_message_text("❌ League information not found")
@@ -3194,19 +2906,17 @@ async def league_info_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
     
     # Get popular teams in this league
-    cursor.execute("""
+    popular_teams = await fetch_all(f"""
         SELECT t.name, COUNT(f.fixture_id) as match_count
         FROM teams t
         JOIN fixtures f ON t.team_id IN (f.home_team_id, f.away_team_id)
         WHERE f.league_id = ? 
         AND f.status = 'NS'
-        AND datetime(f.start_time) > datetime('now', '-? minutes')
+        AND f.kickoff_ts > {NOW_TS_SQL} - ?
         GROUP BY t.team_id
         ORDER BY match_count DESC
         LIMIT 5
-    """, (league_id, MATCH_GRACE_PERIOD_MINUTES))
-    
-    popular_teams = cursor.fetchall()
+    """, (league_id, MATCH_GRACE_PERIOD_MINUTES * 60))
     
     if popular_teams:
         text += "⚽ *Popular Teams:*\n"
@@ -3237,7 +2947,7 @@ def main():
     # Clear expired cache on startup
     cache.clear_expired()
     
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = ApplicationBuilder().token(BOT_TOKEN).post_init(register_slip_notices).build()
     app.add_handler(CommandHandler("apistats", apistats_command))
     app.add_handler(CommandHandler("apistats", apistats_command))
 
@@ -3263,6 +2973,7 @@ def main():
     app.add_handler(CommandHandler("stats", admin_stats_command))
     app.add_handler(CommandHandler("checkadmin", check_admin))
     app.add_handler(CommandHandler("cleanup", admin_cleanup))
+    app.add_handler(CommandHandler("reconcile", admin_reconcile))
     
     # Debug command for match times
     app.add_handler(CommandHandler("debugtime", debug_match_time))
@@ -3306,6 +3017,7 @@ def main():
     # Pagination handlers for leagues - MUST COME BEFORE main_menu_handler
     app.add_handler(CallbackQueryHandler(show_leagues_menu, pattern="^leagues_page_"))
     app.add_handler(CallbackQueryHandler(show_leagues_menu, pattern="^refresh_leagues_"))
+    app.add_handler(CallbackQueryHandler(show_league_matches, pattern="^refresh_matches_"))
 	
     # League types handler
     app.add_handler(CallbackQueryHandler(main_menu_handler, pattern="^leagues_type_"))
@@ -3325,7 +3037,7 @@ def main():
     app.add_handler(MessageHandler(filters.PHOTO, photo_handler))
 
     print("🤖 Bot running with league-first navigation...")
-    print(f"📁 Image directory: {os.path.abspath('transaction_images')}")
+    print(f"📁 Image directory: {os.path.abspath(IMAGE_DIR)}")
     print(f"👑 Admin ID: {ADMIN_USER_ID}")
     print(f"💵 Minimum Deposit: {MIN_DEPOSIT}")
     print(f"💵 Minimum Withdrawal: {MIN_WITHDRAWAL}")
@@ -1,53 +1,150 @@
 # cache_manager.py
-import sqlite3
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from config import MEMORY_CACHE_SIZE, MEMORY_CACHE_TTL_SECONDS
+from db import get_connection
 
+# Every in-memory tier, for cache_stats()
+_memory_caches = []
+
+# ======================
+# IN-MEMORY LRU TIER
+# ======================
+class MemoryCache:
+    """Bounded in-process LRU with a TTL, sitting in front of a SQLite table"""
+    
+    def __init__(self, name, max_size=MEMORY_CACHE_SIZE, ttl_seconds=MEMORY_CACHE_TTL_SECONDS):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db_hits = 0
+        self.db_misses = 0
+        _memory_caches.append(self)
+    
+    def get(self, key):
+        """Return the stored value, or None when absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def count_db_lookup(self, found):
+        """Record whether a memory miss was answered by SQLite"""
+        with self._lock:
+            if found:
+                self.db_hits += 1
+            else:
+                self.db_misses += 1
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "db_hits": self.db_hits,
+                "db_misses": self.db_misses,
+                "hit_rate": (self.hits / lookups * 100) if lookups else 0
+            }
+
+def cache_stats():
+    """Hit/miss counters for every in-memory tier"""
+    return [c.stats() for c in _memory_caches]
+
+# ======================
+# GENERAL API CACHE (api_cache table)
+# ======================
 class CacheManager:
     def __init__(self):
-        self.conn = sqlite3.connect('bot.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.create_cache_table()
+        self.memory = MemoryCache("api")
     
     def create_cache_table(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS api_cache (
-                cache_key TEXT PRIMARY KEY,
-                data TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP
-            )
-        ''')
-        self.conn.commit()
+        with get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS api_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    data TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP
+                )
+            ''')
     
     def get(self, key):
         """Get cached data if not expired"""
-        self.cursor.execute(
-            "SELECT data FROM api_cache WHERE cache_key = ? AND expires_at > ?",
-            (key, datetime.now().isoformat())
-        )
-        result = self.cursor.fetchone()
-        if result:
-            return json.loads(result[0])
+        entry = self.memory.get(key)
+        if entry is None:
+            with get_connection() as conn:
+                result = conn.execute(
+                    "SELECT data, expires_at FROM api_cache WHERE cache_key = ? AND expires_at > ?",
+                    (key, datetime.now().isoformat())
+                ).fetchone()
+            self.memory.count_db_lookup(result is not None)
+            if not result:
+                return None
+            entry = (json.loads(result[0]), result[1])
+            self.memory.set(key, entry)
+        
+        data, expires_at = entry
+        if expires_at > datetime.now().isoformat():
+            return data
         return None
     
     def set(self, key, data, expiry_hours=1):
-        """Cache data with expiry"""
+        """Cache data with expiry (written through to SQLite)"""
         expires_at = (datetime.now() + timedelta(hours=expiry_hours)).isoformat()
-        self.cursor.execute(
-            '''INSERT OR REPLACE INTO api_cache (cache_key, data, expires_at)
-               VALUES (?, ?, ?)''',
-            (key, json.dumps(data), expires_at)
-        )
-        self.conn.commit()
+        with get_connection() as conn:
+            conn.execute(
+                '''INSERT OR REPLACE INTO api_cache (cache_key, data, expires_at)
+                   VALUES (?, ?, ?)''',
+                (key, json.dumps(data), expires_at)
+            )
+        self.memory.set(key, (data, expires_at))
+    
+    def delete(self, key):
+        """Invalidate one entry in both tiers"""
+        with get_connection() as conn:
+            conn.execute("DELETE FROM api_cache WHERE cache_key = ?", (key,))
+        self.memory.delete(key)
     
     def clear_expired(self):
         """Clean up expired cache"""
-        self.cursor.execute(
-            "DELETE FROM api_cache WHERE expires_at <= ?",
-            (datetime.now().isoformat(),)
-        )
-        self.conn.commit()
+        with get_connection() as conn:
+            conn.execute(
+                "DELETE FROM api_cache WHERE expires_at <= ?",
+                (datetime.now().isoformat(),)
+            )
 
 # Create instance
 cache = CacheManager()
\ No newline at end of file
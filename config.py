@@ -15,6 +15,9 @@ MAX_BET = 500
 MAX_DAILY_API_REQUESTS = 100          # Hard limit from provider
 API_PRIORITY_RESERVED_FOR_USERS = 70  # Reserve 70% for user interactions
 MAX_BACKGROUND_REQUESTS = 30          # Use only 30% for background tasks
+BACKGROUND_ESSENTIAL_RESERVE = 10     # Of those, never spent on prefetching (results / fixture sync)
+QUOTA_CHECKPOINT_EVERY = 5            # Save the in-memory call count after this many calls
+QUOTA_CHECKPOINT_SECONDS = 60         # ...and at least this often
 
 # Caching Times (Extended)
 ODDS_CACHE_HOURS = 6                  # Cache odds for 6 hours
@@ -64,6 +67,10 @@ DEFAULT_ACTIVE_LEAGUES = [39, 140, 135, 78, 61]  # Premier League, La Liga, Seri
 # ==============================================
 API_CACHE_HOURS = 24                  # Cache general API data for 24 hours
 ODDS_CACHE_MINUTES = 60               # Cache odds for 60 minutes (user session)
+MEMORY_CACHE_SIZE = 500               # Entries kept in RAM per cache (LRU)
+MEMORY_CACHE_TTL_SECONDS = 300        # RAM copies are re-read from SQLite after this
+BETSLIP_FLUSH_SECONDS = 30            # Write changed bet slips back to SQLite this often
+BETSLIP_IDLE_TTL_MINUTES = 30         # Drop untouched bet slips from RAM (rows are kept)
 API_CACHE_ENABLED = True              # Enable caching system
 
 # ==============================================
@@ -90,7 +97,44 @@ RESULTS_UPDATE_INTERVAL = 6           # Check results every 6 hours (was 2)
 # ==============================================
 ENABLE_BACKUP_API_KEY = False         # Don't use multiple keys (causes blocking)
 MAX_RETRY_ATTEMPTS = 2                # Retry failed API calls max 2 times
-RETRY_DELAY_SECONDS = 5               # Wait 5 seconds before retry
+RETRY_DELAY_SECONDS = 5               # Wait 5 seconds before retry (doubles each attempt)
+API_DEFAULT_TIMEOUT = 10              # Seconds per API-Football request
+API_TIMEOUTS = {                      # Per-endpoint timeout overrides (seconds)
+    "/odds": 8,
+    "/fixtures": 10,
+    "/leagues": 20,
+    "/teams": 15,
+}
+API_MAX_CONNECTIONS = 4               # Keep-alive connections to API-Football
+
+# ==============================================
+# TELEGRAM SEND LIMITS (notification fan-out)
+# ==============================================
+NOTIFY_MAX_CONCURRENCY = 8            # Sends in flight at once
+NOTIFY_GLOBAL_PER_SECOND = 30         # Bot-wide Telegram limit
+NOTIFY_CHAT_PER_SECOND = 1            # Sustained rate into one chat
+NOTIFY_CHAT_BURST = 20                # Short burst allowed into one chat
+NOTIFY_MAX_RETRIES = 2                # Retries after a RetryAfter (flood wait)
+
+# ==============================================
+# DEPOSIT SCREENSHOTS
+# ==============================================
+ARCHIVE_DEPOSIT_SCREENSHOTS = True    # Keep a local copy (Telegram file_id is primary)
+MAX_SCREENSHOT_BYTES = 10 * 1024 * 1024  # Skip archiving anything larger (10MB)
+ARCHIVE_MAX_DIMENSION = 1600          # Longest side after recompression (needs Pillow)
+ARCHIVE_TARGET_BYTES = 300 * 1024     # Lower JPEG quality until the copy fits
+ARCHIVE_RETENTION_DAYS = 7            # Keep processed screenshots this long
+ARCHIVE_PURGE_BATCH = 200             # Files unlinked per purge batch
+
+# ==============================================
+# RESULT POLLING
+# ==============================================
+RESULT_FIRST_CHECK_MINUTES = 115      # First result check after kickoff (90' + half-time + stoppage)
+RESULT_RETRY_MINUTES = 10             # Still playing: re-check after 10, 20, 40... minutes
+RESULT_MAX_BACKOFF_MINUTES = 180      # Longest wait, and the wait for postponed / not started
+RESULT_BATCH_WINDOW_MINUTES = 20      # Checks due this soon ride along in the same request
+RESULT_POSTPONED_VOID_DAYS = 3        # Postponed (PST) fixtures still unplayed this long after their date are void
+RESULT_POLL_SECONDS = 60              # How often the poller looks for due checks
 
 # ==============================================
 # PERFORMANCE SETTINGS
@@ -119,6 +163,8 @@ EMERGENCY_FALLBACK_LEAGUES = [39, 140]  # Only show Premier League & La Liga in
 SHOW_API_USAGE_TO_USERS = True        # Let users see API usage with /apistats
 ENABLE_PREDICTIVE_CACHING = True      # Pre-cache popular matches
 POPULAR_LEAGUE_IDS = [39, 140, 135]   # Pre-cache these leagues
+ODDS_PREFETCH_INTERVAL_HOURS = 4      # Bulk odds refresh (matches the 4h odds cache)
+ODDS_REVALIDATE_COOLDOWN_MINUTES = 30  # Retry a failed background odds refresh after this
 
 # ==============================================
 # DATABASE OPTIMIZATION
@@ -126,6 +172,11 @@ POPULAR_LEAGUE_IDS = [39, 140, 135]   # Pre-cache these leagues
 ENABLE_DB_CLEANUP = True              # Auto-clean old records
 DB_CLEANUP_DAYS = 7                   # Clean records older than 7 days
 MAX_DB_CONNECTIONS = 5                # Maximum database connections
+DB_JOURNAL_MODE = "WAL"               # Readers no longer block on writers
+DB_SYNCHRONOUS = "NORMAL"             # Safe with WAL, avoids an fsync per commit
+DB_CACHE_SIZE_KB = 16384              # Page cache per connection (16 MB)
+DB_MMAP_SIZE_MB = 64                  # Memory-mapped I/O window
+DB_TEMP_STORE = "MEMORY"              # Keep temp tables and sort files in RAM
 
 # ==============================================
 # TELEGRAM BOT SETTINGS
@@ -1,17 +1,139 @@
 # db.py
 import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import (
+    MAX_DB_CONNECTIONS, DB_JOURNAL_MODE, DB_SYNCHRONOUS,
+    DB_CACHE_SIZE_KB, DB_MMAP_SIZE_MB, DB_TEMP_STORE
+)
 
-# Connect to database
-conn = sqlite3.connect('bot.db', check_same_thread=False)
-cursor = conn.cursor()
+DB_PATH = 'bot.db'
+
+# Current time in epoch seconds, for range predicates on fixtures.kickoff_ts
+NOW_TS_SQL = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# ======================
+# CONNECTION POOL
+# ======================
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by every module"""
+    
+    def __init__(self, db_path=DB_PATH, max_connections=MAX_DB_CONNECTIONS, timeout=30):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        
+        # Per-connection tuning (journal_mode is persisted in the file itself)
+        conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE_MB * 1024 * 1024}")
+        conn.execute(f"PRAGMA temp_store={DB_TEMP_STORE}")
+        return conn
+    
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.max_connections:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        
+        # Pool exhausted - wait for another task to hand its connection back
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {self.timeout}s")
+    
+    def _release(self, conn):
+        self._idle.put(conn)
+    
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for one unit of work.
+        Commits when the block exits cleanly, rolls back on error.
+        Nested use on the same thread reuses the outer connection and
+        leaves the commit to the outermost block.
+        """
+        current = getattr(self._local, "conn", None)
+        if current is not None:
+            yield current
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+# Global pool used by db, betting, scheduler, caches and the async layer
+db_pool = ConnectionPool()
+
+def get_connection():
+    """Context manager yielding a pooled connection inside a transaction"""
+    return db_pool.connection()
 
 def init_db():
-    """Initialize database tables"""
+    """Storage bootstrap - run once at startup before anything touches bot.db"""
+    from cache_manager import cache
+    from api_limiter import api_limiter
+    from results_db import results_db
+    from migration import migrate_bet_selections
+    from ledger import ledger
+    from quota_counter import quota_counter
+    from image_archive import image_archive
+    
     create_tables()
+    migrate_existing_data()
+    migrate_kickoff_columns()
+    migrate_transaction_columns()
+    migrate_bet_selections()
+    
+    # Tables owned by the cache / limiter / results modules
+    cache.create_cache_table()
+    api_limiter.create_tables()
+    quota_counter.create_tables()
+    quota_counter.recover()
+    results_db.create_table()
+    ledger.create_tables()
+    ledger.backfill()
+    if image_archive.create_tables():
+        image_archive.backfill()
+    
+    with get_connection() as conn:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    print(f"✅ Storage ready (journal_mode={journal_mode})")
     
 def create_tables():
     """Create all database tables if they don't exist"""
-    
+    with get_connection() as conn:
+        _create_tables(conn.cursor())
+    print("✅ Database tables created/verified with league-first architecture")
+
+def _create_tables(cursor):
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -58,6 +180,20 @@ def create_tables():
         )
     ''')
     
+    # Bet selections - one row per leg (bets.selections keeps the JSON copy)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bet_selections (
+            selection_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bet_id INTEGER NOT NULL,
+            fixture_id INTEGER NOT NULL,
+            market TEXT,
+            pick TEXT,
+            odds REAL,
+            outcome TEXT DEFAULT NULL,
+            FOREIGN KEY (bet_id) REFERENCES bets (bet_id)
+        )
+    ''')
+    
     # Betslip table (temporary selections)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS betslip (
@@ -80,6 +216,8 @@ def create_tables():
             home_goals INTEGER DEFAULT NULL,
             away_goals INTEGER DEFAULT NULL,
             start_time TEXT,
+            kickoff_ts INTEGER,
+            match_day TEXT,
             status TEXT CHECK(status IN ('NS', 'LIVE', 'HT', 'FT', 'CANCELED', 'POSTPONED', 'TIME_EXPIRED')),
             FOREIGN KEY (league_id) REFERENCES leagues (league_id),
             FOREIGN KEY (home_team_id) REFERENCES teams (team_id),
@@ -99,6 +237,7 @@ def create_tables():
             account_number TEXT,
             status TEXT DEFAULT 'pending',
             image_filename TEXT,
+            image_file_id TEXT,
             processed_by INTEGER,
             processed_at TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -128,98 +267,141 @@ def create_tables():
     # Create indexes for faster queries - NEW
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixtures_status_time ON fixtures(status, start_time)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixtures_league ON fixtures(league_id, status)')
-    
-    conn.commit()
-    print("✅ Database tables created/verified with league-first architecture")
+    # Settlement and bet history lookups
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bet_selections_fixture ON bet_selections(fixture_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bet_selections_bet ON bet_selections(bet_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bets_status ON bets(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bets_user ON bets(user_id, bet_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_betslip_fixture ON betslip(fixture_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions(status, created_at)')
 
-# Create tables when this module is imported
-create_tables()
+# ======================
+# FIXTURE KICKOFF COLUMNS
+# ======================
+def fixture_time_columns(start_time):
+    """(kickoff_ts, match_day) for an API start time - same values as strftime('%s') / date()"""
+    dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()), dt.astimezone(timezone.utc).strftime("%Y-%m-%d")
 
-# Migration helper function
-def migrate_existing_data():
-    """Migrate existing fixtures to new schema"""
-    try:
-        print("🔄 Starting database migration...")
+def migrate_kickoff_columns():
+    """Add and backfill kickoff_ts / match_day, and the browse indexes on them"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
         
-        # Check if old fixtures table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='fixtures'")
-        if not cursor.fetchone():
-            print("✅ No migration needed - new schema already in place")
-            return
-            
-        # Check if new columns exist
         cursor.execute("PRAGMA table_info(fixtures)")
         columns = [col[1] for col in cursor.fetchall()]
+        if 'kickoff_ts' not in columns:
+            cursor.execute("ALTER TABLE fixtures ADD COLUMN kickoff_ts INTEGER")
+        if 'match_day' not in columns:
+            cursor.execute("ALTER TABLE fixtures ADD COLUMN match_day TEXT")
         
-        if 'league_id' not in columns:
-            print("🔄 Adding new columns to fixtures table...")
-            
-            # Create a temporary table with new structure
-            cursor.execute('''
-                CREATE TABLE fixtures_new (
-                    fixture_id INTEGER PRIMARY KEY,
-                    league_id INTEGER DEFAULT 1,
-                    home_team_id INTEGER,
-                    away_team_id INTEGER,
-                    home_goals INTEGER DEFAULT NULL,
-                    away_goals INTEGER DEFAULT NULL,
-                    start_time TEXT,
-                    status TEXT,
-                    FOREIGN KEY (league_id) REFERENCES leagues (league_id),
-                    FOREIGN KEY (home_team_id) REFERENCES teams (team_id),
-                    FOREIGN KEY (away_team_id) REFERENCES teams (team_id)
-                )
-            ''')
-            
-            # Copy existing data (we'll create dummy team IDs)
-            cursor.execute('''
-                INSERT INTO fixtures_new (fixture_id, league_id, home_team_id, away_team_id, 
-                                        start_time, status)
-                SELECT fixture_id, 1, 
-                       fixture_id * 1000 + 1,  -- Create dummy home team ID
-                       fixture_id * 1000 + 2,  -- Create dummy away team ID
-                       start_time, status
-                FROM fixtures
-            ''')
-            
-            # Drop old table and rename new one
-            cursor.execute('DROP TABLE fixtures')
-            cursor.execute('ALTER TABLE fixtures_new RENAME TO fixtures')
-            
-            # Create teams for existing fixtures
-            cursor.execute('SELECT DISTINCT home FROM fixtures_old UNION SELECT DISTINCT away FROM fixtures_old')
-            teams = cursor.fetchall()
-            
-            for team_name in teams:
-                if team_name and team_name[0]:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO teams (team_id, name, short_name)
-                        VALUES (?, ?, ?)
-                    ''', (hash(team_name[0]) % 1000000, team_name[0], team_name[0][:3].upper()))
-            
-            print("✅ Migration completed successfully")
-            
-        # Create a default league if none exists
-        cursor.execute("SELECT COUNT(*) FROM leagues")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO leagues (league_id, name, country, is_active)
-                VALUES (1, 'Premier League', 'England', 1),
-                       (2, 'La Liga', 'Spain', 1),
-                       (3, 'Serie A', 'Italy', 1),
-                       (4, 'Bundesliga', 'Germany', 1),
-                       (5, 'Ligue 1', 'France', 1)
-            ''')
-            print("✅ Created default leagues")
-        
-        conn.commit()
+        cursor.execute("""
+            UPDATE fixtures
+            SET kickoff_ts = CAST(strftime('%s', start_time) AS INTEGER),
+                match_day = date(start_time)
+            WHERE kickoff_ts IS NULL OR match_day IS NULL
+        """)
         
+        # Range predicates on kickoff_ts, equality on everything before it
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixtures_day ON fixtures(status, match_day, kickoff_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixtures_league_day ON fixtures(league_id, status, match_day, kickoff_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixtures_kickoff ON fixtures(status, kickoff_ts)')
+        # Any-status kickoff windows (bet slip expiry sweep)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixtures_kickoff_ts ON fixtures(kickoff_ts)')
+
+def migrate_transaction_columns():
+    """Add transactions.image_file_id (Telegram file_id of the screenshot)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(transactions)")
+        columns = [col[1] for col in cursor.fetchall()]
+        if 'image_file_id' not in columns:
+            cursor.execute("ALTER TABLE transactions ADD COLUMN image_file_id TEXT")
+
+# Migration helper function
+def migrate_existing_data():
+    """Migrate existing fixtures to new schema"""
+    try:
+        with get_connection() as conn:
+            _migrate_existing_data(conn.cursor())
     except Exception as e:
         print(f"❌ Migration error: {e}")
-        conn.rollback()
 
-# Run migration if needed
-migrate_existing_data()
+def _migrate_existing_data(cursor):
+    print("🔄 Starting database migration...")
+    
+    # Check if old fixtures table exists
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='fixtures'")
+    if not cursor.fetchone():
+        print("✅ No migration needed - new schema already in place")
+        return
+        
+    # Check if new columns exist
+    cursor.execute("PRAGMA table_info(fixtures)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    if 'league_id' not in columns:
+        print("🔄 Adding new columns to fixtures table...")
+        
+        # Create a temporary table with new structure
+        cursor.execute('''
+            CREATE TABLE fixtures_new (
+                fixture_id INTEGER PRIMARY KEY,
+                league_id INTEGER DEFAULT 1,
+                home_team_id INTEGER,
+                away_team_id INTEGER,
+                home_goals INTEGER DEFAULT NULL,
+                away_goals INTEGER DEFAULT NULL,
+                start_time TEXT,
+                status TEXT,
+                FOREIGN KEY (league_id) REFERENCES leagues (league_id),
+                FOREIGN KEY (home_team_id) REFERENCES teams (team_id),
+                FOREIGN KEY (away_team_id) REFERENCES teams (team_id)
+            )
+        ''')
+        
+        # Copy existing data (we'll create dummy team IDs)
+        cursor.execute('''
+            INSERT INTO fixtures_new (fixture_id, league_id, home_team_id, away_team_id, 
+                                    start_time, status)
+            SELECT fixture_id, 1, 
+                   fixture_id * 1000 + 1,  -- Create dummy home team ID
+                   fixture_id * 1000 + 2,  -- Create dummy away team ID
+                   start_time, status
+            FROM fixtures
+        ''')
+        
+        # Drop old table and rename new one
+        cursor.execute('DROP TABLE fixtures')
+        cursor.execute('ALTER TABLE fixtures_new RENAME TO fixtures')
+        
+        # Create teams for existing fixtures
+        cursor.execute('SELECT DISTINCT home FROM fixtures_old UNION SELECT DISTINCT away FROM fixtures_old')
+        teams = cursor.fetchall()
+        
+        for team_name in teams:
+            if team_name and team_name[0]:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO teams (team_id, name, short_name)
+                    VALUES (?, ?, ?)
+                ''', (hash(team_name[0]) % 1000000, team_name[0], team_name[0][:3].upper()))
+        
+        print("✅ Migration completed successfully")
+        
+    # Create a default league if none exists
+    cursor.execute("SELECT COUNT(*) FROM leagues")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO leagues (league_id, name, country, is_active)
+            VALUES (1, 'Premier League', 'England', 1),
+                   (2, 'La Liga', 'Spain', 1),
+                   (3, 'Serie A', 'Italy', 1),
+                   (4, 'Bundesliga', 'Germany', 1),
+                   (5, 'Ligue 1', 'France', 1)
+        ''')
+        print("✅ Created default leagues")
 
 # db.py - Add this function at the end:
 def get_bettable_matches_query():
@@ -233,8 +415,8 @@ def get_bettable_matches_query():
     
     condition = f"""
         f.status = 'NS' 
-        AND datetime(f.start_time) > datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES} minutes')
-        AND datetime(f.start_time) < datetime('now', '+{MATCH_FUTURE_LIMIT_HOURS} hours')
+        AND f.kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
+        AND f.kickoff_ts < {NOW_TS_SQL} + {MATCH_FUTURE_LIMIT_HOURS * 3600}
     """
     
     return condition
\ No newline at end of file
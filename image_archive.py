@@ -0,0 +1,321 @@
+# image_archive.py
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from async_db import fetch_one, execute
+from db import get_connection
+from config import (
+    ARCHIVE_DEPOSIT_SCREENSHOTS, MAX_SCREENSHOT_BYTES, ARCHIVE_MAX_DIMENSION,
+    ARCHIVE_TARGET_BYTES, ARCHIVE_RETENTION_DAYS, ARCHIVE_PURGE_BATCH
+)
+
+try:
+    from PIL import Image
+except ImportError:
+    # Optional - without Pillow screenshots are archived as received
+    Image = None
+
+IMAGE_DIR = "transaction_images"
+
+# Tried in order until the JPEG fits ARCHIVE_TARGET_BYTES
+JPEG_QUALITIES = (85, 70, 55)
+
+# Leading bytes -> extension for copies kept as received
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+class ImageArchive:
+    """
+    Optional local copies of deposit screenshots. Telegram's file_id is the
+    primary handle; the copy is downloaded in the background, recompressed,
+    stored under YYYY/MM/DD/<sha256>.<ext> and tracked in archived_images.
+    """
+    
+    def __init__(self, directory=IMAGE_DIR):
+        self.directory = directory
+        self._tasks = set()
+        # Serialises index + file changes between archiving and purging
+        self._lock = threading.Lock()
+    
+    def create_tables(self):
+        """Create the archive index (called from db.init_db); True when it is new"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archived_images'"
+            ).fetchone()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_images (
+                    digest TEXT PRIMARY KEY,
+                    path TEXT UNIQUE,
+                    size_bytes INTEGER,
+                    original_bytes INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    released_at TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_images_released ON archived_images(released_at)')
+        return not exists
+    
+    def backfill(self):
+        """One-shot: index flat-directory screenshots of older transactions so purge() sees them"""
+        with get_connection() as conn:
+            rows = conn.execute("""
+                SELECT t.image_filename, MIN(t.created_at),
+                       MAX(CASE WHEN t.status = 'pending' THEN 1 ELSE 0 END),
+                       MAX(t.processed_at)
+                FROM transactions t
+                LEFT JOIN archived_images a ON a.path = t.image_filename
+                WHERE t.image_filename IS NOT NULL AND a.path IS NULL
+                GROUP BY t.image_filename
+            """).fetchall()
+            if not rows:
+                return
+            
+            entries = []
+            for path, created_at, pending, processed_at in rows:
+                try:
+                    size = os.path.getsize(self._full_path(path))
+                except OSError:
+                    size = 0
+                released_at = None if pending else (processed_at or created_at)
+                entries.append((f"legacy:{path}", path, size, size, created_at, released_at))
+            conn.executemany("""
+                INSERT OR IGNORE INTO archived_images
+                (digest, path, size_bytes, original_bytes, created_at, released_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, entries)
+        print(f"[ImageArchive] Indexed {len(entries)} legacy screenshots")
+    
+    # ====== ARCHIVING ======
+    def schedule(self, bot, transaction_id, file_id):
+        """Archive in the background - the deposit handler never waits on it"""
+        if not ARCHIVE_DEPOSIT_SCREENSHOTS or not file_id:
+            return
+        task = asyncio.create_task(self.archive(bot, transaction_id, file_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def archive(self, bot, transaction_id, file_id):
+        """Download, dedupe, recompress and record one screenshot; returns its path or None"""
+        try:
+            telegram_file = await bot.get_file(file_id)
+            if telegram_file.file_size and telegram_file.file_size > MAX_SCREENSHOT_BYTES:
+                raise ValueError(f"File too large: {telegram_file.file_size // 1024}KB")
+            
+            data = bytes(await telegram_file.download_as_bytearray())
+            if not data:
+                raise ValueError("Downloaded file is empty")
+            if len(data) > MAX_SCREENSHOT_BYTES:
+                raise ValueError(f"File too large after download: {len(data) // 1024}KB")
+            
+            path, size = await asyncio.to_thread(self._store, data)
+            await execute(
+                "UPDATE transactions SET image_filename = ? WHERE transaction_id = ?",
+                (path, transaction_id)
+            )
+            state = "saved" if size is not None else "duplicate of"
+            stored = f"{len(data) // 1024}KB -> {size // 1024}KB" if size is not None else f"{len(data) // 1024}KB"
+            print(f"[ImageArchive] #{transaction_id}: {state} {path} ({stored})")
+            
+            # The admin may already have processed it while we downloaded
+            row = await fetch_one(
+                "SELECT status FROM transactions WHERE transaction_id = ?", (transaction_id,)
+            )
+            if row and row[0] != "pending":
+                await self.release(transaction_id, path)
+            return path
+        except Exception as e:
+            print(f"[ImageArchive] Could not archive screenshot for #{transaction_id}: {e}")
+            return None
+    
+    def _claim(self, digest):
+        """Path of an already archived copy (no longer released), or None"""
+        with get_connection() as conn:
+            row = conn.execute(
+                "UPDATE archived_images SET released_at = NULL WHERE digest = ? RETURNING path",
+                (digest,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _store(self, data):
+        """(path, stored_size) - stored_size is None for a duplicate (worker thread)"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            path = self._claim(digest)
+        if path:
+            return path, None
+        
+        # Recompress outside the lock - it is the slow part
+        small = recompress(data)
+        
+        with self._lock:
+            path = self._claim(digest)
+            if path:
+                return path, None
+            
+            extension = ".jpg" if small is not data else image_extension(data)
+            path = f"{datetime.now(timezone.utc):%Y/%m/%d}/{digest}{extension}"
+            full_path = self._full_path(path)
+            shard = os.path.dirname(full_path)
+            os.makedirs(shard, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=shard, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(small)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            
+            with get_connection() as conn:
+                conn.execute("""
+                    INSERT INTO archived_images (digest, path, size_bytes, original_bytes)
+                    VALUES (?, ?, ?, ?)
+                """, (digest, path, len(small), len(data)))
+        return path, len(small)
+    
+    # ====== READING / RELEASING ======
+    def _full_path(self, path):
+        return os.path.join(self.directory, *path.split("/"))
+    
+    def read(self, path):
+        """Archived bytes, or None (worker thread)"""
+        try:
+            with open(self._full_path(path), 'rb') as f:
+                return f.read()
+        except OSError as e:
+            print(f"[ImageArchive] Error reading {path}: {e}")
+            return None
+    
+    async def release(self, transaction_id, path):
+        """Start the retention clock on a processed transaction's copy unless a pending one shares it"""
+        if not path:
+            return False
+        shared = await fetch_one("""
+            SELECT 1 FROM transactions
+            WHERE status = 'pending' AND image_filename = ? AND transaction_id != ?
+            LIMIT 1
+        """, (path, transaction_id))
+        if shared:
+            return False
+        await execute(
+            "UPDATE archived_images SET released_at = CURRENT_TIMESTAMP WHERE path = ? AND released_at IS NULL",
+            (path,)
+        )
+        return True
+    
+    # ====== RETENTION ======
+    def purge(self, retention_days=ARCHIVE_RETENTION_DAYS):
+        """
+        Drop copies released more than retention_days ago: an indexed delete
+        from archived_images, then unlink that batch. Returns (files, bytes).
+        Blocking - run from the scheduler or asyncio.to_thread.
+        """
+        files = 0
+        freed = 0
+        while True:
+            with self._lock:
+                with get_connection() as conn:
+                    batch = conn.execute("""
+                        DELETE FROM archived_images WHERE digest IN (
+                            SELECT digest FROM archived_images
+                            WHERE released_at <= datetime('now', ?)
+                            LIMIT ?
+                        )
+                        RETURNING path, size_bytes
+                    """, (f"-{retention_days} days", ARCHIVE_PURGE_BATCH)).fetchall()
+                
+                shards = set()
+                for path, size in batch:
+                    if self.delete(path):
+                        files += 1
+                        freed += size or 0
+                    shards.add(os.path.dirname(self._full_path(path)))
+                self._remove_empty_shards(shards)
+            
+            if len(batch) < ARCHIVE_PURGE_BATCH:
+                break
+        
+        if files:
+            print(f"[ImageArchive] Purged {files} screenshots ({freed // 1024}KB)")
+        return files, freed
+    
+    def delete(self, path):
+        """Remove one archived file (worker thread)"""
+        try:
+            os.remove(self._full_path(path))
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"[ImageArchive] Error deleting {path}: {e}")
+            return False
+    
+    def _remove_empty_shards(self, shards):
+        """rmdir day / month / year directories a purge left empty"""
+        root = os.path.abspath(self.directory)
+        for shard in shards:
+            current = os.path.abspath(shard)
+            while current != root and current.startswith(root):
+                try:
+                    os.rmdir(current)
+                except OSError:
+                    break
+                current = os.path.dirname(current)
+    
+    def stats(self):
+        """Archive size from the index - no directory scan"""
+        with get_connection() as conn:
+            files, size, original, released = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(size_bytes), 0),
+                       COALESCE(SUM(original_bytes), 0), COUNT(released_at)
+                FROM archived_images
+            """).fetchone()
+        return {
+            "files": files,
+            "bytes": size,
+            "original_bytes": original,
+            "released": released
+        }
+
+def recompress(data):
+    """Bounded JPEG re-encode of data, or data itself (no Pillow, unreadable, or no gain)"""
+    if Image is None:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGB")
+            img.thumbnail((ARCHIVE_MAX_DIMENSION, ARCHIVE_MAX_DIMENSION))
+            for quality in JPEG_QUALITIES:
+                out = io.BytesIO()
+                img.save(out, "JPEG", quality=quality, optimize=True)
+                if out.tell() <= ARCHIVE_TARGET_BYTES:
+                    break
+        result = out.getvalue()
+    except Exception as e:
+        print(f"[ImageArchive] Keeping original, could not recompress: {e}")
+        return data
+    return result if len(result) < len(data) else data
+
+def image_extension(data):
+    """File extension for image bytes from their signature (.bin if unknown)"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return ".bin"
+
+# Create global instance
+image_archive = ImageArchive()
\ No newline at end of file
@@ -0,0 +1,279 @@
+# ledger.py
+from datetime import datetime, timezone
+from db import get_connection
+from config import START_BALANCE
+
+# Every balance movement is one balanced entry: the user's wallet moves by
+# `amount` and the counter account by -amount. So per user,
+# SUM(ledger.amount) == users.balance (see reconcile()).
+COUNTER_ACCOUNTS = {
+    "opening": "equity",          # balances that predate the ledger
+    "signup": "bonus",            # START_BALANCE on /start
+    "deposit": "cash",            # deposit approved
+    "withdraw_hold": "cash",      # withdrawal requested (held immediately)
+    "withdraw_refund": "cash",    # withdrawal rejected
+    "stake": "house",             # bet placed
+    "payout": "house"             # bet won
+}
+
+# Running totals: one row per (period, metric), period is 'all' or a UTC day
+_BUMP_SQL = """
+    INSERT INTO ledger_totals (period, metric, amount, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT (period, metric) DO UPDATE SET
+        amount = amount + excluded.amount,
+        count = count + excluded.count
+"""
+
+def ledger_day():
+    """Current totals period (UTC, same as SQLite's date('now'))"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+class Ledger:
+    """Double-entry record of balance movements plus O(1) dashboard totals"""
+    
+    def create_tables(self):
+        """Create ledger tables (called from db.init_db)"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ledger (
+                    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    kind TEXT,
+                    counter_account TEXT,
+                    amount REAL,
+                    ref_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger(user_id, entry_id)')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ledger_totals (
+                    period TEXT,
+                    metric TEXT,
+                    amount REAL DEFAULT 0,
+                    count INTEGER DEFAULT 0,
+                    PRIMARY KEY (period, metric)
+                )
+            ''')
+    
+    def backfill(self):
+        """One-shot: opening entries for existing balances, and seed the totals"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            if cursor.execute("SELECT 1 FROM ledger_totals LIMIT 1").fetchone():
+                return
+            
+            cursor.execute("""
+                INSERT INTO ledger (user_id, kind, counter_account, amount)
+                SELECT user_id, 'opening', 'equity', balance FROM users WHERE balance != 0
+            """)
+            
+            user_count, balance = cursor.execute(
+                "SELECT COUNT(*), COALESCE(SUM(balance), 0) FROM users"
+            ).fetchone()
+            seeds = [("all", "users", 0, user_count), ("all", "balance", balance, 0)]
+            
+            # Requests by creation day, approvals by processing day
+            rows = cursor.execute("""
+                SELECT date(created_at), 'tx_' || type, COALESCE(SUM(amount), 0), COUNT(*)
+                FROM transactions GROUP BY 1, 2
+                UNION ALL
+                SELECT date(processed_at),
+                       CASE type WHEN 'deposit' THEN 'deposit' ELSE 'withdraw_approved' END,
+                       COALESCE(SUM(amount), 0), COUNT(*)
+                FROM transactions WHERE status = 'approved' GROUP BY 1, 2
+                UNION ALL
+                SELECT date(created_at), 'stake', COALESCE(SUM(stake), 0), COUNT(*)
+                FROM bets GROUP BY 1
+            """).fetchall()
+            for day, metric, amount, count in rows:
+                seeds.append(("all", metric, amount, count))
+                if day:
+                    seeds.append((day, metric, amount, count))
+            
+            pending, won, won_count = cursor.execute("""
+                SELECT (SELECT COUNT(*) FROM transactions WHERE status = 'pending'),
+                       COALESCE(SUM(payout), 0), COUNT(*)
+                FROM bets WHERE status = 'WON'
+            """).fetchone()
+            seeds.append(("all", "tx_pending", 0, pending))
+            seeds.append(("all", "payout", won, won_count))
+            
+            cursor.executemany(_BUMP_SQL, seeds)
+        print(f"[Ledger] Opened {user_count} accounts holding {balance}")
+    
+    # ====== POSTING (inside the caller's transaction) ======
+    def bump(self, cursor, metrics):
+        """Add [(metric, amount, count)] to today's and the all-time totals"""
+        day = ledger_day()
+        cursor.executemany(_BUMP_SQL, [
+            (period, metric, amount, count)
+            for metric, amount, count in metrics
+            for period in ("all", day)
+        ])
+    
+    def post(self, cursor, user_id, kind, amount, ref_id=None, require_funds=False):
+        """
+        Move a user's balance by amount (negative = debit) and record it.
+        With require_funds the debit only happens if the balance covers it.
+        Returns False when nothing was posted.
+        """
+        if require_funds:
+            cursor.execute(
+                "UPDATE users SET balance = balance + ? WHERE user_id = ? AND balance >= ?",
+                (amount, user_id, -amount)
+            )
+        else:
+            cursor.execute(
+                "UPDATE users SET balance = balance + ? WHERE user_id = ?",
+                (amount, user_id)
+            )
+        if cursor.rowcount == 0:
+            return False
+        
+        cursor.execute("""
+            INSERT INTO ledger (user_id, kind, counter_account, amount, ref_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, kind, COUNTER_ACCOUNTS[kind], amount, ref_id))
+        self.bump(cursor, [(kind, abs(amount), 1), ("balance", amount, 0)])
+        return True
+    
+    def record_payouts(self, cursor, winners_table):
+        """Entries for winners staged in winners_table (bet_id, user_id, payout); the caller credits balances"""
+        cursor.execute(f"""
+            INSERT INTO ledger (user_id, kind, counter_account, amount, ref_id)
+            SELECT user_id, 'payout', '{COUNTER_ACCOUNTS["payout"]}', payout, bet_id FROM {winners_table}
+        """)
+        total, count = cursor.execute(
+            f"SELECT COALESCE(SUM(payout), 0), COUNT(*) FROM {winners_table}"
+        ).fetchone()
+        if count:
+            self.bump(cursor, [("payout", total, count), ("balance", total, 0)])
+    
+    # ====== WALLET OPERATIONS (one transaction each, run via run_db) ======
+    def open_account(self, user_id, username):
+        """Create the user with the signup credit; False if they already exist"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT OR IGNORE INTO users (user_id, username, balance) VALUES (?, ?, 0)",
+                (user_id, username)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self.bump(cursor, [("users", 0, 1)])
+            if START_BALANCE:
+                self.post(cursor, user_id, "signup", START_BALANCE)
+        return True
+    
+    def request_deposit(self, user_id, username, amount, method, image_file_id=None):
+        """Record a pending deposit (no balance movement until approved)"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO transactions 
+                (user_id, username, type, amount, method, status, image_file_id)
+                VALUES (?, ?, 'deposit', ?, ?, 'pending', ?)
+            """, (user_id, username, amount, method, image_file_id))
+            transaction_id = cursor.lastrowid
+            self.bump(cursor, [("tx_deposit", amount, 1), ("tx_pending", 0, 1)])
+        return transaction_id
+    
+    def request_withdrawal(self, user_id, username, amount, method, account_number):
+        """Hold the amount and record a pending withdrawal; None if funds are short"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO transactions 
+                (user_id, username, type, amount, method, status, account_number)
+                VALUES (?, ?, 'withdraw', ?, ?, 'pending', ?)
+            """, (user_id, username, amount, method, account_number))
+            transaction_id = cursor.lastrowid
+            
+            if not self.post(cursor, user_id, "withdraw_hold", -amount, transaction_id, require_funds=True):
+                conn.rollback()
+                return None
+            self.bump(cursor, [("tx_withdraw", amount, 1), ("tx_pending", 0, 1)])
+        return transaction_id
+    
+    def process_transaction(self, transaction_id, status, admin_id):
+        """
+        Approve or reject a pending request and post its balance movement.
+        False if it was already processed (e.g. a double-clicked button).
+        """
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE transactions 
+                SET status=?, processed_at=CURRENT_TIMESTAMP, processed_by=?
+                WHERE transaction_id=? AND status='pending'
+            """, (status, admin_id, transaction_id))
+            if cursor.rowcount == 0:
+                return False
+            
+            user_id, trans_type, amount = cursor.execute(
+                "SELECT user_id, type, amount FROM transactions WHERE transaction_id=?",
+                (transaction_id,)
+            ).fetchone()
+            amount = amount or 0
+            
+            if trans_type == "deposit" and status == "approved":
+                self.post(cursor, user_id, "deposit", amount, transaction_id)
+            elif trans_type == "withdraw" and status == "approved":
+                # Already held at request time
+                self.bump(cursor, [("withdraw_approved", amount, 1)])
+            elif trans_type == "withdraw":
+                self.post(cursor, user_id, "withdraw_refund", amount, transaction_id)
+            self.bump(cursor, [("tx_pending", 0, -1)])
+        return True
+    
+    # ====== DASHBOARDS ======
+    def get_totals(self, period="all"):
+        """{metric: (amount, count)} for one period - a handful of rows"""
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT metric, amount, count FROM ledger_totals WHERE period = ?",
+                (period,)
+            ).fetchall()
+        return {metric: (amount, count) for metric, amount, count in rows}
+    
+    def reconcile(self):
+        """Full check that the ledger explains every balance (admin /reconcile)"""
+        with get_connection() as conn:
+            mismatches = conn.execute("""
+                SELECT u.user_id, u.balance, COALESCE(l.total, 0)
+                FROM users u
+                LEFT JOIN (
+                    SELECT user_id, SUM(amount) AS total FROM ledger GROUP BY user_id
+                ) l ON l.user_id = u.user_id
+                WHERE ABS(u.balance - COALESCE(l.total, 0)) > 0.005
+                ORDER BY u.user_id
+            """).fetchall()
+            user_count, balance = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(balance), 0) FROM users"
+            ).fetchone()
+            ledger_balance, entries = conn.execute(
+                "SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM ledger"
+            ).fetchone()
+        
+        totals = self.get_totals()
+        totals_balance = totals.get("balance", (0, 0))[0]
+        totals_users = totals.get("users", (0, 0))[1]
+        return {
+            "users": user_count,
+            "entries": entries,
+            "balance": balance,
+            "ledger_balance": ledger_balance,
+            "totals_balance": totals_balance,
+            "totals_users": totals_users,
+            "mismatches": mismatches,
+            "ok": (not mismatches
+                   and abs(balance - ledger_balance) < 0.005
+                   and abs(balance - totals_balance) < 0.005
+                   and user_count == totals_users)
+        }
+
+# Create global instance
+ledger = Ledger()
\ No newline at end of file
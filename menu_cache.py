@@ -0,0 +1,198 @@
+# menu_cache.py
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from config import MAX_LEAGUES_PER_PAGE, DEFAULT_ACTIVE_LEAGUES, MATCH_GRACE_PERIOD_MINUTES
+from db import get_connection, NOW_TS_SQL
+from cache_manager import MemoryCache
+
+# ======================
+# FIXTURE-SET VERSION
+# ======================
+class FixtureSetVersion:
+    """
+    Bumped whenever the set of bettable fixtures may have changed
+    (fixture ingest, TIME_EXPIRED sweep, league updates).
+    Menu snapshots built under an older version are rebuilt.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+    
+    def bump(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+# ======================
+# COUNTRY FLAGS
+# ======================
+_FLAG_MAP = {
+    # Comprehensive country flag mapping
+    "England": "🏴󠁧󠁢󠁥󠁮󠁧󠁿",
+    "Spain": "🇪🇸", 
+    "Italy": "🇮🇹",
+    "Germany": "🇩🇪",
+    "France": "🇫🇷",
+    "Portugal": "🇵🇹",
+    "Netherlands": "🇳🇱",
+    "Brazil": "🇧🇷",
+    "Argentina": "🇦🇷",
+    "USA": "🇺🇸",
+    "Mexico": "🇲🇽",
+    "Turkey": "🇹🇷",
+    "Russia": "🇷🇺",
+    "Ukraine": "🇺🇦",
+    "Scotland": "🏴󠁧󠁢󠁳󠁣󠁴󠁿",
+    "Belgium": "🇧🇪",
+    "Austria": "🇦🇹",
+    "Switzerland": "🇨🇭",
+    "Denmark": "🇩🇰",
+    "Sweden": "🇸🇪",
+    "Norway": "🇳🇴",
+    "Finland": "🇫🇮",
+    "Poland": "🇵🇱",
+    "Czech": "🇨🇿",
+    "Croatia": "🇭🇷",
+    "Serbia": "🇷🇸",
+    "Greece": "🇬🇷",
+    "Cyprus": "🇨🇾",
+    "Israel": "🇮🇱",
+    "Saudi": "🇸🇦",
+    "UAE": "🇦🇪",
+    "Qatar": "🇶🇦",
+    "Canada": "🇨🇦",
+    "Australia": "🇦🇺",
+    "Japan": "🇯🇵",
+    "Korea": "🇰🇷",
+    "China": "🇨🇳",
+    "International": "🌍",
+    "World": "🌎",
+    "Europe": "🇪🇺",
+    "Africa": "🇦🇴",
+    "Asia": "🇦🇸",
+    "America": "🇺🇸"
+}
+
+@lru_cache(maxsize=None)
+def get_country_flag(country_name: str) -> str:
+    """Get appropriate flag emoji for country (memoized - the partial match scan runs once per name)"""
+    # Check for exact match
+    if country_name in _FLAG_MAP:
+        return _FLAG_MAP[country_name]
+    
+    # Check for partial matches
+    for key, flag in _FLAG_MAP.items():
+        if key in country_name or country_name in key:
+            return flag
+    
+    # Use country code as fallback
+    if country_name and len(country_name) >= 2:
+        return f"({country_name[:2].upper()})"
+    
+    return "🏆"
+
+# ======================
+# LEAGUE MENU SNAPSHOT
+# ======================
+class LeagueMenuSnapshot:
+    """
+    Materialized "Today's / Tomorrow's Leagues" menu, one entry per
+    (day_offset, page). A whole day is built in one query and served
+    from memory until the fixture-set version or the date changes.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = {}   # (day_offset, page) -> snapshot dict
+        self._stamps = {}  # day_offset -> (version, target_date) it was built for
+    
+    def lookup(self, day_offset, page):
+        """Snapshot for this page if still current, else None (no DB access)"""
+        target_date = (datetime.now() + timedelta(days=day_offset)).strftime("%Y-%m-%d")
+        with self._lock:
+            if self._stamps.get(day_offset) != (fixture_set_version.value, target_date):
+                return None
+            return self._page(day_offset, page)
+    
+    def rebuild(self, day_offset, page):
+        """Rebuild every page for this day, then return the requested one"""
+        version = fixture_set_version.value
+        target_date = (datetime.now() + timedelta(days=day_offset)).strftime("%Y-%m-%d")
+        pages = self._build(target_date)
+        
+        with self._lock:
+            for key in [k for k in self._pages if k[0] == day_offset]:
+                del self._pages[key]
+            for i, snapshot in enumerate(pages):
+                self._pages[(day_offset, i)] = snapshot
+            self._stamps[day_offset] = (version, target_date)
+            return self._page(day_offset, page)
+    
+    def _page(self, day_offset, page):
+        total_pages = sum(1 for k in self._pages if k[0] == day_offset)
+        page = max(0, min(page, total_pages - 1))
+        return self._pages[(day_offset, page)]
+    
+    def _build(self, target_date):
+        """All pages for one day: [{leagues, total_leagues, total_pages, page, fallback}]"""
+        with get_connection() as conn:
+            rows = conn.execute(f"""
+                SELECT l.league_id, l.name, l.country, COUNT(f.fixture_id) as match_count
+                FROM leagues l
+                JOIN fixtures f ON l.league_id = f.league_id
+                WHERE f.status = 'NS'
+                AND f.match_day = ?
+                AND f.kickoff_ts > {NOW_TS_SQL} - {MATCH_GRACE_PERIOD_MINUTES * 60}
+                AND l.is_active = 1
+                GROUP BY l.league_id
+                ORDER BY l.country, l.name
+            """, (target_date,)).fetchall()
+            
+            fallback = False
+            if not rows:
+                # Nothing on this day - offer the default leagues' upcoming matches
+                rows = conn.execute(f"""
+                    SELECT l.league_id, l.name, l.country, COUNT(f.fixture_id) as match_count
+                    FROM leagues l
+                    JOIN fixtures f ON l.league_id = f.league_id
+                    WHERE f.status = 'NS'
+                    AND f.kickoff_ts > {NOW_TS_SQL}
+                    AND l.league_id IN ({",".join(map(str, DEFAULT_ACTIVE_LEAGUES))})
+                    GROUP BY l.league_id
+                    ORDER BY match_count DESC
+                    LIMIT ?
+                """, (MAX_LEAGUES_PER_PAGE,)).fetchall()
+                fallback = bool(rows)
+        
+        leagues = [
+            (
+                league_id,
+                name[:20] + "..." if len(name) > 20 else name,  # Truncate long league names
+                get_country_flag(country),
+                country,
+                match_count
+            )
+            for league_id, name, country, match_count in rows
+        ]
+        
+        chunks = [leagues[i:i + MAX_LEAGUES_PER_PAGE] for i in range(0, len(leagues), MAX_LEAGUES_PER_PAGE)] or [[]]
+        return [
+            {
+                "leagues": chunk,
+                "total_leagues": len(leagues),
+                "total_pages": len(chunks) if leagues else 0,
+                "page": i,
+                "fallback": fallback
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+
+# Create global instances
+fixture_set_version = FixtureSetVersion()
+league_menu = LeagueMenuSnapshot()
+
+# Final (text, keyboard) of list screens, shared by every user.
+# Keyed by (screen, league_id, day_offset, page, fixture_set_version.value)
+render_cache = MemoryCache("render")
\ No newline at end of file
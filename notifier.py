@@ -0,0 +1,81 @@
+# notifier.py
+import asyncio
+import time
+from telegram.error import RetryAfter
+from config import (
+    NOTIFY_MAX_CONCURRENCY, NOTIFY_GLOBAL_PER_SECOND,
+    NOTIFY_CHAT_PER_SECOND, NOTIFY_CHAT_BURST, NOTIFY_MAX_RETRIES
+)
+
+class TokenBucket:
+    """Async token bucket: `rate` sends per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def idle(self):
+        """True when full again - safe to forget"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+class NotificationDispatcher:
+    """
+    Fans Telegram sends out concurrently while staying under the flood limits:
+    a global bucket, one bucket per chat, and a bounded number in flight.
+    RetryAfter is honoured and the send retried.
+    """
+
+    def __init__(self):
+        self._global = TokenBucket(NOTIFY_GLOBAL_PER_SECOND, NOTIFY_GLOBAL_PER_SECOND)
+        self._chats = {}
+        self._in_flight = asyncio.Semaphore(NOTIFY_MAX_CONCURRENCY)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 1000:
+                self._chats = {c: b for c, b in self._chats.items() if not b.idle()}
+            bucket = self._chats[chat_id] = TokenBucket(NOTIFY_CHAT_PER_SECOND, NOTIFY_CHAT_BURST)
+        return bucket
+
+    async def send(self, chat_id, make_request):
+        """Await make_request() (a zero-arg coroutine factory) within the limits"""
+        for attempt in range(NOTIFY_MAX_RETRIES + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self._global.acquire()
+            async with self._in_flight:
+                try:
+                    return await make_request()
+                except RetryAfter as e:
+                    if attempt == NOTIFY_MAX_RETRIES:
+                        raise
+                    retry_after = e.retry_after
+            print(f"[Notifier] Flood limit hit for {chat_id}, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+    async def fan_out(self, jobs):
+        """Run [(chat_id, make_request)]; results in order, exceptions returned not raised"""
+        return await asyncio.gather(
+            *(self.send(chat_id, make_request) for chat_id, make_request in jobs),
+            return_exceptions=True
+        )
+
+# Create global instance
+notifier = NotificationDispatcher()
\ No newline at end of file
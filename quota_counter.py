@@ -0,0 +1,225 @@
+# quota_counter.py
+import atexit
+import threading
+from datetime import datetime, timezone
+from db import get_connection
+from config import QUOTA_CHECKPOINT_EVERY
+
+# Daily quota headers API-Football sends with every response
+LIMIT_HEADER = "x-ratelimit-requests-limit"
+REMAINING_HEADER = "x-ratelimit-requests-remaining"
+
+def quota_day():
+    """The provider's quota day - it resets at 00:00 UTC"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+class QuotaCounter:
+    """
+    Today's API call count, kept in memory. Claims are a lock and an
+    increment; api_daily_usage / api_priority_usage are only written at
+    checkpoints (every QUOTA_CHECKPOINT_EVERY claims, the scheduler's
+    interval job and at exit) and read back by recover() on restart.
+    The provider's quota headers correct the total when it drifts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Orders checkpoint writes so an older snapshot never lands last
+        self._checkpoint_lock = threading.Lock()
+        self._day = quota_day()
+        self._total = 0
+        self._used = {}
+        self._unsaved = 0
+        self._in_flight = 0
+        self._provider_limit = None
+        self._provider_remaining = None
+
+    def create_tables(self):
+        """Checkpoint tables (called from db.init_db)"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Daily usage tracking
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS api_daily_usage (
+                    date TEXT PRIMARY KEY,
+                    request_count INTEGER DEFAULT 0
+                )
+            ''')
+
+            # Same count split by priority
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS api_priority_usage (
+                    date TEXT,
+                    priority TEXT,
+                    request_count INTEGER DEFAULT 0,
+                    PRIMARY KEY (date, priority)
+                )
+            ''')
+
+    def recover(self):
+        """
+        Load today's last checkpoint - calls since then come back via the
+        provider headers. The saved total is trusted over the per-priority
+        rows, since it may hold a provider correction.
+        """
+        day = quota_day()
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT request_count FROM api_daily_usage WHERE date = ?", (day,)
+            ).fetchone()
+            used = dict(conn.execute(
+                "SELECT priority, request_count FROM api_priority_usage WHERE date = ?", (day,)
+            ).fetchall())
+
+        with self._lock:
+            self._day = day
+            self._total = row[0] if row else sum(used.values())
+            self._used = fit_used(used, self._total)
+            self._unsaved = 0
+        print(f"[Quota] Recovered {self._total} calls for {day}")
+
+    # ====== COUNTING ======
+    def _roll(self):
+        """Start a new day if the date changed; returns the old day's unsaved state or None"""
+        day = quota_day()
+        if day == self._day:
+            return None
+
+        stale = (self._day, self._total, dict(self._used)) if self._unsaved else None
+        self._day = day
+        self._total = 0
+        self._used = {}
+        self._unsaved = 0
+        self._provider_limit = None
+        self._provider_remaining = None
+        return stale
+
+    def claim(self, priority, decide):
+        """
+        Count one call for priority unless decide(total, {priority: used})
+        returns a reason. Returns None when granted, else that reason.
+        decide runs under the counter lock, so check-and-count is atomic.
+        """
+        with self._lock:
+            stale = self._roll()
+            reason = decide(self._total, dict(self._used))
+            if reason is None:
+                self._total += 1
+                self._used[priority] = self._used.get(priority, 0) + 1
+                self._unsaved += 1
+            due = self._unsaved >= QUOTA_CHECKPOINT_EVERY
+
+        if stale:
+            self._write(*stale)
+        if due:
+            self.checkpoint()
+        return reason
+
+    # ====== PROVIDER RECONCILIATION ======
+    def request_started(self):
+        """An HTTP call (including a retry) is about to reach the provider"""
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self, headers=None):
+        """
+        Reconcile with the provider's remaining-requests header. More used
+        than we counted (retries, other processes, calls lost in a crash)
+        is taken at once; fewer only while nothing else is in flight,
+        since their headers may predate our other outstanding calls.
+        """
+        limit, remaining = _parse_quota_headers(headers)
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if remaining is None:
+                return
+            stale = self._roll()
+
+            provider_used = max(0, limit - remaining)
+            self._provider_limit = limit
+            self._provider_remaining = remaining
+            if provider_used > self._total or (provider_used < self._total and self._in_flight == 0):
+                print(f"[Quota] Provider reports {provider_used} calls used, we counted {self._total} - adjusting")
+                self._total = provider_used
+                self._used = fit_used(self._used, provider_used)
+                self._unsaved += 1
+
+        if stale:
+            self._write(*stale)
+
+    # ====== CHECKPOINTS ======
+    def checkpoint(self):
+        """Write the in-memory count to SQLite if it changed (scheduler job / exit)"""
+        with self._checkpoint_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return False
+                day, total, used = self._day, self._total, dict(self._used)
+                unsaved = self._unsaved
+                self._unsaved = 0
+
+            if self._write(day, total, used):
+                return True
+
+            with self._lock:
+                # Try again next time, unless the day has rolled on
+                if self._day == day:
+                    self._unsaved += unsaved
+            return False
+
+    def _write(self, day, total, used):
+        try:
+            with get_connection() as conn:
+                conn.execute('''
+                    INSERT INTO api_daily_usage (date, request_count) VALUES (?, ?)
+                    ON CONFLICT(date) DO UPDATE SET request_count = excluded.request_count
+                ''', (day, total))
+                conn.executemany('''
+                    INSERT INTO api_priority_usage (date, priority, request_count) VALUES (?, ?, ?)
+                    ON CONFLICT(date, priority) DO UPDATE SET request_count = excluded.request_count
+                ''', [(day, priority, count) for priority, count in used.items()])
+            return True
+        except Exception as e:
+            print(f"[Quota] Error writing checkpoint: {e}")
+            return False
+
+    def snapshot(self):
+        """Today's counts as (total, {priority: used}, provider_limit, provider_remaining)"""
+        with self._lock:
+            stale = self._roll()
+            result = (self._total, dict(self._used), self._provider_limit, self._provider_remaining)
+        if stale:
+            self._write(*stale)
+        return result
+
+def fit_used(used, total):
+    """
+    {priority: used} scaled down in proportion so it sums to at most total
+    (largest remainders get the rounding), else unchanged.
+    """
+    counted = sum(used.values())
+    if counted <= total:
+        return dict(used)
+
+    shares = {priority: count * total / counted for priority, count in used.items()}
+    fitted = {priority: int(share) for priority, share in shares.items()}
+    by_remainder = sorted(shares, key=lambda p: shares[p] - fitted[p], reverse=True)
+    for priority in by_remainder[:total - sum(fitted.values())]:
+        fitted[priority] += 1
+    return fitted
+
+def _parse_quota_headers(headers):
+    """(limit, remaining) from a response's headers, or (None, None)"""
+    if not headers:
+        return None, None
+    try:
+        return int(headers[LIMIT_HEADER]), int(headers[REMAINING_HEADER])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+# Create global instance
+quota_counter = QuotaCounter()
+
+# Keep calls counted since the last checkpoint on a clean shutdown
+atexit.register(quota_counter.checkpoint)
\ No newline at end of file
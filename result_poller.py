@@ -0,0 +1,124 @@
+# result_poller.py
+import threading
+import time
+from api import fetch_fixture_results, MAX_IDS_PER_REQUEST
+from db import get_connection
+from results_db import is_settled
+from config import (
+    RESULT_FIRST_CHECK_MINUTES, RESULT_RETRY_MINUTES,
+    RESULT_MAX_BACKOFF_MINUTES, RESULT_BATCH_WINDOW_MINUTES
+)
+
+# Still being played - worth a quick re-check
+IN_PLAY_STATUSES = {"1H", "HT", "2H", "ET", "BT", "P", "SUSP", "INT", "LIVE"}
+
+def first_check_ts(kickoff_ts, now):
+    """When a result first becomes plausible: kickoff + RESULT_FIRST_CHECK_MINUTES"""
+    if not kickoff_ts:
+        return now
+    return kickoff_ts + RESULT_FIRST_CHECK_MINUTES * 60
+
+def next_check_ts(now, status, attempts):
+    """
+    Back off after a check that found no final score. In play (or no
+    answer): RESULT_RETRY_MINUTES, doubling per attempt up to the cap.
+    Not started yet (NS, TBD) or postponed (PST): straight to the cap.
+    Final and void statuses never get here - they leave the schedule.
+    """
+    if status is None or status in IN_PLAY_STATUSES:
+        wait = min(RESULT_RETRY_MINUTES * 2 ** (attempts - 1), RESULT_MAX_BACKOFF_MINUTES)
+    else:
+        wait = RESULT_MAX_BACKOFF_MINUTES
+    return now + wait * 60
+
+def due_batch(schedule, now):
+    """
+    Fixtures to check now, given {fixture_id: [due_ts, attempts]}.
+    Checks due within RESULT_BATCH_WINDOW_MINUTES ride along while they
+    fit in the requests already needed (MAX_IDS_PER_REQUEST ids each).
+    """
+    due = sorted((due_ts, fixture_id) for fixture_id, (due_ts, _) in schedule.items()
+                 if due_ts <= now + RESULT_BATCH_WINDOW_MINUTES * 60)
+    overdue = sum(1 for due_ts, _ in due if due_ts <= now)
+    if not overdue:
+        return []
+
+    requests = -(-overdue // MAX_IDS_PER_REQUEST)
+    return [fixture_id for _, fixture_id in due[:requests * MAX_IDS_PER_REQUEST]]
+
+class ResultPoller:
+    """
+    Fetches results for fixtures in pending bets when one is plausible,
+    instead of sweeping every pending fixture on a fixed interval.
+    Each fixture gets its own next-check time (see first_check_ts /
+    next_check_ts); a final or void result settles bets via results_db's
+    listener and drops the fixture from the schedule.
+    """
+
+    def __init__(self):
+        # {fixture_id: [due_ts, attempts]}
+        self._schedule = {}
+        self._lock = threading.Lock()
+
+    def _pending(self):
+        """{fixture_id: kickoff_ts} for ungraded legs of pending bets"""
+        with get_connection() as conn:
+            return dict(conn.execute("""
+                SELECT DISTINCT s.fixture_id, f.kickoff_ts
+                FROM bets b
+                JOIN bet_selections s ON s.bet_id = b.bet_id
+                LEFT JOIN fixtures f ON f.fixture_id = s.fixture_id
+                WHERE b.status = 'PENDING' AND s.outcome IS NULL
+            """).fetchall())
+
+    def poll(self, now=None):
+        """Scheduler job: check the fixtures that are due; returns how many were checked"""
+        if now is None:
+            now = time.time()
+        pending = self._pending()
+
+        with self._lock:
+            for fixture_id in list(self._schedule):
+                if fixture_id not in pending:
+                    del self._schedule[fixture_id]
+            for fixture_id, kickoff_ts in pending.items():
+                if fixture_id not in self._schedule:
+                    self._schedule[fixture_id] = [first_check_ts(kickoff_ts, now), 0]
+            batch = due_batch(self._schedule, now)
+
+        if not batch:
+            return 0
+
+        results = fetch_fixture_results(batch)
+
+        finished = 0
+        with self._lock:
+            for fixture_id in batch:
+                entry = self._schedule.get(fixture_id)
+                if entry is None:
+                    continue
+                result = results.get(fixture_id)
+                status = result.get("status") if result else None
+                if result and is_settled(status, result.get("match_date")):
+                    # Settled (or voided) by results_db's final-result listener
+                    del self._schedule[fixture_id]
+                    finished += 1
+                else:
+                    entry[1] += 1
+                    entry[0] = next_check_ts(now, status, entry[1])
+            waiting = len(self._schedule)
+
+        print(f"[ResultPoller] Checked {len(batch)} fixtures, {finished} final ({waiting} scheduled)")
+        return len(batch)
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "scheduled": len(self._schedule),
+                "due": sum(1 for due_ts, _ in self._schedule.values() if due_ts <= now),
+                "next_due": min((due_ts for due_ts, _ in self._schedule.values()), default=None)
+            }
+
+# Create global instance
+result_poller = ResultPoller()
\ No newline at end of file
@@ -1,66 +1,101 @@
 # results_db.py - COMPLETE FIXED VERSION
-import sqlite3
-from datetime import datetime, timedelta
-import json
+from datetime import datetime, timedelta, timezone
+from db import get_connection
+from config import RESULT_POSTPONED_VOID_DAYS
+
+# The match is over and its score stands (bets grade on the regular-time score)
+FINAL_STATUSES = ("FT", "AET", "PEN")
+# Cancelled, abandoned, awarded, walkover - legs on these are void
+VOID_STATUSES = ("CANC", "ABD", "AWD", "WO")
+# Nothing more will happen to bets on these fixtures
+SETTLED_STATUSES = FINAL_STATUSES + VOID_STATUSES
+# Postponed fixtures are usually rescheduled within days - void only once
+# they are still unplayed RESULT_POSTPONED_VOID_DAYS after their date
+POSTPONED_STATUS = "PST"
+
+def postponed_void_cutoff():
+    """Postponed fixtures dated on or before this day (YYYY-MM-DD) are void"""
+    return (datetime.now(timezone.utc).date() - timedelta(days=RESULT_POSTPONED_VOID_DAYS)).isoformat()
+
+def is_void(status, match_date):
+    return status in VOID_STATUSES or (
+        status == POSTPONED_STATUS and bool(match_date) and match_date <= postponed_void_cutoff()
+    )
+
+def is_settled(status, match_date):
+    """True when bets on the fixture can be graded (final) or voided"""
+    return status in FINAL_STATUSES or is_void(status, match_date)
 
 class ResultsDatabase:
-    def __init__(self, db_path='bot.db'):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.create_table()
+    def __init__(self):
+        # Called with fixture_id whenever a final or void result is saved
+        self._final_result_listeners = []
+    
+    def on_final_result(self, callback):
+        """Register callback(fixture_id) to run when a fixture's final or void result is saved"""
+        self._final_result_listeners.append(callback)
     
     def create_table(self):
-        """Create match results table if it doesn't exist"""
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS match_results (
-                result_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fixture_id INTEGER UNIQUE,
-                home_team TEXT,
-                away_team TEXT,
-                home_goals INTEGER,
-                away_goals INTEGER,
-                status TEXT,
-                match_date TEXT,
-                league_name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create indexes for fast queries
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixture_id ON match_results(fixture_id)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_match_date ON match_results(match_date)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON match_results(status)')
+        """Create match results table if it doesn't exist (called from db.init_db)"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS match_results (
+                    result_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fixture_id INTEGER UNIQUE,
+                    home_team TEXT,
+                    away_team TEXT,
+                    home_goals INTEGER,
+                    away_goals INTEGER,
+                    status TEXT,
+                    match_date TEXT,
+                    league_name TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create indexes for fast queries
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixture_id ON match_results(fixture_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_match_date ON match_results(match_date)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_status ON match_results(status)')
         
-        self.conn.commit()
         print("[ResultsDB] Database table created/verified")
     
     def save_result(self, fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name=None):
         """Save or update match result in database"""
         try:
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO match_results 
-                (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name))
+            with get_connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO match_results
+                    (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name))
             
-            self.conn.commit()
             print(f"[ResultsDB] Saved result: {home_team} {home_goals}-{away_goals} {away_team}")
-            return True
-            
+        
         except Exception as e:
             print(f"[ResultsDB] Error saving result: {e}")
             return False
+        
+        if is_settled(status, match_date):
+            for callback in self._final_result_listeners:
+                try:
+                    callback(fixture_id)
+                except Exception as e:
+                    print(f"[ResultsDB] Error in final result listener: {e}")
+        
+        return True
     
     def get_result(self, fixture_id):
         """Get match result by fixture_id"""
-        self.cursor.execute('''
-            SELECT fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name
-            FROM match_results 
-            WHERE fixture_id = ?
-        ''', (fixture_id,))
+        with get_connection() as conn:
+            row = conn.execute('''
+                SELECT fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name
+                FROM match_results
+                WHERE fixture_id = ?
+            ''', (fixture_id,)).fetchone()
         
-        row = self.cursor.fetchone()
         if row:
             # SAFE: Convert None goals to 0
             home_goals = row[3] if row[3] is not None else 0
@@ -81,15 +116,16 @@ class ResultsDatabase:
     
     def get_all_results(self, limit=50):
         """Get all recent results"""
-        self.cursor.execute('''
-            SELECT fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name
-            FROM match_results 
-            ORDER BY match_date DESC, fixture_id DESC
-            LIMIT ?
-        ''', (limit,))
+        with get_connection() as conn:
+            rows = conn.execute('''
+                SELECT fixture_id, home_team, away_team, home_goals, away_goals, status, match_date, league_name
+                FROM match_results
+                ORDER BY match_date DESC, fixture_id DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
         
         results = []
-        for row in self.cursor.fetchall():
+        for row in rows:
             # SAFE: Convert None goals to 0
             home_goals = row[3] if row[3] is not None else 0
             away_goals = row[4] if row[4] is not None else 0
@@ -109,83 +145,59 @@ class ResultsDatabase:
     def get_pending_bets_fixtures(self):
         """Get all fixture IDs from pending bets (for efficient API usage)"""
         try:
-            # Get all fixture IDs from pending bets
-            # First, check if the bets table exists
-            self.cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name='bets'
-            """)
-            if not self.cursor.fetchone():
-                print("[ResultsDB] Bets table doesn't exist yet")
-                return []
-            
-            # Try to extract fixture IDs from JSON in selections column
-            self.cursor.execute("""
-                SELECT DISTINCT json_extract(value, '$.fixture_id')
-                FROM bets, json_each(bets.selections)
-                WHERE bets.status = 'PENDING'
-            """)
-            
-            fixture_ids = []
-            for row in self.cursor.fetchall():
-                if row[0]:
-                    fixture_ids.append(row[0])
+            with get_connection() as conn:
+                rows = conn.execute("""
+                    SELECT DISTINCT s.fixture_id
+                    FROM bets b
+                    JOIN bet_selections s ON s.bet_id = b.bet_id
+                    WHERE b.status = 'PENDING'
+                """).fetchall()
             
+            fixture_ids = [row[0] for row in rows]
             print(f"[ResultsDB] Found {len(fixture_ids)} fixtures in pending bets")
-            return list(set(fixture_ids))
-            
+            return fixture_ids
+        
         except Exception as e:
             print(f"[ResultsDB] Error getting pending fixtures: {e}")
-            # Fallback method
-            try:
-                self.cursor.execute("""
-                    SELECT selections FROM bets WHERE status = 'PENDING'
-                """)
-                pending_bets = self.cursor.fetchall()
-                
-                fixture_ids = []
-                for (selections_json,) in pending_bets:
-                    try:
-                        selections = json.loads(selections_json)
-                        for selection in selections:
-                            if 'fixture_id' in selection:
-                                fixture_ids.append(selection['fixture_id'])
-                    except:
-                        pass
-                
-                print(f"[ResultsDB] Found {len(set(fixture_ids))} fixtures using fallback method")
-                return list(set(fixture_ids))
-            except:
-                return []
+            return []
     
     def cleanup_old_results(self, days=2):
         """Delete results older than specified days - SIMPLIFIED VERSION"""
         # Calculate cutoff date
         cutoff_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
         
-        # Simple delete query - only use match_date
-        self.cursor.execute('''
-            DELETE FROM match_results 
-            WHERE match_date < ?
-        ''', (cutoff_date,))
-        
-        deleted = self.cursor.rowcount
-        self.conn.commit()
+        # Keep results that pending accumulators still need for settlement
+        with get_connection() as conn:
+            deleted = conn.execute('''
+                DELETE FROM match_results
+                WHERE match_date < ?
+                AND fixture_id NOT IN (
+                    SELECT s.fixture_id
+                    FROM bet_selections s
+                    JOIN bets b ON b.bet_id = s.bet_id
+                    WHERE b.status = 'PENDING'
+                )
+            ''', (cutoff_date,)).rowcount
         
         print(f"[ResultsDB] Cleaned up {deleted} results older than {days} days (cutoff: {cutoff_date})")
         return deleted
     
     def get_stats(self):
         """Get database statistics"""
-        self.cursor.execute('SELECT COUNT(*) FROM match_results')
-        total = self.cursor.fetchone()[0]
-        
-        self.cursor.execute("SELECT COUNT(*) FROM match_results WHERE status = 'FT'")
-        finished = self.cursor.fetchone()[0]
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT COUNT(*) FROM match_results')
+            total = cursor.fetchone()[0]
+            
+            placeholders = ",".join("?" * len(FINAL_STATUSES))
+            cursor.execute(f"SELECT COUNT(*) FROM match_results WHERE status IN ({placeholders})", FINAL_STATUSES)
+            finished = cursor.fetchone()[0]
+            
+            # Get oldest and newest dates
+            cursor.execute('SELECT MIN(match_date), MAX(match_date) FROM match_results WHERE match_date IS NOT NULL')
+            result = cursor.fetchone()
         
-        # Get oldest and newest dates
-        self.cursor.execute('SELECT MIN(match_date), MAX(match_date) FROM match_results WHERE match_date IS NOT NULL')
-        result = self.cursor.fetchone()
         min_date = result[0] if result[0] else 'None'
         max_date = result[1] if result[1] else 'None'
         
@@ -195,10 +207,6 @@ class ResultsDatabase:
             'oldest_date': min_date,
             'newest_date': max_date
         }
-    
-    def close(self):
-        """Close database connection"""
-        self.conn.close()
 
 # Create global instance
 results_db = ResultsDatabase()
\ No newline at end of file
@@ -1,50 +1,64 @@
 # scheduler.py
 from apscheduler.schedulers.background import BackgroundScheduler
-from api import fetch_fixtures_for_days, fetch_leagues, fetch_league_fixtures, fetch_teams
+from api import fetch_fixtures_for_days, fetch_leagues, fetch_league_fixtures, fetch_teams, prefetch_league_odds
 from betting import settle_finished_matches
-from db import cursor, conn
+from db import get_connection, fixture_time_columns, NOW_TS_SQL
 from datetime import datetime, timezone, timedelta
 import time
 from results_db import results_db
+from menu_cache import fixture_set_version
+from betslip_store import betslip_store
+from image_archive import image_archive
+from quota_counter import quota_counter
+from result_poller import result_poller
 from config import MATCH_GRACE_PERIOD_MINUTES  # Add this import
+from config import (
+    ENABLE_PREDICTIVE_CACHING, POPULAR_LEAGUE_IDS, MAX_DAYS_TO_FETCH,
+    MAX_API_CALLS_PER_RUN, ODDS_PREFETCH_INTERVAL_HOURS, BETSLIP_FLUSH_SECONDS,
+    QUOTA_CHECKPOINT_SECONDS, RESULT_POLL_SECONDS
+)
+from api_limiter import ODDS_FRESH_HOURS
 
 def update_leagues():
     """Update leagues information"""
     print("[Scheduler] Updating leagues...")
     leagues = fetch_leagues()
     
-    if leagues:
-        for league in leagues:
-            cursor.execute("""
-                INSERT OR REPLACE INTO leagues (league_id, name, country, logo_url)
-                VALUES (?, ?, ?, ?)
-            """, (
-                league["league_id"],
-                league["name"],
-                league["country"],
-                league["logo"]
-            ))
-        conn.commit()
-        print(f"[Scheduler] Updated {len(leagues)} leagues")
-    else:
-        # Create default leagues if API fails
-        cursor.execute("SELECT COUNT(*) FROM leagues")
-        if cursor.fetchone()[0] == 0:
-            default_leagues = [
-                (1, 'Premier League', 'England', '', 1),
-                (2, 'La Liga', 'Spain', '', 1),
-                (3, 'Serie A', 'Italy', '', 1),
-                (4, 'Bundesliga', 'Germany', '', 1),
-                (5, 'Ligue 1', 'France', '', 1)
-            ]
-            cursor.executemany("""
-                INSERT OR IGNORE INTO leagues (league_id, name, country, logo_url, is_active)
-                VALUES (?, ?, ?, ?, ?)
-            """, default_leagues)
-            conn.commit()
-            print("[Scheduler] Created default leagues")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        if leagues:
+            for league in leagues:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO leagues (league_id, name, country, logo_url)
+                    VALUES (?, ?, ?, ?)
+                """, (
+                    league["league_id"],
+                    league["name"],
+                    league["country"],
+                    league["logo"]
+                ))
+            print(f"[Scheduler] Updated {len(leagues)} leagues")
+        else:
+            # Create default leagues if API fails
+            cursor.execute("SELECT COUNT(*) FROM leagues")
+            if cursor.fetchone()[0] == 0:
+                default_leagues = [
+                    (1, 'Premier League', 'England', '', 1),
+                    (2, 'La Liga', 'Spain', '', 1),
+                    (3, 'Serie A', 'Italy', '', 1),
+                    (4, 'Bundesliga', 'Germany', '', 1),
+                    (5, 'Ligue 1', 'France', '', 1)
+                ]
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO leagues (league_id, name, country, logo_url, is_active)
+                    VALUES (?, ?, ?, ?, ?)
+                """, default_leagues)
+                print("[Scheduler] Created default leagues")
+    
+    fixture_set_version.bump()
 
-def get_or_create_team(team_id, name, logo=""):
+def get_or_create_team(cursor, team_id, name, logo=""):
     """Helper to get or create team"""
     cursor.execute("SELECT team_id FROM teams WHERE team_id = ?", (team_id,))
     if cursor.fetchone():
@@ -64,13 +78,16 @@ def update_all_fixtures():
         print("[Scheduler] Starting comprehensive fixture update...")
         
         # Step 1: Update leagues if needed
-        cursor.execute("SELECT COUNT(*) FROM leagues")
-        if cursor.fetchone()[0] == 0:
+        with get_connection() as conn:
+            league_count = conn.execute("SELECT COUNT(*) FROM leagues").fetchone()[0]
+        if league_count == 0:
             update_leagues()
         
         # Step 2: For each active league, update fixtures
-        cursor.execute("SELECT league_id FROM leagues WHERE is_active = 1 LIMIT 3")
-        active_leagues = cursor.fetchall()
+        with get_connection() as conn:
+            active_leagues = conn.execute(
+                "SELECT league_id FROM leagues WHERE is_active = 1 LIMIT 3"
+            ).fetchall()
         
         total_fixtures = 0
         
@@ -79,43 +96,52 @@ def update_all_fixtures():
                 # Fetch upcoming fixtures for this league
                 fixtures = fetch_league_fixtures(league_id, days=2)
                 
-                for f in fixtures:
-                    # Get or create teams
-                    home_team = f["teams"]["home"]
-                    away_team = f["teams"]["away"]
-                    
-                    home_team_id = get_or_create_team(
-                        home_team["id"],
-                        home_team["name"],
-                        home_team.get("logo", "")
-                    )
-                    
-                    away_team_id = get_or_create_team(
-                        away_team["id"],
-                        away_team["name"],
-                        away_team.get("logo", "")
-                    )
+                # Write this league's fixtures in one transaction
+                with get_connection() as conn:
+                    cursor = conn.cursor()
                     
-                    # Insert/update fixture
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO fixtures 
-                        (fixture_id, league_id, home_team_id, away_team_id, 
-                         start_time, status, home_goals, away_goals)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        f["fixture"]["id"],
-                        league_id,
-                        home_team_id,
-                        away_team_id,
-                        f["fixture"]["date"],
-                        f["fixture"]["status"]["short"],
-                        f["goals"]["home"] or 0,
-                        f["goals"]["away"] or 0
-                    ))
-                    total_fixtures += 1
+                    for f in fixtures:
+                        # Get or create teams
+                        home_team = f["teams"]["home"]
+                        away_team = f["teams"]["away"]
+                        
+                        home_team_id = get_or_create_team(
+                            cursor,
+                            home_team["id"],
+                            home_team["name"],
+                            home_team.get("logo", "")
+                        )
+                        
+                        away_team_id = get_or_create_team(
+                            cursor,
+                            away_team["id"],
+                            away_team["name"],
+                            away_team.get("logo", "")
+                        )
+                        
+                        # Insert/update fixture
+                        kickoff_ts, match_day = fixture_time_columns(f["fixture"]["date"])
+                        cursor.execute("""
+                            INSERT OR REPLACE INTO fixtures 
+                            (fixture_id, league_id, home_team_id, away_team_id, 
+                             start_time, kickoff_ts, match_day, status, home_goals, away_goals)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, (
+                            f["fixture"]["id"],
+                            league_id,
+                            home_team_id,
+                            away_team_id,
+                            f["fixture"]["date"],
+                            kickoff_ts,
+                            match_day,
+                            f["fixture"]["status"]["short"],
+                            f["goals"]["home"] or 0,
+                            f["goals"]["away"] or 0
+                        ))
+                        total_fixtures += 1
                 
                 print(f"[Scheduler] Updated {len(fixtures)} fixtures for league {league_id}")
-                
+            
             except Exception as e:
                 print(f"[Scheduler] Error updating league {league_id}: {e}")
                 time.sleep(1)  # Rate limiting
@@ -124,19 +150,18 @@ def update_all_fixtures():
         if total_fixtures == 0:
             print("[Scheduler] Using fallback fixture update method...")
             update_fixtures_fallback()
-        else:
-            conn.commit()
         
         # Step 3: Clean up old fixtures (more than 3 days old or finished)
-        cursor.execute("""
-            DELETE FROM fixtures 
-            WHERE status IN ('FT', 'CANCELED', 'POSTPONED', 'TIME_EXPIRED')
-            OR datetime(start_time) < datetime('now', '-3 days')
-        """)
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute(f"""
+                DELETE FROM fixtures 
+                WHERE status IN ('FT', 'CANCELED', 'POSTPONED', 'TIME_EXPIRED')
+                OR kickoff_ts < {NOW_TS_SQL} - 3 * 86400
+            """)
         
         print(f"[Scheduler] Fixture update completed: {total_fixtures} fixtures")
-        
+        fixture_set_version.bump()
+    
     except Exception as e:
         print(f"[Scheduler] Critical error: {e}")
         # Try fallback method
@@ -153,55 +178,62 @@ def update_fixtures_fallback():
     fixtures = fetch_fixtures_for_days(days=2)
     print(f"[Scheduler] Fixtures fetched for 2 days: {len(fixtures)}")
 
-    for f in fixtures:
-        # Get or create league
-        league_id = f["league"]["id"]
-        cursor.execute("""
-            INSERT OR REPLACE INTO leagues (league_id, name, country)
-            VALUES (?, ?, ?)
-        """, (
-            league_id,
-            f["league"]["name"],
-            f["league"]["country"]
-        ))
-        
-        # Get or create teams
-        home_team_id = get_or_create_team(
-            hash(f["teams"]["home"]["name"]) % 1000000,
-            f["teams"]["home"]["name"],
-            f["teams"]["home"].get("logo", "")
-        )
+    with get_connection() as conn:
+        cursor = conn.cursor()
         
-        away_team_id = get_or_create_team(
-            hash(f["teams"]["away"]["name"]) % 1000000,
-            f["teams"]["away"]["name"],
-            f["teams"]["away"].get("logo", "")
-        )
+        for f in fixtures:
+            # Get or create league
+            league_id = f["league"]["id"]
+            cursor.execute("""
+                INSERT OR REPLACE INTO leagues (league_id, name, country)
+                VALUES (?, ?, ?)
+            """, (
+                league_id,
+                f["league"]["name"],
+                f["league"]["country"]
+            ))
+            
+            # Get or create teams
+            home_team_id = get_or_create_team(
+                cursor,
+                hash(f["teams"]["home"]["name"]) % 1000000,
+                f["teams"]["home"]["name"],
+                f["teams"]["home"].get("logo", "")
+            )
+            
+            away_team_id = get_or_create_team(
+                cursor,
+                hash(f["teams"]["away"]["name"]) % 1000000,
+                f["teams"]["away"]["name"],
+                f["teams"]["away"].get("logo", "")
+            )
+            
+            kickoff_ts, match_day = fixture_time_columns(f["fixture"]["date"])
+            cursor.execute("""
+            INSERT OR REPLACE INTO fixtures
+            (fixture_id, league_id, home_team_id, away_team_id, start_time, kickoff_ts, match_day, status, home_goals, away_goals)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                f["fixture"]["id"],
+                league_id,
+                home_team_id,
+                away_team_id,
+                f["fixture"]["date"],
+                kickoff_ts,
+                match_day,
+                f["fixture"]["status"]["short"],
+                f["goals"]["home"] or 0,
+                f["goals"]["away"] or 0
+            ))
         
-        cursor.execute("""
-        INSERT OR REPLACE INTO fixtures
-        (fixture_id, league_id, home_team_id, away_team_id, start_time, status, home_goals, away_goals)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            f["fixture"]["id"],
-            league_id,
-            home_team_id,
-            away_team_id,
-            f["fixture"]["date"],
-            f["fixture"]["status"]["short"],
-            f["goals"]["home"] or 0,
-            f["goals"]["away"] or 0
-        ))
-
-    conn.commit()
+        # Clean up old fixtures (more than 2 days old)
+        cursor.execute(f"""
+            DELETE FROM fixtures 
+            WHERE status IN ('FT', 'CANCELED', 'POSTPONED', 'TIME_EXPIRED')
+            OR kickoff_ts < {NOW_TS_SQL} - 2 * 86400
+        """)
     
-    # Clean up old fixtures (more than 2 days old)
-    cursor.execute("""
-        DELETE FROM fixtures 
-        WHERE status IN ('FT', 'CANCELED', 'POSTPONED', 'TIME_EXPIRED')
-        OR datetime(start_time) < datetime('now', '-2 days')
-    """)
-    conn.commit()
+    fixture_set_version.bump()
 
 def check_results():
     print("[Scheduler] Checking finished matches...")
@@ -209,85 +241,60 @@ def check_results():
 
 def update_pending_results():
     """
-    Smart function to update results only for pending bets
-    This saves API calls by only fetching results we need
+    Check results for pending bets whose matches could plausibly be over.
+    Each fixture is first checked at kickoff + RESULT_FIRST_CHECK_MINUTES,
+    then backed off while it is still being played (see result_poller).
     """
-    print("[Scheduler] Checking results for pending bets...")
-    
-    # Get all fixture IDs from pending bets
-    pending_fixtures = results_db.get_pending_bets_fixtures()
-    
-    if not pending_fixtures:
-        print("[Scheduler] No pending bets found")
-        return
-    
-    print(f"[Scheduler] Found {len(pending_fixtures)} fixtures in pending bets")
-    
-    # We'll process them, but limit to avoid too many API calls
-    max_to_process = min(10, len(pending_fixtures))  # Process max 10 per run
-    
-    processed = 0
-    for fixture_id in pending_fixtures[:max_to_process]:
-        try:
-            # First check if we already have result in database
-            existing = results_db.get_result(fixture_id)
-            
-            # Only fetch from API if we don't have a finished result
-            if not existing or existing.get('status') != 'FT':
-                print(f"[Scheduler] Fetching result for fixture {fixture_id}")
-                from api import fetch_fixture_result
-                fetch_fixture_result(fixture_id)
-                processed += 1
-                
-                # Small delay to be nice to API
-                time.sleep(0.5)
-            else:
-                print(f"[Scheduler] Already have result for fixture {fixture_id}")
-                
-        except Exception as e:
-            print(f"[Scheduler] Error processing fixture {fixture_id}: {e}")
-    
-    print(f"[Scheduler] Processed {processed} fixtures")
+    try:
+        result_poller.poll()
+    except Exception as e:
+        print(f"[Scheduler] Error fetching pending results: {e}")
     
-    # Now run bet settlement with updated results
-    from betting import settle_finished_matches
-    settle_finished_matches()
+    # Bets are settled as each FT result is saved (betting.settle_fixture)
 
 def update_fixtures_based_on_time():
     """Automatically update match statuses based on start time (NO API needed)"""
     print("[Scheduler] Running time-based status updates...")
     
     try:
-        # Find matches that should have started but status is still 'NS'
-        cursor.execute(f"""
-            SELECT fixture_id 
-            FROM fixtures 
-            WHERE status = 'NS'
-            AND datetime(start_time) < datetime('now', '-{MATCH_GRACE_PERIOD_MINUTES + 5} minutes')
-        """)
-        
-        overdue_matches = cursor.fetchall()
-        
-        updated_count = 0
-        for (fixture_id,) in overdue_matches:
-            # Mark as "probably started" to hide from users
-            cursor.execute("""
-                UPDATE fixtures 
-                SET status = 'TIME_EXPIRED' 
-                WHERE fixture_id = ?
-            """, (fixture_id,))
+        with get_connection() as conn:
+            cursor = conn.cursor()
             
-            updated_count += 1
-        
-        conn.commit()
+            # Find matches that should have started but status is still 'NS'
+            cursor.execute(f"""
+                SELECT fixture_id 
+                FROM fixtures 
+                WHERE status = 'NS'
+                AND kickoff_ts < {NOW_TS_SQL} - {(MATCH_GRACE_PERIOD_MINUTES + 5) * 60}
+            """)
+            
+            overdue_matches = cursor.fetchall()
+            
+            updated_count = 0
+            for (fixture_id,) in overdue_matches:
+                # Mark as "probably started" to hide from users
+                cursor.execute("""
+                    UPDATE fixtures 
+                    SET status = 'TIME_EXPIRED' 
+                    WHERE fixture_id = ?
+                """, (fixture_id,))
+                
+                updated_count += 1
         
         if updated_count > 0:
             print(f"[Scheduler] Updated {updated_count} matches based on start time")
+            fixture_set_version.bump()
         else:
             print("[Scheduler] No overdue matches found")
-        
+    
     except Exception as e:
         print(f"[Scheduler] Error in time-based updates: {e}")
+    
+    # Drop bet slip legs for matches that have kicked off (owners notified in one batch)
+    try:
+        betslip_store.prune_started()
+    except Exception as e:
+        print(f"[Scheduler] Error pruning bet slips: {e}")
 
 def cleanup_old_results():
     """Clean up results older than 2 days"""
@@ -309,11 +316,57 @@ def cleanup_old_results():
     except Exception as e:
         print(f"[Scheduler] ERROR during cleanup: {e}")
 
+def prefetch_popular_odds():
+    """Bulk-load odds for popular leagues so match clicks are served from cache"""
+    if not ENABLE_PREDICTIVE_CACHING:
+        return
+    
+    print("[Scheduler] Prefetching odds for popular leagues...")
+    
+    # League/date pairs with upcoming fixtures that have no fresh cached odds
+    fresh_after = (datetime.now() - timedelta(hours=ODDS_FRESH_HOURS)).isoformat()
+    placeholders = ",".join("?" * len(POPULAR_LEAGUE_IDS))
+    
+    with get_connection() as conn:
+        targets = conn.execute(f"""
+            SELECT DISTINCT f.league_id, f.match_day
+            FROM fixtures f
+            LEFT JOIN cached_odds o
+                ON o.fixture_id = f.fixture_id AND o.last_updated > ?
+            WHERE f.status = 'NS'
+            AND f.league_id IN ({placeholders})
+            AND f.kickoff_ts > {NOW_TS_SQL}
+            AND f.match_day < date('now', '+{MAX_DAYS_TO_FETCH} days')
+            AND o.fixture_id IS NULL
+            ORDER BY f.match_day
+        """, (fresh_after, *POPULAR_LEAGUE_IDS)).fetchall()
+    
+    if not targets:
+        print("[Scheduler] Popular league odds are already cached")
+        return
+    
+    budget = MAX_API_CALLS_PER_RUN
+    total_cached = 0
+    
+    for league_id, date in targets:
+        if budget <= 0:
+            break
+        
+        try:
+            cached, calls = prefetch_league_odds(league_id, date, budget)
+            budget -= calls
+            total_cached += cached
+        except Exception as e:
+            print(f"[Scheduler] Error prefetching odds for league {league_id}: {e}")
+    
+    print(f"[Scheduler] Prefetched odds for {total_cached} fixtures using {MAX_API_CALLS_PER_RUN - budget} API calls")
+
 def start_scheduler():
     """Start all scheduled jobs"""
     # Initial updates
     update_leagues()
     update_all_fixtures()
+    prefetch_popular_odds()
     
     # Check and update results for pending bets
     update_pending_results()
@@ -331,20 +384,35 @@ def start_scheduler():
     # Update fixtures every 6 hours (to save API calls)
     scheduler.add_job(update_all_fixtures, "interval", hours=6)
     
+    # Refresh popular league odds in bulk before users ask for them
+    scheduler.add_job(prefetch_popular_odds, "interval", hours=ODDS_PREFETCH_INTERVAL_HOURS)
+    
     # Update leagues once a day
     scheduler.add_job(update_leagues, "cron", hour=3)
     
-    # Check pending results every 2 hours
-    scheduler.add_job(update_pending_results, "interval", hours=2)
+    # Check pending results as each one falls due
+    scheduler.add_job(update_pending_results, "interval", seconds=RESULT_POLL_SECONDS)
     
     # Clean up old results daily at 4 AM
     scheduler.add_job(cleanup_old_results, "cron", hour=4)
     
-    # Settle bets every hour
+    # Backstop for missed settlement events, every hour
     scheduler.add_job(settle_finished_matches, "interval", hours=1)
     
     # NEW: Time-based fixture updates every 5 minutes
     scheduler.add_job(update_fixtures_based_on_time, "interval", minutes=5)
     
+    # "Today" and "Tomorrow" change at midnight - drop cached menus
+    scheduler.add_job(fixture_set_version.bump, "cron", hour=0, minute=0)
+    
+    # Write bet slip changes back and drop idle slips from RAM
+    scheduler.add_job(betslip_store.sweep, "interval", seconds=BETSLIP_FLUSH_SECONDS)
+    
+    # Persist the in-memory API call count
+    scheduler.add_job(quota_counter.checkpoint, "interval", seconds=QUOTA_CHECKPOINT_SECONDS)
+    
+    # Delete archived screenshots past their retention daily at 4:30 AM
+    scheduler.add_job(image_archive.purge, "cron", hour=4, minute=30)
+    
     scheduler.start()
     print("[Scheduler] Started with efficient results database system")
\ No newline at end of file
@@ -0,0 +1,68 @@
+# single_flight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+
+def flight_key(endpoint, params):
+    """Key for one upstream request: (endpoint, sorted params)"""
+    return (endpoint, tuple(sorted(params.items())))
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical lookups into one upstream call.
+    The first caller for a key runs it; everyone else waits for its result.
+    Works across bot handlers (async) and scheduler threads (sync).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _join(self, key):
+        """Return (future, is_leader) for this key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func, *args):
+        """Run func(*args) once per key among concurrent callers (blocking)"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key, func, *args):
+        """Await func(*args) once per key among concurrent callers"""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await func(*args)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+# Create global instance
+single_flight = SingleFlight()
\ No newline at end of file
@@ -0,0 +1,125 @@
+# conftest.py
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# The bot's modules live flat in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from api_client import api_client
+from api_limiter import api_limiter
+from betslip_store import betslip_store, Selection
+from cache_manager import cache
+from menu_cache import league_menu, render_cache
+from quota_counter import quota_counter
+from result_poller import result_poller
+
+def reset_memory_state():
+    """Drop every in-memory layer kept in front of the database"""
+    quota_counter.__init__()
+    for memory in (api_limiter.odds_memory, api_limiter.results_memory, cache.memory, render_cache):
+        memory.clear()
+    league_menu.__init__()
+    with betslip_store._lock:
+        betslip_store._slips.clear()
+        betslip_store._dirty.clear()
+        betslip_store._pruned_until = 0
+    with result_poller._lock:
+        result_poller._schedule.clear()
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh bot database in tmp_path, set up the way the bot starts"""
+    monkeypatch.setattr(db, "db_pool", db.ConnectionPool(str(tmp_path / "test.db")))
+    reset_memory_state()
+    db.init_db()
+    yield tmp_path
+    # Nothing cached from this database, and nothing left for the exit
+    # checkpoint / flush to write into bot.db
+    reset_memory_state()
+
+@pytest.fixture
+def add_fixture(temp_db):
+    """add_fixture(fixture_id, kickoff_ts) - a not-started fixture between two new teams"""
+    def add(fixture_id, kickoff_ts, league_id=1):
+        start_time = datetime.fromtimestamp(kickoff_ts, timezone.utc).isoformat()
+        home_id, away_id = fixture_id * 2, fixture_id * 2 + 1
+        with db.get_connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO teams (team_id, name) VALUES (?, ?)",
+                             [(home_id, f"Home {fixture_id}"), (away_id, f"Away {fixture_id}")])
+            conn.execute("""
+                INSERT INTO fixtures
+                (fixture_id, league_id, home_team_id, away_team_id, start_time, kickoff_ts, match_day, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'NS')
+            """, (fixture_id, league_id, home_id, away_id, start_time, *db.fixture_time_columns(start_time)))
+    return add
+
+@pytest.fixture
+def place(temp_db):
+    """place(user_id, stake, [(fixture_id, market, pick, odds)]) -> bet_id, opening the account if new"""
+    import betting
+    from ledger import ledger
+
+    def place_bet(user_id, stake, legs):
+        ledger.open_account(user_id, f"user{user_id}")
+        placed, msg, _ = betting._place_bet_transaction(user_id, stake, [Selection(*leg) for leg in legs])
+        assert placed, msg
+        with db.get_connection() as conn:
+            return conn.execute("SELECT MAX(bet_id) FROM bets WHERE user_id = ?", (user_id,)).fetchone()[0]
+    return place_bet
+
+ODDS_RESPONSE = {"response": [{"bookmakers": [{"bets": [
+    {"id": 1, "name": "Match Winner", "values": [
+        {"value": "Home", "odd": "2.10"},
+        {"value": "Draw", "odd": "3.30"},
+        {"value": "Away", "odd": "3.60"},
+    ]},
+]}]}]}
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+class FakeApi:
+    """
+    Stands in for api_client. handler(path, params) returns the JSON payload
+    (or an exception to raise); every call is recorded as (path, params).
+    Async calls stay in flight for delay seconds.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.delay = 0
+        self.handler = lambda path, params: ODDS_RESPONSE if path == "/odds" else {"response": []}
+
+    def _answer(self, path, params):
+        payload = self.handler(path, params)
+        if isinstance(payload, Exception):
+            raise payload
+        return FakeResponse(payload)
+
+    async def get(self, path, params=None):
+        self.calls.append((path, params))
+        await asyncio.sleep(self.delay)
+        return self._answer(path, params)
+
+    def get_sync(self, path, params=None):
+        self.calls.append((path, params))
+        return self._answer(path, params)
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """api_client answering from a FakeApi instead of API-Football"""
+    fake = FakeApi()
+    monkeypatch.setattr(api_client, "get", fake.get)
+    monkeypatch.setattr(api_client, "get_sync", fake.get_sync)
+    return fake
\ No newline at end of file
@@ -0,0 +1,170 @@
+# test_api_client.py
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+import api
+import api_client as api_client_module
+from api_client import ApiFootballClient
+from api_limiter import api_limiter
+from results_db import results_db
+from config import MAX_RETRY_ATTEMPTS, API_TIMEOUTS
+from quota_counter import LIMIT_HEADER, REMAINING_HEADER
+
+ATTEMPTS = MAX_RETRY_ATTEMPTS + 1
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_football")
+
+def recorded(request):
+    """The recorded API-Football response for a request, picked by path (and ids= for results)"""
+    if request.url.path == "/odds":
+        name = "odds_fixture"
+    elif request.url.path == "/fixtures":
+        name = "fixtures_ids" if "ids" in request.url.params else "fixtures_league_day"
+    else:
+        return {"response": []}
+    with open(os.path.join(RECORDED_DIR, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+class QuotaRecorder:
+    """Stands in for quota_counter and records what the client reports"""
+
+    def __init__(self):
+        self.started = 0
+        self.finished = []
+
+    def request_started(self):
+        self.started += 1
+
+    def request_finished(self, headers=None):
+        self.finished.append(headers)
+
+@pytest.fixture
+def quota(monkeypatch):
+    recorder = QuotaRecorder()
+    monkeypatch.setattr(api_client_module, "quota_counter", recorder)
+    monkeypatch.setattr(api_client_module, "RETRY_DELAY_SECONDS", 0)
+    return recorder
+
+def make_client(*outcomes):
+    """Client whose successive requests get outcomes (status code or exception), last one repeating;
+    successful ones carry the recorded payload for their path"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        outcome = outcomes[min(len(requests), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        remaining = 100 - len(requests)
+        return httpx.Response(outcome, json=recorded(request),
+                              headers={LIMIT_HEADER: "100", REMAINING_HEADER: str(remaining)})
+
+    client = ApiFootballClient()
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    return client, requests
+
+def test_retries_then_succeeds(quota):
+    client, requests = make_client(503, 200)
+
+    r = client.get_sync("/odds", {"fixture": 1})
+
+    assert r.status_code == 200
+    assert len(requests) == 2
+    assert requests[0].url.params["fixture"] == "1"
+    assert quota.started == 2
+    assert [h[REMAINING_HEADER] for h in quota.finished] == ["99", "98"]
+
+def test_gives_up_after_the_last_attempt(quota):
+    client, requests = make_client(429)
+
+    r = client.get_sync("/fixtures", {"live": "all"})
+
+    # The final retryable response is handed back for the caller to handle
+    assert r.status_code == 429
+    assert len(requests) == ATTEMPTS
+    assert quota.started == ATTEMPTS
+    assert len(quota.finished) == ATTEMPTS
+
+def test_client_errors_are_not_retried(quota):
+    client, requests = make_client(404)
+
+    assert client.get_sync("/teams").status_code == 404
+    assert len(requests) == 1
+    assert quota.started == 1 and len(quota.finished) == 1
+
+def test_timeout_is_retried(quota):
+    client, requests = make_client(httpx.ReadTimeout("slow"), 200)
+
+    async def run():
+        return await client.get("/odds", {"fixture": 1})
+
+    assert asyncio.run(run()).status_code == 200
+    assert len(requests) == 2
+    # A timed out attempt has no headers to reconcile with
+    assert quota.started == 2
+    assert quota.finished[0] is None and quota.finished[1] is not None
+
+def test_timeout_on_every_attempt_raises(quota):
+    client, requests = make_client(httpx.ConnectTimeout("unreachable"))
+
+    with pytest.raises(httpx.ConnectTimeout):
+        client.get_sync("/odds", {"fixture": 1})
+
+    assert len(requests) == ATTEMPTS
+    assert quota.started == ATTEMPTS
+    assert quota.finished == [None] * ATTEMPTS
+
+def test_per_endpoint_timeout(quota):
+    client, requests = make_client(200)
+
+    client.get_sync("/leagues")
+
+    assert requests[0].extensions["timeout"]["read"] == API_TIMEOUTS["/leagues"]
+
+@pytest.fixture
+def recorded_api(temp_db, quota, monkeypatch):
+    """api.py talking to a client that replays the recorded payloads"""
+    client, requests = make_client(200)
+    monkeypatch.setattr(api, "api_client", client)
+    return requests
+
+def test_league_fixtures_from_recorded_payload(recorded_api):
+    fixtures = api.fetch_league_fixtures(39, days=1)
+
+    assert recorded_api[0].url.params["league"] == "39"
+    assert recorded_api[0].url.params["status"] == "NS"
+    assert [(f["fixture"]["id"], f["teams"]["home"]["name"], f["teams"]["away"]["name"]) for f in fixtures] == [
+        (1379032, "Arsenal", "Chelsea"),
+        (1379033, "Liverpool", "Manchester City"),
+    ]
+
+def test_match_odds_from_recorded_payload(recorded_api):
+    odds = asyncio.run(api._fetch_match_odds_async(1379032))
+
+    assert recorded_api[0].url.params["fixture"] == "1379032"
+    # The first bookmaker's Match Winner and Over/Under markets; the rest is ignored
+    assert odds == {
+        "1x2": {"home": 1.95, "draw": 3.6, "away": 3.9},
+        "ou": {"Over 1.5": 1.3, "Under 1.5": 3.4, "Over 2.5": 1.85,
+               "Under 2.5": 1.95, "Over 3.5": 3.1, "Under 3.5": 1.36},
+    }
+    assert api_limiter.get_cached_odds(1379032) == odds
+
+def test_fixture_results_from_recorded_payload(recorded_api):
+    results = api.fetch_fixture_results([1378990, 1378991, 1378992])
+
+    # One batched request for all three
+    assert len(recorded_api) == 1
+    assert recorded_api[0].url.params["ids"] == "1378990-1378991-1378992"
+    assert {fixture_id: (r["home_goals"], r["away_goals"], r["status"]) for fixture_id, r in results.items()} == {
+        1378990: (2, 1, "FT"),
+        # Markets settle on the 90-minute score, not the extra-time one
+        1378991: (1, 1, "AET"),
+        1378992: (0, 0, "PST"),
+    }
+    stored = results_db.get_result(1378990)
+    assert (stored["home_team"], stored["away_team"], stored["match_date"], stored["league_name"]) == (
+        "Manchester United", "Tottenham", "2026-10-17", "Premier League")
\ No newline at end of file
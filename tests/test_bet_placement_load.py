@@ -0,0 +1,41 @@
+# test_bet_placement_load.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import betting
+from betslip_store import Selection
+from config import START_BALANCE
+from db import get_connection
+from ledger import ledger
+
+USERS = 100
+PLACEMENTS = 1000
+# 10 attempts per user, funds for 6 (START_BALANCE // STAKE) - the rest must bounce
+STAKE = 150
+WORKERS = 32
+
+def test_concurrent_placements_never_overdraw(add_fixture):
+    add_fixture(1, int(time.time()) + 3600)
+    for user_id in range(1, USERS + 1):
+        ledger.open_account(user_id, f"user{user_id}")
+    legs = [Selection(1, "1X2", "1", 2.0)]
+
+    def place(i):
+        placed, _, _ = betting._place_bet_transaction(i % USERS + 1, STAKE, legs)
+        return placed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        accepted = sum(pool.map(place, range(PLACEMENTS)))
+    elapsed = time.perf_counter() - started
+    print(f"\n{PLACEMENTS} placements in {elapsed:.2f}s ({PLACEMENTS / elapsed:.0f}/s), {accepted} accepted")
+
+    # Each user's funds cover exactly START_BALANCE // STAKE bets - no more, no fewer
+    assert accepted == USERS * (START_BALANCE // STAKE)
+    with get_connection() as conn:
+        min_balance, bets = conn.execute(
+            "SELECT MIN(balance), (SELECT COUNT(*) FROM bets) FROM users"
+        ).fetchone()
+    assert min_balance >= 0
+    assert bets == accepted
+    assert ledger.reconcile()["ok"]
\ No newline at end of file
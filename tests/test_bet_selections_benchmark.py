@@ -0,0 +1,168 @@
+# test_bet_selections_benchmark.py
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import betting
+import db
+from results_db import results_db
+
+BETS = 100_000
+USERS = 20_000
+FIXTURES = 1000
+SETTLED_FIXTURES = 5
+HISTORY_PAGES = 500
+PICKS = [("1X2", "1"), ("1X2", "X"), ("1X2", "2"), ("OU", "Over 2.5"), ("OU", "Under 2.5")]
+
+def seed():
+    """BETS pending bets of 1-4 legs, written both as JSON and as bet_selections rows"""
+    rng = random.Random(11)
+    start_time = datetime.fromtimestamp(int(time.time()) + 3600, timezone.utc).isoformat()
+    kickoff_ts, match_day = db.fixture_time_columns(start_time)
+    bets, legs = [], []
+    for bet_id in range(1, BETS + 1):
+        selections = [{"fixture_id": fixture_id, "market": market, "pick": pick, "odds": 2.0}
+                      for fixture_id in rng.sample(range(1, FIXTURES + 1), rng.randint(1, 4))
+                      for market, pick in [rng.choice(PICKS)]]
+        bets.append((bet_id, bet_id % USERS + 1, json.dumps(selections), 2.0 ** len(selections),
+                     10, 10 * 2.0 ** len(selections)))
+        legs.extend((bet_id, s["fixture_id"], s["market"], s["pick"], s["odds"]) for s in selections)
+
+    with db.get_connection() as conn:
+        conn.execute("INSERT OR IGNORE INTO leagues (league_id, name, country) VALUES (1, 'Test League', 'England')")
+        conn.executemany("INSERT INTO users (user_id, username, balance) VALUES (?, ?, 0)",
+                         [(user_id, f"user{user_id}") for user_id in range(1, USERS + 1)])
+        conn.executemany("INSERT INTO teams (team_id, name) VALUES (?, ?)",
+                         [(team_id, f"Team {team_id}") for team_id in range(1, FIXTURES * 2 + 1)])
+        conn.executemany("""
+            INSERT INTO fixtures
+            (fixture_id, league_id, home_team_id, away_team_id, start_time, kickoff_ts, match_day, status)
+            VALUES (?, 1, ?, ?, ?, ?, ?, 'NS')
+        """, [(fixture_id, fixture_id * 2 - 1, fixture_id * 2, start_time, kickoff_ts, match_day)
+              for fixture_id in range(1, FIXTURES + 1)])
+        conn.executemany("""
+            INSERT INTO bets (bet_id, user_id, selections, total_odds, stake, payout, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'PENDING')
+        """, bets)
+        conn.executemany(
+            "INSERT INTO bet_selections (bet_id, fixture_id, market, pick, odds) VALUES (?, ?, ?, ?, ?)", legs
+        )
+        conn.executemany("""
+            INSERT INTO match_results (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date)
+            VALUES (?, ?, ?, ?, ?, 'FT', ?)
+        """, [(fixture_id, f"Team {fixture_id * 2 - 1}", f"Team {fixture_id * 2}",
+               rng.randint(0, 3), rng.randint(0, 3), match_day)
+              for fixture_id in range(1, SETTLED_FIXTURES + 1)])
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+# ====== BEFORE: bets.selections JSON ======
+def json_pending_fixtures():
+    with db.get_connection() as conn:
+        return {row[0] for row in conn.execute("""
+            SELECT DISTINCT json_extract(value, '$.fixture_id')
+            FROM bets, json_each(bets.selections)
+            WHERE bets.status = 'PENDING'
+        """)}
+
+def _json_leg_lost(s, home_goals, away_goals):
+    if s["market"] == "1X2":
+        return {"1": home_goals <= away_goals, "X": home_goals != away_goals, "2": home_goals >= away_goals}[s["pick"]]
+    type_, line = s["pick"].split(" ")
+    return home_goals + away_goals <= float(line) if type_ == "Over" else home_goals + away_goals >= float(line)
+
+def json_settle(fixture_ids):
+    """Scan every pending bet's JSON for each fixture, grade in Python, write bet by bet (rolled back)"""
+    with db.get_connection() as conn:
+        results = {row[0]: row[1:] for row in conn.execute(
+            "SELECT fixture_id, home_goals, away_goals, status FROM match_results")}
+        settled = 0
+        for fixture_id in fixture_ids:
+            bets = conn.execute("""
+                SELECT bet_id, user_id, selections, payout FROM bets
+                WHERE status = 'PENDING'
+                AND EXISTS (SELECT 1 FROM json_each(bets.selections)
+                            WHERE json_extract(value, '$.fixture_id') = ?)
+            """, (fixture_id,)).fetchall()
+            for bet_id, user_id, selections, payout in bets:
+                status = "WON"
+                for s in json.loads(selections):
+                    result = results.get(s["fixture_id"])
+                    if result is None:
+                        status = None
+                    elif _json_leg_lost(s, result[0], result[1]):
+                        status = "LOST"
+                        break
+                if status is None:
+                    continue
+                conn.execute("UPDATE bets SET status = ? WHERE bet_id = ?", (status, bet_id))
+                if status == "WON":
+                    conn.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (payout, user_id))
+                settled += 1
+        conn.rollback()
+    return settled
+
+def json_history(user_ids):
+    """A 5-bet history page per user: decode JSON, one fixture lookup per leg"""
+    legs = 0
+    for user_id in user_ids:
+        with db.get_connection() as conn:
+            for _, selections in conn.execute(
+                    "SELECT bet_id, selections FROM bets WHERE user_id = ? ORDER BY bet_id DESC LIMIT 5", (user_id,)):
+                for s in json.loads(selections):
+                    conn.execute("""
+                        SELECT t1.name, t2.name, l.name
+                        FROM fixtures f
+                        JOIN teams t1 ON f.home_team_id = t1.team_id
+                        JOIN teams t2 ON f.away_team_id = t2.team_id
+                        JOIN leagues l ON f.league_id = l.league_id
+                        WHERE f.fixture_id = ?
+                    """, (s["fixture_id"],)).fetchone()
+                    legs += 1
+    return legs
+
+# ====== AFTER: bet_selections joins ======
+def joined_settle(fixture_ids):
+    return sum(betting.settle_fixture(fixture_id) for fixture_id in fixture_ids)
+
+def joined_history(user_ids):
+    legs = 0
+    for user_id in user_ids:
+        with db.get_connection() as conn:
+            bet_ids = [row[0] for row in conn.execute(
+                "SELECT bet_id FROM bets WHERE user_id = ? ORDER BY bet_id DESC LIMIT 5", (user_id,))]
+            legs += sum(len(s) for s in betting.get_bet_selections(bet_ids).values())
+    return legs
+
+def test_bet_selection_joins_vs_json_each(temp_db):
+    seed()
+    user_ids = range(1, HISTORY_PAGES + 1)
+    fixture_ids = range(1, SETTLED_FIXTURES + 1)
+
+    old_pending, old_pending_time = timed(json_pending_fixtures)
+    new_pending, new_pending_time = timed(results_db.get_pending_bets_fixtures)
+    old_legs, old_history_time = timed(json_history, user_ids)
+    new_legs, new_history_time = timed(joined_history, user_ids)
+    old_settled, old_settle_time = timed(json_settle, fixture_ids)
+    new_settled, new_settle_time = timed(joined_settle, fixture_ids)
+
+    print(f"\n{BETS} bets on {FIXTURES} fixtures, json_each -> bet_selections joins")
+    for label, before, after in (
+        ("pending-fixture discovery", old_pending_time, new_pending_time),
+        (f"{HISTORY_PAGES} history pages", old_history_time, new_history_time),
+        (f"settling {SETTLED_FIXTURES} fixtures ({new_settled} bets)", old_settle_time, new_settle_time),
+    ):
+        print(f"  {label:<34} {before * 1000:8.1f} ms -> {after * 1000:8.1f} ms")
+
+    # Same answers either way
+    assert set(new_pending) == old_pending
+    assert new_legs == old_legs
+    assert new_settled == old_settled > 0
+
+    assert new_pending_time < old_pending_time
+    assert new_history_time < old_history_time
+    assert new_settle_time < old_settle_time
\ No newline at end of file
@@ -0,0 +1,130 @@
+# test_betslip_store.py
+import gc
+import time
+import tracemalloc
+
+import betting
+from betslip_store import BetSlipStore, betslip_store
+from db import get_connection
+from ledger import ledger
+
+USERS = 100_000
+LEGS = 3
+PICKS = [("1X2", "1"), ("OU", "Over 2.5"), ("1X2", "X")]
+
+def legs(user_id):
+    return [(user_id + leg, market, pick, 1.5 + leg / 10) for leg, (market, pick) in enumerate(PICKS[:LEGS])]
+
+def traced(build):
+    """(what build() returned, bytes it still holds)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        return kept, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+def old_bet_slips():
+    """The BET_SLIPS layout this store replaced: {user_id: [leg dict, ...]}"""
+    slips = {}
+    for user_id in range(1, USERS + 1):
+        for fixture_id, market, pick, odds in legs(user_id):
+            # The old add_selection's duplicate check was a scan of the list
+            if any(s["fixture_id"] == fixture_id for s in slips.setdefault(user_id, [])):
+                continue
+            slips[user_id].append({"fixture_id": fixture_id, "market": market, "pick": pick, "odds": odds})
+    return slips
+
+def test_memory_per_active_user_vs_bet_slips_dict(temp_db):
+    _, old_bytes = traced(old_bet_slips)
+
+    store = BetSlipStore()
+    # Every user is loaded from (empty) SQLite once, as on a first visit
+    def build():
+        for user_id in range(1, USERS + 1):
+            for leg in legs(user_id):
+                assert store.add(user_id, *leg)
+        store._dirty.clear()
+        return store
+    _, new_bytes = traced(build)
+
+    started = time.perf_counter()
+    duplicates = sum(not store.add(user_id, *legs(user_id)[0]) for user_id in range(1, USERS + 1))
+    duplicate_seconds = time.perf_counter() - started
+
+    print(f"\n{USERS} active users x {LEGS} legs: BET_SLIPS dict {old_bytes / 2**20:.1f} MiB, "
+          f"BetSlipStore {new_bytes / 2**20:.1f} MiB ({new_bytes / USERS:.0f} B per user), "
+          f"{USERS} duplicate checks in {duplicate_seconds:.2f}s")
+
+    assert store.stats() == {"active": USERS, "dirty": 0, "selections": USERS * LEGS}
+    assert duplicates == USERS
+    assert new_bytes < old_bytes
+
+def test_cleared_slip_moves_to_the_young_end(temp_db):
+    store = BetSlipStore(idle_ttl_seconds=60)
+    for user_id in (1, 2, 3):
+        store.add(user_id, *legs(user_id)[0])
+    store.flush()
+    for user_id in (1, 2, 3):
+        store._slips[user_id].last_used -= 120
+
+    # Clearing is a use: user 1's slip is active again, the others are idle
+    store.clear(1)
+    store.sweep()
+
+    assert list(store._slips) == [1]
+    assert store.selections(1) == []
+
+def test_placement_rejects_legs_on_removed_or_called_off_fixtures(add_fixture):
+    kickoff = int(time.time()) + 3600
+    for fixture_id in (1, 2, 3):
+        add_fixture(fixture_id, kickoff)
+    with get_connection() as conn:
+        # The cleanup deletes finished / cancelled rows; postponed ones linger until it runs
+        conn.execute("DELETE FROM fixtures WHERE fixture_id = 2")
+        conn.execute("UPDATE fixtures SET status = 'POSTPONED' WHERE fixture_id = 3")
+    ledger.open_account(1, "user1")
+    for fixture_id in (1, 2, 3):
+        betslip_store.add(1, fixture_id, "1X2", "1", 2.0)
+
+    placed, msg = betting.place_bet(1, 10)
+
+    assert not placed and msg.startswith("❌ 2 match(es)")
+    # Only the leg that can still be bet on goes back on the slip
+    assert [s.fixture_id for s in betslip_store.selections(1)] == [1]
+    with get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bets").fetchone()[0] == 0
+
+def test_prune_removes_legs_the_kickoff_window_cannot_reach(add_fixture):
+    kickoff = int(time.time()) + 3600
+    for fixture_id in (1, 2, 3, 4):
+        add_fixture(fixture_id, kickoff)
+    for user_id, fixture_id in ((1, 1), (1, 2), (2, 3), (2, 4)):
+        betslip_store.add(user_id, fixture_id, "1X2", "1", 2.0)
+    # A previous sweep already moved the watermark past fixture 3's new kickoff
+    betslip_store.prune_started()
+    with get_connection() as conn:
+        # Finished and cleaned up - only its result row still names the teams
+        conn.execute("DELETE FROM fixtures WHERE fixture_id = 1")
+        conn.execute("""
+            INSERT INTO match_results (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date)
+            VALUES (1, 'Home 1', 'Away 1', 1, 0, 'FT', '2026-10-17')
+        """)
+        conn.execute("UPDATE fixtures SET status = 'POSTPONED' WHERE fixture_id = 2")
+        conn.execute("UPDATE fixtures SET kickoff_ts = kickoff_ts - 7200 WHERE fixture_id = 3")
+        conn.execute("UPDATE fixtures SET status = 'TIME_EXPIRED' WHERE fixture_id = 3")
+    notices = []
+    betslip_store.on_pruned(notices.append)
+    try:
+        assert betslip_store.prune_started() == 3
+    finally:
+        betslip_store._pruned_listeners.remove(notices.append)
+
+    assert notices == [{1: ["Home 1 vs Away 1", "Home 2 vs Away 2"], 2: ["Home 3 vs Away 3"]}]
+    assert betslip_store.selections(1) == []
+    assert [s.fixture_id for s in betslip_store.selections(2)] == [4]
+    with get_connection() as conn:
+        assert conn.execute("SELECT user_id, fixture_id FROM betslip").fetchall() == [(2, 4)]
\ No newline at end of file
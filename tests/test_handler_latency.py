@@ -0,0 +1,116 @@
+# test_handler_latency.py
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import async_db
+import bot
+import db
+
+USERS = 200
+ARRIVAL_SECONDS = 2.0        # Updates trickle in over this window
+SEARCH_EVERY = 50            # Every 50th user runs a team search (teams LIKE scan + fixtures join)
+BETS_PER_USER = 50
+FIXTURES = 50000
+HEARTBEAT_SECONDS = 0.005
+
+def seed(users):
+    start_time = datetime.fromtimestamp(int(time.time()) + 7200, timezone.utc).isoformat()
+    kickoff_ts, match_day = db.fixture_time_columns(start_time)
+    with db.get_connection() as conn:
+        conn.executemany("INSERT INTO users (user_id, username, balance) VALUES (?, ?, 1000)",
+                         [(user_id, f"user{user_id}") for user_id in users])
+        conn.executemany(
+            "INSERT INTO bets (user_id, selections, total_odds, stake, status) VALUES (?, '[]', 2.0, 10, ?)",
+            [(user_id, ("PENDING", "WON", "LOST")[i % 3]) for user_id in users for i in range(BETS_PER_USER)]
+        )
+        conn.execute("INSERT OR IGNORE INTO leagues (league_id, name, country) VALUES (1, 'Test League', 'England')")
+        conn.executemany("INSERT INTO teams (team_id, name) VALUES (?, ?)",
+                         [(team_id, f"Team {team_id} United") for team_id in range(1, FIXTURES * 2 + 1)])
+        conn.executemany("""
+            INSERT INTO fixtures
+            (fixture_id, league_id, home_team_id, away_team_id, start_time, kickoff_ts, match_day, status)
+            VALUES (?, 1, ?, ?, ?, ?, ?, 'NS')
+        """, [(fixture_id, fixture_id * 2 - 1, fixture_id * 2, start_time, kickoff_ts, match_day)
+              for fixture_id in range(1, FIXTURES + 1)])
+
+def make_update(user_id):
+    """(handler, update, context, reply mock) for one simulated user"""
+    reply = AsyncMock()
+    user = SimpleNamespace(id=user_id)
+    context = SimpleNamespace(user_data={"awaiting_team_search": True})
+    if user_id % SEARCH_EVERY == 0:
+        update = SimpleNamespace(effective_user=user,
+                                 message=SimpleNamespace(text=f"Team {user_id}", reply_text=reply))
+        return bot.search_team_handler, update, context, reply
+    query = SimpleNamespace(from_user=user, edit_message_text=reply)
+    return lambda update, context: bot.show_balance_inline(query), None, context, reply
+
+async def run_users(users):
+    """Replay the arrivals -> (seconds from arrival to reply per user, longest event loop stall)"""
+    rng = random.Random(42)
+    arrivals = sorted(rng.uniform(0, ARRIVAL_SECONDS) for _ in users)
+    updates = [make_update(user_id) for user_id in users]
+    stalls = []
+    running = True
+
+    async def heartbeat():
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            stalls.append(time.perf_counter() - before - HEARTBEAT_SECONDS)
+
+    async def handle(arrival, handler, update, context, reply):
+        await asyncio.sleep(arrival)
+        await handler(update, context)
+        reply.assert_awaited()
+        # From when the update arrived, not when the loop got round to it
+        return time.perf_counter() - started - arrival
+
+    beat = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(handle(arrival, *update) for arrival, update in zip(arrivals, updates)))
+    running = False
+    await beat
+    return latencies, max(stalls)
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100)
+    return cuts[49] * 1000, cuts[98] * 1000
+
+def test_handler_latency_inline_vs_executor(temp_db, monkeypatch):
+    users = range(1, USERS + 1)
+    seed(users)
+
+    # Before: queries run on the event loop thread, as with the old shared cursor
+    async def fetch_one_inline(sql, params=()):
+        return async_db._fetch_one(sql, params)
+
+    async def fetch_all_inline(sql, params=()):
+        return async_db._fetch_all(sql, params)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bot, "fetch_one", fetch_one_inline)
+        patch.setattr(bot, "fetch_all", fetch_all_inline)
+        inline, inline_stall = asyncio.run(run_users(users))
+    executor, executor_stall = asyncio.run(run_users(users))
+
+    results = {}
+    for name, latencies, stall in (("inline", inline, inline_stall), ("executor", executor, executor_stall)):
+        # The users who are not searching, i.e. the ones a slow query should not hold up
+        others = [latency for user_id, latency in zip(users, latencies) if user_id % SEARCH_EVERY]
+        searches = [latency for user_id, latency in zip(users, latencies) if not user_id % SEARCH_EVERY]
+        results[name] = percentiles(others)
+        print(f"\n{name:>8}: {USERS} users, p50 {results[name][0]:.1f} ms, p99 {results[name][1]:.1f} ms "
+              f"(searches {statistics.mean(searches) * 1000:.1f} ms on average), "
+              f"longest event loop stall {stall * 1000:.1f} ms", end="")
+    print()
+
+    # Inline, each team search holds up every other update until it finishes;
+    # on the DB workers the loop keeps dispatching while the scan runs
+    assert executor_stall < inline_stall
+    assert results["executor"][1] < results["inline"][1]
\ No newline at end of file
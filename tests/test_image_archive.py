@@ -0,0 +1,81 @@
+# test_image_archive.py
+import io
+import os
+
+import pytest
+
+import db
+import image_archive as image_archive_module
+from image_archive import ImageArchive, recompress, image_extension
+from config import ARCHIVE_MAX_DIMENSION, ARCHIVE_TARGET_BYTES
+
+Image = pytest.importorskip("PIL.Image")
+
+def png_bytes(width, height):
+    """A noisy PNG screenshot - large as PNG, much smaller as JPEG"""
+    gradient = Image.linear_gradient("L")
+    img = Image.merge("RGB", (
+        gradient.resize((width, height)),
+        gradient.rotate(90).resize((width, height)),
+        Image.effect_noise((width, height), 32),
+    ))
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+@pytest.fixture
+def archive(temp_db):
+    return ImageArchive(directory=str(temp_db / "images"))
+
+def test_recompress_shrinks_and_bounds_screenshots():
+    data = png_bytes(ARCHIVE_MAX_DIMENSION + 600, ARCHIVE_MAX_DIMENSION // 2)
+
+    small = recompress(data)
+
+    assert len(small) < len(data)
+    assert len(small) <= ARCHIVE_TARGET_BYTES
+    with Image.open(io.BytesIO(small)) as img:
+        assert img.format == "JPEG"
+        assert max(img.size) <= ARCHIVE_MAX_DIMENSION
+
+def test_store_saves_the_recompressed_copy(archive):
+    data = png_bytes(1200, 800)
+
+    path, size = archive._store(data)
+
+    assert path.endswith(".jpg")
+    assert size < len(data)
+    stored = archive.read(path)
+    assert image_extension(stored) == ".jpg" and len(stored) == size
+    with db.get_connection() as conn:
+        row = conn.execute(
+            "SELECT size_bytes, original_bytes FROM archived_images WHERE path = ?", (path,)
+        ).fetchone()
+    assert row == (size, len(data))
+
+    # Same bytes again are a duplicate of the first copy
+    assert archive._store(data) == (path, None)
+
+def test_store_keeps_the_original_extension_when_not_reencoded(archive):
+    # Already tiny - a JPEG re-encode would only grow it
+    data = png_bytes(4, 4)
+    assert recompress(data) is data
+
+    path, size = archive._store(data)
+
+    assert path.endswith(".png")
+    assert archive.read(path) == data and size == len(data)
+
+def test_store_without_pillow_keeps_the_original(archive, monkeypatch):
+    monkeypatch.setattr(image_archive_module, "Image", None)
+    data = png_bytes(1200, 800)
+
+    path, size = archive._store(data)
+
+    assert path.endswith(".png")
+    assert size == len(data)
+    assert os.path.exists(archive._full_path(path))
+
+def test_unknown_bytes_are_kept_as_bin(archive):
+    path, _ = archive._store(b"not an image at all")
+    assert path.endswith(".bin")
\ No newline at end of file
@@ -0,0 +1,38 @@
+# test_ledger.py
+from config import START_BALANCE
+from db import get_connection
+from ledger import ledger
+
+def balance(user_id):
+    with get_connection() as conn:
+        return conn.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def test_withdrawal_needs_funds_and_is_held_once(temp_db):
+    ledger.open_account(1, "alice")
+
+    assert ledger.request_withdrawal(1, "alice", START_BALANCE + 1, "cbe", "123") is None
+    assert balance(1) == START_BALANCE
+
+    transaction_id = ledger.request_withdrawal(1, "alice", 300, "cbe", "123")
+    assert balance(1) == START_BALANCE - 300
+
+    # Approval pays out the hold - no second debit, and only once
+    assert ledger.process_transaction(transaction_id, "approved", 99)
+    assert not ledger.process_transaction(transaction_id, "rejected", 99)
+    assert balance(1) == START_BALANCE - 300
+    assert ledger.reconcile()["ok"]
+
+def test_rejected_withdrawal_is_refunded(temp_db):
+    ledger.open_account(2, "bob")
+    transaction_id = ledger.request_withdrawal(2, "bob", 250, "telebirr", "0911")
+
+    assert ledger.process_transaction(transaction_id, "rejected", 99)
+    assert balance(2) == START_BALANCE
+
+def test_deposit_is_credited_on_approval(temp_db):
+    ledger.open_account(3, "carol")
+    transaction_id = ledger.request_deposit(3, "carol", 500, "cbe", "file-id")
+    assert balance(3) == START_BALANCE
+
+    assert ledger.process_transaction(transaction_id, "approved", 99)
+    assert balance(3) == START_BALANCE + 500
\ No newline at end of file
@@ -0,0 +1,54 @@
+# test_menu_cache.py
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import bot
+from menu_cache import fixture_set_version, league_menu
+
+def callback(data):
+    """Run the bot's handler for a button press -> the text it showed, then its button labels"""
+    update = MagicMock()
+    update.callback_query.data = data
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.edit_message_text = AsyncMock()
+    context = MagicMock()
+    context.user_data = {}
+    handler = bot.show_leagues_menu if data.startswith(("leagues_page_", "refresh_leagues_")) else bot.show_league_matches
+    asyncio.run(handler(update, context))
+    (text,), kwargs = update.callback_query.edit_message_text.call_args
+    buttons = [button.text for row in kwargs["reply_markup"].inline_keyboard for button in row]
+    return "\n".join([text] + buttons)
+
+def test_refresh_matches_skips_the_render_cache(add_fixture):
+    add_fixture(1, int(time.time()) + 60)
+    assert "Home 1 vs Away 1" in callback("league_1_0_0")
+
+    # Not announced through fixture_set_version: other users keep the cached page
+    add_fixture(2, int(time.time()) + 120)
+    assert "Home 2 vs Away 2" not in callback("league_1_0_0")
+
+    # Refresh renders it again, and the cache serves the fresh page from then on
+    assert "Home 2 vs Away 2" in callback("refresh_matches_1_0_0")
+    assert "Home 2 vs Away 2" in callback("league_1_0_0")
+
+def test_fixture_set_version_invalidates_snapshot_and_render_cache(add_fixture):
+    add_fixture(1, int(time.time()) + 60)
+    menu = callback("leagues_page_0_0")
+    snapshot = league_menu.lookup(0, 0)
+    assert [league[1] for league in snapshot["leagues"]] == ["Premier League"]
+    assert "Home 1 vs Away 1" in callback("league_1_0_0")
+
+    # Until the version moves, both screens come from memory
+    add_fixture(2, int(time.time()) + 120)
+    add_fixture(3, int(time.time()) + 120, league_id=2)
+    assert league_menu.lookup(0, 0) is snapshot
+    assert callback("leagues_page_0_0") == menu
+    assert "Home 2 vs Away 2" not in callback("league_1_0_0")
+
+    fixture_set_version.bump()
+
+    assert league_menu.lookup(0, 0) is None
+    assert "Home 2 vs Away 2" in callback("league_1_0_0")
+    assert callback("leagues_page_0_0") != menu
+    assert [league[1] for league in league_menu.lookup(0, 0)["leagues"]] == ["Premier League", "La Liga"]
\ No newline at end of file
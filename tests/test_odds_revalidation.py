@@ -0,0 +1,35 @@
+# test_odds_revalidation.py
+import asyncio
+
+import api
+from api_limiter import PRIORITY_OPTIONAL
+from config import MAX_BACKGROUND_REQUESTS, BACKGROUND_ESSENTIAL_RESERVE, ODDS_REVALIDATE_COOLDOWN_MINUTES
+from quota_counter import quota_counter
+
+def test_user_fetch_does_not_share_a_refused_refresh(temp_db, fake_api):
+    # Optional budget spent: the background refresh will be refused
+    optional_budget = MAX_BACKGROUND_REQUESTS - BACKGROUND_ESSENTIAL_RESERVE
+    for _ in range(optional_budget):
+        quota_counter.claim(PRIORITY_OPTIONAL, lambda total, used: None)
+
+    fake_api.delay = 0.05
+
+    async def run():
+        refresh = asyncio.create_task(api._revalidate_odds(2001))
+        await asyncio.sleep(0)
+        odds = await api.fetch_match_odds_async(2001)
+        await refresh
+        return odds
+
+    assert asyncio.run(run()) is not None
+    assert fake_api.calls == [("/odds", {"fixture": 2001})]
+
+def test_refresh_attempts_are_forgotten_after_the_cooldown(monkeypatch):
+    cooldown = ODDS_REVALIDATE_COOLDOWN_MINUTES * 60
+    monkeypatch.setattr(api, "_last_revalidated", {1: 0.0, 2: cooldown - 1.0, 3: cooldown + 5.0})
+
+    api._prune_revalidated(cooldown + 10.0)
+
+    assert api._last_revalidated == {2: cooldown - 1.0, 3: cooldown + 5.0}
+    api._prune_revalidated(2 * cooldown + 5.0)
+    assert api._last_revalidated == {}
\ No newline at end of file
@@ -0,0 +1,102 @@
+# test_query_plans.py
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import db
+import betting
+import scheduler
+import bot
+from menu_cache import league_menu
+from betslip_store import betslip_store
+from result_poller import result_poller
+
+NEW_INDEXES = {"idx_fixtures_day", "idx_fixtures_league_day", "idx_fixtures_kickoff_ts"}
+
+@pytest.fixture
+def statements(temp_db, monkeypatch):
+    """Every SQL statement run on the pool from here on, parameters bound"""
+    seen = []
+    acquire = db.db_pool._acquire
+
+    def traced_acquire():
+        conn = acquire()
+        conn.set_trace_callback(seen.append)
+        return conn
+
+    monkeypatch.setattr(db.db_pool, "_acquire", traced_acquire)
+
+    with db.get_connection() as conn:
+        conn.executemany("INSERT OR IGNORE INTO teams (team_id, name) VALUES (?, ?)",
+                         [(1, "Arsenal"), (2, "Chelsea")])
+        for day in range(3):
+            start_time = (datetime.now(timezone.utc) + timedelta(hours=2, days=day)).isoformat()
+            kickoff_ts, match_day = db.fixture_time_columns(start_time)
+            conn.execute("""
+                INSERT INTO fixtures
+                (fixture_id, league_id, home_team_id, away_team_id, start_time, kickoff_ts, match_day, status)
+                VALUES (?, 1, 1, 2, ?, ?, ?, 'NS')
+            """, (100 + day, start_time, kickoff_ts, match_day))
+    seen.clear()
+    return seen
+
+def run_browse_and_settlement_paths(monkeypatch):
+    betting.get_matches_by_league(1, 0)
+    betting.get_popular_leagues()
+    league_menu._build(datetime.now().strftime("%Y-%m-%d"))
+    league_menu._build("2000-01-01")  # Empty day - default league fallback
+
+    scheduler.update_fixtures_based_on_time()
+    betslip_store._pruned_until = 0
+    betslip_store.prune_started()
+    result_poller._pending()
+
+    monkeypatch.setattr(scheduler, "fetch_fixtures_for_days", lambda days: [])
+    scheduler.update_fixtures_fallback()
+    monkeypatch.setattr(scheduler, "prefetch_league_odds", lambda *args: (0, 0))
+    scheduler.prefetch_popular_odds()
+
+    async def handlers():
+        await bot._render_league_matches(1, 0, 0)
+
+        context = MagicMock()
+        context.user_data = {"awaiting_team_search": True}
+        update = MagicMock()
+        update.message.text = "Arsenal"
+        update.message.reply_text = AsyncMock()
+        await bot.search_team_handler(update, context)
+
+        update = MagicMock()
+        update.callback_query.data = "league_info_1"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.edit_message_text = AsyncMock()
+        await bot.league_info_handler(update, context)
+
+    asyncio.run(handlers())
+
+def test_fixture_queries_search_the_kickoff_indexes(statements, monkeypatch):
+    run_browse_and_settlement_paths(monkeypatch)
+
+    queries = []
+    for sql in statements:
+        if (sql.lstrip().upper().startswith(("SELECT", "DELETE", "UPDATE"))
+                and "fixtures" in sql and re.search(r"\b(kickoff_ts|match_day)\b", sql)
+                and sql not in queries):
+            queries.append(sql)
+    assert len(queries) >= 10
+
+    used = set()
+    with db.get_connection() as conn:
+        for sql in queries:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            fixture_steps = [step for step in plan if re.search(r"\b(fixtures|f)\b", step)]
+
+            assert fixture_steps, sql
+            for step in fixture_steps:
+                assert step.startswith("SEARCH"), f"{step}\n{sql}"
+            used.update(re.findall(r"idx_fixtures_\w+", " ".join(fixture_steps)))
+
+    assert NEW_INDEXES <= used
\ No newline at end of file
@@ -0,0 +1,188 @@
+# test_quota_budgets.py
+import random
+
+import pytest
+
+import api_limiter
+import scheduler
+from api_limiter import (
+    api_limiter as limiter, PRIORITY_USER, PRIORITY_ESSENTIAL, PRIORITY_OPTIONAL
+)
+from config import (
+    MAX_DAILY_API_REQUESTS, MAX_BACKGROUND_REQUESTS, BACKGROUND_ESSENTIAL_RESERVE,
+    EMERGENCY_MODE_THRESHOLD, EMERGENCY_FALLBACK_LEAGUES, DEFAULT_ACTIVE_LEAGUES,
+    POPULAR_LEAGUE_IDS, MAX_DAYS_TO_FETCH, MAX_API_CALLS_PER_RUN,
+    RESULT_FIRST_CHECK_MINUTES, RESULT_RETRY_MINUTES
+)
+from quota_counter import QuotaCounter
+
+EMERGENCY_AT = MAX_DAILY_API_REQUESTS * EMERGENCY_MODE_THRESHOLD // 100
+OTHER_LEAGUE = 78
+
+@pytest.fixture
+def counter(temp_db, monkeypatch):
+    """A fresh in-memory counter behind api_limiter.acquire"""
+    counter = QuotaCounter()
+    monkeypatch.setattr(api_limiter, "quota_counter", counter)
+    return counter
+
+def grants(priority, count, league_id=None):
+    return sum(limiter.acquire(priority, league_id) for _ in range(count))
+
+def test_tiers_in_order(counter):
+    # Prefetching stops short of the essential reserve
+    optional_budget = MAX_BACKGROUND_REQUESTS - BACKGROUND_ESSENTIAL_RESERVE
+    assert grants(PRIORITY_OPTIONAL, optional_budget + 5) == optional_budget
+
+    # ...which essential work can still spend, up to the background budget
+    assert grants(PRIORITY_ESSENTIAL, BACKGROUND_ESSENTIAL_RESERVE + 5) == BACKGROUND_ESSENTIAL_RESERVE
+    assert not limiter.acquire(PRIORITY_OPTIONAL)
+
+    # Users run on until emergency mode
+    assert grants(PRIORITY_USER, EMERGENCY_AT - MAX_BACKGROUND_REQUESTS) == EMERGENCY_AT - MAX_BACKGROUND_REQUESTS
+    assert counter.snapshot()[0] == EMERGENCY_AT
+
+    # Past the threshold only fallback leagues (or league-less calls) get through
+    assert not limiter.acquire(PRIORITY_USER, OTHER_LEAGUE)
+    assert limiter.acquire(PRIORITY_USER, EMERGENCY_FALLBACK_LEAGUES[0])
+    assert limiter.acquire(PRIORITY_USER)
+    assert grants(PRIORITY_USER, 10) == MAX_DAILY_API_REQUESTS - EMERGENCY_AT - 2
+    assert counter.snapshot()[0] == MAX_DAILY_API_REQUESTS
+
+def test_background_leaves_users_their_reserve(counter):
+    # 25 calls the provider reports that we never counted ourselves:
+    # background work may only spend what is left beyond the users' reserve
+    counter._total = 25
+    assert grants(PRIORITY_ESSENTIAL, 10) == MAX_DAILY_API_REQUESTS - 25 - api_limiter.USER_RESERVED_REQUESTS
+
+# ====== A DAY OF TRAFFIC ======
+DAY_MINUTES = 24 * 60
+# API calls each scheduler job makes per run, as the jobs are written
+JOB_CALLS = {
+    # 3 active leagues x fetch_league_fixtures(days=2)
+    "update_all_fixtures": (PRIORITY_ESSENTIAL, 3 * 2),
+    "update_leagues": (PRIORITY_ESSENTIAL, 1),
+    # One /odds page per popular league and day, capped per run
+    "prefetch_popular_odds": (PRIORITY_OPTIONAL, min(len(POPULAR_LEAGUE_IDS) * MAX_DAYS_TO_FETCH,
+                                                     MAX_API_CALLS_PER_RUN)),
+}
+# Match day kickoffs (minutes after midnight): the poller's first results
+# check per slot, plus one extra-time re-check for the late kickoffs
+KICKOFFS = (12 * 60 + 30, 15 * 60, 17 * 60 + 30, 20 * 60)
+RESULT_CHECKS = sorted({k + RESULT_FIRST_CHECK_MINUTES for k in KICKOFFS}
+                       | {k + RESULT_FIRST_CHECK_MINUTES + RESULT_RETRY_MINUTES for k in KICKOFFS[2:]})
+# Match screen views per hour of the day; busiest around the evening kickoffs
+VIEWS_PER_HOUR = (2, 1, 0, 0, 0, 0, 1, 3, 4, 5, 6, 8, 10, 12, 12, 14, 14, 12, 16, 20, 20, 16, 8, 4)
+# A view finds no cached odds (a user call), stale odds (an optional SWR refresh) or fresh odds
+VIEW_OUTCOMES = ((PRIORITY_USER, 0.55), (PRIORITY_OPTIONAL, 0.2), (None, 0.25))
+
+class RecordingScheduler:
+    """Stands in for BackgroundScheduler: keeps the jobs start_scheduler adds"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def add_job(self, func, trigger, **fields):
+        self.jobs.append((func, trigger, fields))
+
+    def start(self):
+        pass
+
+def run_minutes(trigger, fields):
+    """Minutes of the day a job added with (trigger, fields) runs at"""
+    if trigger == "cron":
+        return [fields["hour"] * 60 + fields.get("minute", 0)]
+    every = fields.get("hours", 0) * 60 + fields.get("minutes", 0) + fields.get("seconds", 0) / 60
+    return [int(every * n) for n in range(1, int(DAY_MINUTES / every) + 1) if every * n < DAY_MINUTES]
+
+class Day:
+    """24 simulated hours of the scheduler's jobs and user traffic against api_limiter"""
+
+    def __init__(self, counter, seed):
+        self.counter = counter
+        self.rng = random.Random(seed)
+        self.minute = 0
+        # (minute, source, priority, league_id, total before the claim, granted)
+        self.claims = []
+
+    def claim(self, source, priority, league_id=None):
+        total = self.counter.snapshot()[0]
+        granted = limiter.acquire(priority, league_id)
+        self.claims.append((self.minute, source, priority, league_id, total, granted))
+
+    def job(self, name):
+        priority, calls = JOB_CALLS[name]
+        return lambda: [self.claim(name, priority) for _ in range(calls)]
+
+    def poll_results(self):
+        if self.minute in RESULT_CHECKS:
+            self.claim("update_pending_results", PRIORITY_ESSENTIAL)
+
+    def view(self):
+        priority = self.rng.choices(*zip(*VIEW_OUTCOMES))[0]
+        if priority:
+            self.claim("view", priority, self.rng.choice(DEFAULT_ACTIVE_LEAGUES))
+
+    def run(self, monkeypatch):
+        api_jobs = {name: self.job(name) for name in JOB_CALLS}
+        api_jobs["update_pending_results"] = self.poll_results
+        for name, func in api_jobs.items():
+            monkeypatch.setattr(scheduler, name, func)
+        recording = RecordingScheduler()
+        monkeypatch.setattr(scheduler, "BackgroundScheduler", lambda: recording)
+
+        # Startup runs the API jobs once, then registers their real cadences
+        scheduler.start_scheduler()
+        runs = {}
+        for func, trigger, fields in recording.jobs:
+            if func in api_jobs.values():
+                for minute in run_minutes(trigger, fields):
+                    runs.setdefault(minute, []).append(func)
+        assert {func for func, _, _ in recording.jobs} >= set(api_jobs.values())
+
+        views = {}
+        for hour, count in enumerate(VIEWS_PER_HOUR):
+            for minute in self.rng.sample(range(hour * 60, hour * 60 + 60), count):
+                views[minute] = views.get(minute, 0) + 1
+
+        for self.minute in range(1, DAY_MINUTES):
+            for func in runs.get(self.minute, []):
+                func()
+            for _ in range(views.get(self.minute, 0)):
+                self.view()
+        return self.claims
+
+@pytest.mark.parametrize("seed", range(3))
+def test_a_day_of_traffic(counter, monkeypatch, seed):
+    claims = Day(counter, seed).run(monkeypatch)
+
+    granted = dict.fromkeys((PRIORITY_USER, PRIORITY_ESSENTIAL, PRIORITY_OPTIONAL), 0)
+    background_before = []
+    for _, _, priority, _, _, ok in claims:
+        background_before.append(granted[PRIORITY_ESSENTIAL] + granted[PRIORITY_OPTIONAL])
+        granted[priority] += ok
+    emergency_from = min(minute for minute, _, _, _, total, _ in claims if total >= EMERGENCY_AT)
+    print(f"\nseed {seed}: granted {granted}, emergency mode from {emergency_from // 60:02d}:{emergency_from % 60:02d}")
+
+    # Users are never refused before emergency mode
+    assert all(ok for _, _, priority, _, total, ok in claims if priority == PRIORITY_USER and total < EMERGENCY_AT)
+
+    # Background work stops at its cap, prefetching BACKGROUND_ESSENTIAL_RESERVE short of it
+    assert granted[PRIORITY_ESSENTIAL] + granted[PRIORITY_OPTIONAL] == MAX_BACKGROUND_REQUESTS
+    for (_, _, priority, _, _, ok), spent in zip(claims, background_before):
+        if priority == PRIORITY_OPTIONAL and spent >= MAX_BACKGROUND_REQUESTS - BACKGROUND_ESSENTIAL_RESERVE:
+            assert not ok
+        if priority != PRIORITY_USER and spent >= MAX_BACKGROUND_REQUESTS:
+            assert not ok
+    # ...while there was more background work queued than it allows
+    assert sum(priority != PRIORITY_USER for _, _, priority, *_ in claims) > MAX_BACKGROUND_REQUESTS
+
+    # Emergency mode: no background work, user odds only for the fallback leagues
+    emergency = [c for c in claims if c[4] >= EMERGENCY_AT]
+    assert not any(ok for _, _, priority, _, _, ok in emergency if priority != PRIORITY_USER)
+    assert all(league_id in EMERGENCY_FALLBACK_LEAGUES
+               for _, _, priority, league_id, _, ok in emergency if priority == PRIORITY_USER and ok)
+    assert any(not ok for _, _, priority, league_id, total, ok in emergency
+               if priority == PRIORITY_USER and league_id not in EMERGENCY_FALLBACK_LEAGUES
+               and total < MAX_DAILY_API_REQUESTS)
+    assert counter.snapshot()[0] <= MAX_DAILY_API_REQUESTS
\ No newline at end of file
@@ -0,0 +1,60 @@
+# test_quota_counter.py
+from quota_counter import QuotaCounter, fit_used, quota_day, LIMIT_HEADER, REMAINING_HEADER
+
+def provider_headers(limit, remaining):
+    return {LIMIT_HEADER: str(limit), REMAINING_HEADER: str(remaining)}
+
+def count(counter, priority, times):
+    for _ in range(times):
+        assert counter.claim(priority, lambda total, used: None) is None
+
+def test_fit_used_scales_down_to_the_total():
+    assert fit_used({"user": 6, "essential": 3, "optional": 1}, 5) == {"user": 3, "essential": 2, "optional": 0}
+    assert sum(fit_used({"user": 7, "essential": 7, "optional": 7}, 10).values()) == 10
+    assert fit_used({"user": 2}, 5) == {"user": 2}
+    assert fit_used({"user": 2, "optional": 1}, 0) == {"user": 0, "optional": 0}
+
+def test_lower_provider_count_scales_priorities(temp_db):
+    counter = QuotaCounter()
+    count(counter, "user", 4)
+    count(counter, "optional", 4)
+
+    counter.request_started()
+    counter.request_finished(provider_headers(100, 96))
+
+    total, used, limit, remaining = counter.snapshot()
+    assert (total, limit, remaining) == (4, 100, 96)
+    assert used == {"user": 2, "optional": 2}
+
+def test_higher_provider_count_leaves_priorities(temp_db):
+    counter = QuotaCounter()
+    count(counter, "user", 2)
+
+    counter.request_started()
+    counter.request_finished(provider_headers(100, 90))
+
+    assert counter.snapshot()[:2] == (10, {"user": 2})
+
+def test_recover_trusts_the_reconciled_total(temp_db):
+    counter = QuotaCounter()
+    count(counter, "user", 3)
+    count(counter, "essential", 3)
+    counter.request_started()
+    counter.request_finished(provider_headers(100, 97))
+    assert counter.checkpoint()
+
+    restarted = QuotaCounter()
+    restarted.recover()
+
+    total, used = restarted.snapshot()[:2]
+    assert total == 3
+    assert sum(used.values()) <= total
+
+def test_recover_fits_rows_from_older_checkpoints(temp_db):
+    # A total lowered before the per-priority rows were corrected with it
+    QuotaCounter()._write(quota_day(), 2, {"user": 5, "optional": 5})
+
+    counter = QuotaCounter()
+    counter.recover()
+
+    assert counter.snapshot()[:2] == (2, {"user": 1, "optional": 1})
\ No newline at end of file
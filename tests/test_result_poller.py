@@ -0,0 +1,262 @@
+# test_result_poller.py
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import betting
+import db
+from api import fetch_fixture_results
+from config import (
+    RESULT_FIRST_CHECK_MINUTES, RESULT_POLL_SECONDS, RESULT_RETRY_MINUTES,
+    RESULT_MAX_BACKOFF_MINUTES, RESULT_POSTPONED_VOID_DAYS
+)
+from ledger import ledger
+from result_poller import result_poller
+from results_db import results_db
+
+from conftest import reset_memory_state
+
+T0 = int(time.time()) + 3600
+KICKOFF = {101: T0, 102: T0, 103: T0 + 900, 104: T0 + 900, 105: T0 + 1800, 106: T0 + 1800, 107: T0 + 1800}
+# fixture_id: (minutes after kickoff the status turns final, status, goals, regular-time score)
+TIMELINE = {
+    101: (112, "FT", (2, 1), (2, 1)),
+    102: (125, "FT", (0, 0), (0, 0)),    # long stoppage time
+    103: (145, "AET", (2, 1), (1, 1)),   # won in extra time, drawn after 90'
+    104: (160, "PEN", (1, 1), (1, 1)),
+    105: (0, "CANC", (None, None), (None, None)),
+    106: (-60, "PST", (None, None), (None, None)),
+    107: (60, "ABD", (1, 0), (None, None)),
+}
+SIMULATED_HOURS = 8
+
+# Match day for the schedule comparison: kickoff slot -> fixtures, plus
+# tomorrow's fixtures, which already have bets on them
+MATCH_DAY_SLOTS = {12.5: 4, 15: 16, 17.5: 6, 20: 8}
+TOMORROW_FIXTURES = 6
+MATCH_DAY_HOURS = 16
+
+def match_day(seed):
+    """Seeded (kickoffs, timeline) for MATCH_DAY_SLOTS, with T0 as 10:00 on the day"""
+    rng = random.Random(seed)
+    kickoffs, timeline = {}, {}
+    fixture_id = 1000
+    slots = list(MATCH_DAY_SLOTS.items()) + [(24 + 15, TOMORROW_FIXTURES)]
+    for hour, count in slots:
+        for _ in range(count):
+            fixture_id += 1
+            kickoffs[fixture_id] = T0 + int((hour - 10) * 3600)
+            roll = rng.random()
+            if roll < 0.05:
+                timeline[fixture_id] = (-60, "PST", (None, None), (None, None))
+            elif roll < 0.1:
+                timeline[fixture_id] = (rng.randint(140, 150), "AET", (2, 1), (1, 1))
+            else:
+                goals = (rng.randint(0, 3), rng.randint(0, 3))
+                timeline[fixture_id] = (rng.randint(108, 125), "FT", goals, goals)
+    return kickoffs, timeline
+
+def final_ts(fixture_id, kickoffs=KICKOFF, timeline=TIMELINE):
+    return kickoffs[fixture_id] + timeline[fixture_id][0] * 60
+
+def fixtures_at(clock, kickoffs=KICKOFF, timeline=TIMELINE):
+    """/fixtures?ids= handler answering with each fixture's state at clock["now"]"""
+    def handler(path, params):
+        items = []
+        for fixture_id in map(int, params["ids"].split("-")):
+            _, final_status, goals, fulltime = timeline[fixture_id]
+            if clock["now"] >= final_ts(fixture_id, kickoffs, timeline):
+                status = final_status
+            elif clock["now"] >= kickoffs[fixture_id]:
+                status, goals, fulltime = "2H", (0, 0), (None, None)
+            else:
+                status, goals, fulltime = "NS", (None, None), (None, None)
+            items.append({
+                "fixture": {
+                    "id": fixture_id,
+                    "date": datetime.fromtimestamp(kickoffs[fixture_id], timezone.utc).isoformat(),
+                    "status": {"short": status}
+                },
+                "goals": {"home": goals[0], "away": goals[1]},
+                "score": {"fulltime": {"home": fulltime[0], "away": fulltime[1]}},
+                "teams": {"home": {"name": f"Home {fixture_id}"}, "away": {"name": f"Away {fixture_id}"}},
+                "league": {"name": "Test League"}
+            })
+        return {"response": items}
+    return handler
+
+def bet_state(bet_id):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT status, payout FROM bets WHERE bet_id = ?", (bet_id,)).fetchone()
+
+def balance(user_id):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def place_bets(add_fixture, place):
+    """One bet per outcome under test, on the TIMELINE fixtures"""
+    for fixture_id, kickoff_ts in KICKOFF.items():
+        add_fixture(fixture_id, kickoff_ts)
+
+    return {
+        "ft_home": place(1, 100, [(101, "1X2", "1", 2.0)]),
+        "ft_under": place(1, 100, [(102, "OU", "Under 2.5", 1.5)]),
+        "aet_draw": place(2, 100, [(103, "1X2", "X", 3.0)]),
+        "aet_home": place(2, 100, [(103, "1X2", "1", 2.5)]),
+        "pen_draw": place(3, 100, [(104, "1X2", "X", 3.2)]),
+        "canc": place(4, 100, [(105, "1X2", "1", 2.0)]),
+        "pst": place(4, 100, [(106, "1X2", "2", 4.0)]),
+        "abd": place(5, 100, [(107, "OU", "Over 2.5", 1.8)]),
+        "acca_void_leg": place(5, 100, [(101, "1X2", "1", 2.0), (105, "1X2", "X", 3.0)]),
+    }
+
+def simulate(fake_api, monkeypatch, tick, hours=SIMULATED_HOURS, kickoffs=KICKOFF, timeline=TIMELINE):
+    """
+    Run tick(now) once a simulated minute from an hour before T0 for
+    hours -> {fixture_id: when its result settled bets}
+    """
+    clock = {"now": T0 - 3600}
+    fake_api.handler = fixtures_at(clock, kickoffs, timeline)
+    settled_at = {}
+    with monkeypatch.context() as patch:
+        patch.setattr(results_db, "_final_result_listeners", results_db._final_result_listeners + [
+            lambda fixture_id: settled_at.setdefault(fixture_id, clock["now"])
+        ])
+        while clock["now"] < T0 + hours * 3600:
+            tick(clock["now"])
+            clock["now"] += RESULT_POLL_SECONDS
+    return settled_at
+
+def settle_metrics(settled_at, fake_api, kickoffs, timeline):
+    """(mean minutes from final status to settlement, API requests per settled fixture)"""
+    latency = [(settled_at[fixture_id] - max(final_ts(fixture_id, kickoffs, timeline), kickoffs[fixture_id])) / 60
+               for fixture_id in settled_at]
+    return sum(latency) / len(latency), len(fake_api.calls) / len(settled_at)
+
+def fixed_schedule(start):
+    """The schedule the poller replaced: every pending fixture every 2 hours, settle sweep hourly"""
+    def tick(now):
+        if (now - start) % (2 * 3600) == 0:
+            pending = results_db.get_pending_bets_fixtures()
+            if pending:
+                fetch_fixture_results(pending)
+        if (now - start) % 3600 == 0:
+            betting.settle_finished_matches()
+    return tick
+
+def test_poller_settles_final_and_void_fixtures_then_stops(add_fixture, place, fake_api, monkeypatch):
+    bets = place_bets(add_fixture, place)
+    settled_at = simulate(fake_api, monkeypatch, lambda now: result_poller.poll(now=now))
+
+    # Every fixture settled, each one once; the postponed one waits to be rescheduled
+    assert set(settled_at) == set(TIMELINE) - {106}
+    assert list(result_poller._schedule) == [106]
+
+    # Latency: played matches within one retry step of the backed-off
+    # schedule, void ones on their first check after kickoff
+    latency = {fixture_id: (settled_at[fixture_id] - max(final_ts(fixture_id), KICKOFF[fixture_id])) / 60
+               for fixture_id in settled_at}
+    print(f"\nsettle latency (minutes after the final status): {latency}")
+    for fixture_id in (101, 102, 103, 104):
+        assert latency[fixture_id] <= RESULT_RETRY_MINUTES * 4
+    for fixture_id in (105, 107):
+        assert settled_at[fixture_id] <= KICKOFF[fixture_id] + RESULT_FIRST_CHECK_MINUTES * 60
+
+    # Terminal statuses leave the schedule - no fixture is fetched after it settled
+    fetches = {fixture_id: 0 for fixture_id in TIMELINE if fixture_id in settled_at}
+    postponed_checks = 0
+    for path, params in fake_api.calls:
+        assert path == "/fixtures"
+        for fixture_id in map(int, params["ids"].split("-")):
+            if fixture_id == 106:
+                postponed_checks += 1
+            else:
+                fetches[fixture_id] += 1
+    print(f"fetches per fixture: {fetches}, postponed checks: {postponed_checks}, requests: {len(fake_api.calls)}")
+    assert fetches[105] == fetches[107] == 1
+    # The postponed fixture is re-checked at the longest backoff only
+    first_check = KICKOFF[106] + RESULT_FIRST_CHECK_MINUTES * 60
+    assert postponed_checks == 1 + (T0 + SIMULATED_HOURS * 3600 - first_check) // (RESULT_MAX_BACKOFF_MINUTES * 60)
+    assert all(count <= 4 for count in fetches.values())
+    assert len(fake_api.calls) <= 8
+
+    # AET / PEN grade on the regular-time score
+    assert bet_state(bets["ft_home"]) == ("WON", 200)
+    assert bet_state(bets["ft_under"]) == ("WON", 150)
+    assert bet_state(bets["aet_draw"]) == ("WON", 300)
+    assert bet_state(bets["aet_home"])[0] == "LOST"
+    assert bet_state(bets["pen_draw"]) == ("WON", 320)
+
+    # Cancelled and abandoned legs are void: stake back, or odds 1.0 in an accumulator
+    assert bet_state(bets["canc"]) == ("VOID", 100)
+    assert bet_state(bets["abd"]) == ("VOID", 100)
+    assert bet_state(bets["acca_void_leg"]) == ("WON", 200)
+    # Postponed is not void yet
+    assert bet_state(bets["pst"]) == ("PENDING", 400)
+
+    assert balance(4) == 1000 - 100
+    assert balance(5) == 1000 - 200 + 100 + 200
+    assert ledger.reconcile()["ok"]
+
+def test_poller_settles_sooner_than_the_fixed_schedule(temp_db, add_fixture, place, fake_api, monkeypatch):
+    kickoffs, timeline = match_day(seed=25)
+    played = {fixture_id for fixture_id in kickoffs
+              if final_ts(fixture_id, kickoffs, timeline) < T0 + MATCH_DAY_HOURS * 3600
+              and timeline[fixture_id][1] != "PST"}
+    strategies = {
+        "fixed 2 h sweep": fixed_schedule(T0 - 3600),
+        "adaptive poller": lambda now: result_poller.poll(now=now),
+    }
+    metrics = {}
+    for name, tick in strategies.items():
+        # Same fixtures and bets on a fresh database for each strategy
+        monkeypatch.setattr(db, "db_pool", db.ConnectionPool(str(temp_db / f"{len(metrics)}.db")))
+        reset_memory_state()
+        db.init_db()
+        fake_api.calls.clear()
+        for fixture_id, kickoff_ts in kickoffs.items():
+            add_fixture(fixture_id, kickoff_ts)
+            place(fixture_id % 10 + 1, 10, [(fixture_id, "1X2", "1", 2.0)])
+
+        settled_at = simulate(fake_api, monkeypatch, tick, MATCH_DAY_HOURS, kickoffs, timeline)
+
+        assert set(settled_at) == played
+        metrics[name] = settle_metrics(settled_at, fake_api, kickoffs, timeline)
+
+    print(f"\n{len(played)} fixtures settled, {TOMORROW_FIXTURES} more open for tomorrow")
+    for name, (latency, calls) in metrics.items():
+        print(f"  {name}: {latency:.0f} min from the final whistle to settlement on average, "
+              f"{calls:.2f} API calls per settled fixture")
+
+    fixed, adaptive = metrics["fixed 2 h sweep"], metrics["adaptive poller"]
+    assert adaptive[0] < fixed[0]
+    assert adaptive[1] <= fixed[1]
+
+def test_postponed_fixture_is_void_only_after_the_window(add_fixture, place):
+    add_fixture(201, T0)
+    add_fixture(202, T0)
+    rescheduled = place(1, 100, [(201, "1X2", "1", 2.0)])
+    abandoned = place(2, 100, [(202, "1X2", "1", 2.0)])
+    today = datetime.now(timezone.utc).date()
+    days_ago = lambda days: (today - timedelta(days=days)).isoformat()
+
+    # Postponed a day ago: might still be rescheduled
+    results_db.save_result(201, "Home 201", "Away 201", 0, 0, "PST", days_ago(1))
+    assert bet_state(rescheduled) == ("PENDING", 200)
+    # ...then played on its new date
+    results_db.save_result(201, "Home 201", "Away 201", 1, 0, "FT", today.isoformat())
+    assert bet_state(rescheduled) == ("WON", 200)
+
+    # Still unplayed RESULT_POSTPONED_VOID_DAYS later: the stake comes back
+    results_db.save_result(202, "Home 202", "Away 202", 0, 0, "PST", days_ago(RESULT_POSTPONED_VOID_DAYS - 1))
+    assert bet_state(abandoned) == ("PENDING", 200)
+    with db.get_connection() as conn:
+        # Aged in place - only the hourly backstop sweep sees it
+        conn.execute("UPDATE match_results SET match_date = ? WHERE fixture_id = 202",
+                     (days_ago(RESULT_POSTPONED_VOID_DAYS),))
+    betting.settle_finished_matches()
+    assert bet_state(abandoned) == ("VOID", 100)
+
+    assert balance(1) == 1000 - 100 + 200
+    assert balance(2) == 1000
+    assert ledger.reconcile()["ok"]
\ No newline at end of file
@@ -0,0 +1,123 @@
+# test_settlement.py
+import json
+import time
+
+import betting
+from config import START_BALANCE
+from db import get_connection
+from ledger import ledger
+from results_db import results_db
+
+KICKOFF = int(time.time()) + 3600
+
+def finish(fixture_id, home_goals, away_goals, status="FT"):
+    """Save the result; results_db's listener settles the fixture"""
+    results_db.save_result(fixture_id, f"Home {fixture_id}", f"Away {fixture_id}",
+                           home_goals, away_goals, status, "2026-10-17")
+
+def bet_status(bet_id):
+    with get_connection() as conn:
+        return conn.execute("SELECT status FROM bets WHERE bet_id = ?", (bet_id,)).fetchone()[0]
+
+def balance(user_id):
+    with get_connection() as conn:
+        return conn.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+def test_1x2_and_over_under_grading(add_fixture, place):
+    add_fixture(1, KICKOFF)
+    picks = [("1X2", "1"), ("1X2", "X"), ("1X2", "2"),
+             ("OU", "Over 2.5"), ("OU", "Under 2.5"), ("OU", "Over 3.5"), ("OU", "Under 3.5"),
+             ("BTTS", "Yes")]
+    bets = {pick: place(1, 10, [(1, market, pick, 2.0)]) for market, pick in picks}
+
+    finish(1, 2, 1)
+
+    assert {pick: bet_status(bet_id) for pick, bet_id in bets.items()} == {
+        "1": "WON", "X": "LOST", "2": "LOST",
+        "Over 2.5": "WON", "Under 2.5": "LOST", "Over 3.5": "LOST", "Under 3.5": "WON",
+        # Unknown markets never pay out
+        "Yes": "LOST",
+    }
+
+def test_accumulator_waits_for_every_leg_and_loses_on_any(add_fixture, place):
+    for fixture_id in (1, 2, 3):
+        add_fixture(fixture_id, KICKOFF)
+    winning = place(1, 10, [(1, "1X2", "1", 2.0), (2, "1X2", "X", 3.0)])
+    losing = place(1, 10, [(1, "1X2", "2", 2.0), (3, "1X2", "1", 1.5)])
+
+    finish(1, 1, 0)
+    # A lost leg settles the accumulator while its other leg is unplayed
+    assert bet_status(losing) == "LOST"
+    assert bet_status(winning) == "PENDING"
+
+    finish(2, 0, 0)
+    assert bet_status(winning) == "WON"
+    assert balance(1) == START_BALANCE - 20 + 60
+
+def test_payouts_aggregate_into_balances_and_totals(add_fixture, place):
+    add_fixture(1, KICKOFF)
+    place(1, 100, [(1, "1X2", "1", 2.0)])
+    place(1, 50, [(1, "OU", "Over 2.5", 1.8)])
+    place(2, 100, [(1, "1X2", "1", 2.5)])
+    place(3, 100, [(1, "1X2", "2", 3.0)])
+    payout_before = ledger.get_totals().get("payout", (0, 0))
+
+    finish(1, 3, 0)
+
+    assert balance(1) == START_BALANCE - 150 + 200 + 90
+    assert balance(2) == START_BALANCE - 100 + 250
+    assert balance(3) == START_BALANCE - 100
+    payout_after = ledger.get_totals()["payout"]
+    assert payout_after[0] - payout_before[0] == 540
+    assert payout_after[1] - payout_before[1] == 3
+    assert ledger.reconcile()["ok"]
+
+def test_settling_twice_pays_once(add_fixture, place):
+    add_fixture(1, KICKOFF)
+    place(1, 100, [(1, "1X2", "1", 2.0)])
+    finish(1, 1, 0)
+    totals = ledger.get_totals()
+
+    assert betting.settle_fixture(1) == 0
+    betting.settle_finished_matches()
+    # A corrected score arriving later doesn't regrade settled legs
+    finish(1, 0, 1)
+
+    assert balance(1) == START_BALANCE + 100
+    assert ledger.get_totals() == totals
+    assert ledger.reconcile()["ok"]
+
+def test_settles_50k_selections_on_one_fixture(add_fixture):
+    add_fixture(1, KICKOFF)
+    bets = 50_000
+    users = 5_000
+    picks = [("1X2", "1"), ("1X2", "X"), ("1X2", "2"), ("OU", "Over 2.5"), ("OU", "Under 2.5")]
+    legs = [(bet_id, *picks[bet_id % len(picks)]) for bet_id in range(1, bets + 1)]
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO users (user_id, username, balance) VALUES (?, ?, 0)",
+                         [(user_id, f"user{user_id}") for user_id in range(1, users + 1)])
+        conn.executemany("""
+            INSERT INTO bets (bet_id, user_id, selections, total_odds, stake, payout, status)
+            VALUES (?, ?, ?, 2.0, 10, 20, 'PENDING')
+        """, [(bet_id, bet_id % users + 1,
+               json.dumps([{"fixture_id": 1, "market": market, "pick": pick, "odds": 2.0}]))
+              for bet_id, market, pick in legs])
+        conn.executemany(
+            "INSERT INTO bet_selections (bet_id, fixture_id, market, pick, odds) VALUES (?, 1, ?, ?, 2.0)", legs
+        )
+        # Straight into match_results: save_result's listener would settle it untimed
+        conn.execute("""
+            INSERT INTO match_results (fixture_id, home_team, away_team, home_goals, away_goals, status, match_date)
+            VALUES (1, 'Home 1', 'Away 1', 2, 1, 'FT', '2026-10-17')
+        """)
+
+    started = time.perf_counter()
+    settled = betting.settle_fixture(1)
+    elapsed = time.perf_counter() - started
+
+    print(f"\nsettle_fixture: {bets} selections in {elapsed * 1000:.0f} ms")
+    assert settled == bets
+    with get_connection() as conn:
+        # 2-1: "1" and "Over 2.5" win, two bets in five
+        assert conn.execute("SELECT COUNT(*) FROM bets WHERE status = 'WON'").fetchone()[0] == bets * 2 // 5
+        assert conn.execute("SELECT SUM(balance) FROM users").fetchone()[0] == bets * 2 // 5 * 20
\ No newline at end of file
@@ -0,0 +1,28 @@
+# test_single_flight.py
+import asyncio
+
+import api
+
+def test_concurrent_odds_fetches_make_one_upstream_call(temp_db, fake_api):
+    # Stay in flight long enough for every caller to join
+    fake_api.delay = 0.05
+
+    async def run():
+        return await asyncio.gather(*(api.fetch_match_odds_async(1001) for _ in range(100)))
+
+    results = asyncio.run(run())
+
+    assert fake_api.calls == [("/odds", {"fixture": 1001})]
+    assert results[0] is not None
+    assert all(result == results[0] for result in results)
+
+def test_waiters_share_the_leaders_error(temp_db, fake_api):
+    fake_api.delay = 0.05
+    fake_api.handler = lambda path, params: RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(api.fetch_match_odds_async(1002) for _ in range(10)))
+
+    # _fetch_match_odds_async turns request errors into None for every caller
+    assert asyncio.run(run()) == [None] * 10
+    assert len(fake_api.calls) == 1
\ No newline at end of file
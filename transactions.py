@@ -1,6 +1,7 @@
 # transactions.py
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from db import cursor, conn
+from async_db import run_db, fetch_one, fetch_all
+from ledger import ledger
 from config import ADMIN_USER_ID, TELEBIRR_ACCOUNT, CBE_ACCOUNT
 from datetime import datetime
 
@@ -75,16 +76,10 @@ async def handle_deposit_screenshot(update, context):
     # Get the photo file ID
     photo_file = update.message.photo[-1].file_id
     
-    # Save transaction as pending
-    cursor.execute("""
-        INSERT INTO transactions 
-        (user_id, username, type, method, status, screenshot_id)
-        VALUES (?, ?, 'deposit', ?, 'pending', ?)
-    """, (user.id, user.username, method, photo_file))
-    conn.commit()
-    
-    # Get transaction ID
-    transaction_id = cursor.lastrowid
+    # Save transaction as pending and get its ID (amount is set by the admin)
+    transaction_id = await run_db(
+        ledger.request_deposit, user.id, user.username, 0, method, photo_file
+    )
     
     # Forward to admin
     admin_message = (
@@ -141,11 +136,10 @@ async def handle_deposit_screenshot(update, context):
 async def start_withdraw(update, context):
     """Start withdrawal process"""
     # Check user balance first
-    cursor.execute(
+    row = await fetch_one(
         "SELECT balance FROM users WHERE user_id=?",
         (update.effective_user.id,)
     )
-    row = cursor.fetchone()
     
     if not row:
         await update.message.reply_text("❌ User not found")
@@ -178,11 +172,10 @@ async def handle_withdraw_amount(update, context):
         return
     
     # Check balance
-    cursor.execute(
+    row = await fetch_one(
         "SELECT balance FROM users WHERE user_id=?",
         (update.effective_user.id,)
     )
-    row = cursor.fetchone()
     
     if not row:
         await update.message.reply_text("❌ User not found")
@@ -260,11 +253,10 @@ async def handle_withdraw_account(update, context):
         return
     
     # Check balance again
-    cursor.execute(
+    row = await fetch_one(
         "SELECT balance FROM users WHERE user_id=?",
         (user.id,)
     )
-    row = cursor.fetchone()
     
     if not row:
         await update.message.reply_text("❌ User not found")
@@ -278,15 +270,14 @@ async def handle_withdraw_account(update, context):
         context.user_data["awaiting_withdraw_account"] = False
         return
     
-    # Save withdrawal request
-    cursor.execute("""
-        INSERT INTO transactions 
-        (user_id, username, type, amount, method, status, account_number)
-        VALUES (?, ?, 'withdraw', ?, ?, 'pending', ?)
-    """, (user.id, user.username, amount, method, account_number))
-    conn.commit()
-    
-    transaction_id = cursor.lastrowid
+    # Hold the amount in the ledger until the admin decides
+    transaction_id = await run_db(
+        ledger.request_withdrawal, user.id, user.username, amount, method, account_number
+    )
+    if transaction_id is None:
+        await update.message.reply_text("❌ Insufficient balance. Please check your balance and try again.")
+        context.user_data["awaiting_withdraw_account"] = False
+        return
     
     # Notify admin
     method_name = "Telebirr" if method == "telebirr" else "CBE"
@@ -346,14 +337,12 @@ async def handle_admin_approval(update, context):
     transaction_id = int(data[2])
     
     # Get transaction details
-    cursor.execute("""
+    transaction = await fetch_one("""
         SELECT user_id, username, type, amount, method, account_number
         FROM transactions 
         WHERE transaction_id=? AND status='pending'
     """, (transaction_id,))
     
-    transaction = cursor.fetchone()
-    
     if not transaction:
         await query.edit_message_text("❌ Transaction not found or already processed")
         return
@@ -361,22 +350,10 @@ async def handle_admin_approval(update, context):
     user_id, username, trans_type, amount, method, account_number = transaction
     
     if action == "approve":
+        status = "approved"
         if trans_type == "deposit":
-            # Add balance to user
-            cursor.execute(
-                "UPDATE users SET balance = balance + ? WHERE user_id=?",
-                (amount if amount else 0, user_id)
-            )
-            status = "approved"
             user_message = f"✅ *Deposit Approved!*\n\n💰 {amount if amount else 'Amount'} has been added to your balance."
-        
-        elif trans_type == "withdraw":
-            # Deduct balance from user
-            cursor.execute(
-                "UPDATE users SET balance = balance - ? WHERE user_id=?",
-                (amount, user_id)
-            )
-            status = "approved"
+        else:
             user_message = f"✅ *Withdrawal Approved!*\n\n💰 {amount} has been sent to your {method} account."
     
     else:  # reject
@@ -384,15 +361,12 @@ async def handle_admin_approval(update, context):
         if trans_type == "deposit":
             user_message = f"❌ *Deposit Rejected*\n\nYour deposit request was rejected by admin."
         else:
-            user_message = f"❌ *Withdrawal Rejected*\n\nYour withdrawal request was rejected by admin."
+            user_message = f"❌ *Withdrawal Rejected*\n\nYour withdrawal request was rejected by admin.\nThe amount has been returned to your balance."
     
-    # Update transaction status
-    cursor.execute("""
-        UPDATE transactions 
-        SET status=?, processed_at=CURRENT_TIMESTAMP, processed_by=?
-        WHERE transaction_id=?
-    """, (status, update.effective_user.id, transaction_id))
-    conn.commit()
+    # Status change and balance movement are committed together, once
+    if not await run_db(ledger.process_transaction, transaction_id, status, update.effective_user.id):
+        await query.edit_message_text("❌ Transaction not found or already processed")
+        return
     
     # Notify user
     try:
@@ -422,20 +396,18 @@ async def admin_panel(update, context):
         return
     
     # Get pending transactions
-    cursor.execute("""
+    pending = await fetch_all("""
         SELECT transaction_id, type, user_id, username, amount, method, created_at
         FROM transactions 
         WHERE status='pending'
-        ORDER BY created_at DESC
+        ORDER BY created_at, transaction_id
     """)
     
-    pending = cursor.fetchall()
-    
     text = "🛠 *ADMIN PANEL*\n\n"
     
     if pending:
         text += f"📋 *Pending Transactions:* {len(pending)}\n\n"
-        for trans in pending[:10]:  # Show last 10
+        for trans in pending[:10]:  # Show the oldest 10
             trans_id, trans_type, user_id, username, amount, method, created_at = trans
             text += f"#{trans_id} - {trans_type.upper()} - @{username}\n"
             text += f"   Amount: {amount if amount else 'Not specified'}\n"
@@ -444,19 +416,13 @@ async def admin_panel(update, context):
     else:
         text += "✅ No pending transactions\n\n"
     
-    # Get stats
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_transactions,
-            SUM(CASE WHEN status='approved' AND type='deposit' THEN amount ELSE 0 END) as total_deposits,
-            SUM(CASE WHEN status='approved' AND type='withdraw' THEN amount ELSE 0 END) as total_withdrawals
-        FROM transactions
-    """)
-    
-    stats = cursor.fetchone()
+    # Get stats (running totals kept by the ledger)
+    totals = await run_db(ledger.get_totals)
     
-    if stats:
-        total_trans, total_deposits, total_withdrawals = stats
+    if totals:
+        total_trans = totals.get("tx_deposit", (0, 0))[1] + totals.get("tx_withdraw", (0, 0))[1]
+        total_deposits = totals.get("deposit", (0, 0))[0]
+        total_withdrawals = totals.get("withdraw_approved", (0, 0))[0]
         text += f"📊 *Statistics*\n"
         text += f"Total Transactions: {total_trans}\n"
         text += f"Total Deposits: {total_deposits or 0}\n"
@@ -470,15 +436,13 @@ async def admin_balance(update, context):
         await update.message.reply_text("❌ Access denied")
         return
     
-    cursor.execute("""
+    users = await fetch_all("""
         SELECT user_id, username, balance
         FROM users
         ORDER BY balance DESC
         LIMIT 20
     """)
     
-    users = cursor.fetchall()
-    
     text = "👥 *USER BALANCES*\n\n"
     total_balance = 0
     